@@ -6,9 +6,13 @@ import os
 from pathlib import Path
 
 def create_app():
+    from app.services.upload_staging import StagingRequest
+
     app = Flask(__name__, 
                 static_folder='static',
                 static_url_path='/static')
+    # Stream uploaded files straight into the staging dir (see upload_staging).
+    app.request_class = StagingRequest
     
     # Configure file upload limits for remote server
     app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
@@ -91,6 +95,35 @@ def create_app():
     app.register_blueprint(project_bp, url_prefix='/')
     app.register_blueprint(shot_bp, url_prefix="/api/shots")
 
+    # Without nginx in front, let Flask play its role for thumbnails: variants
+    # are only queued when first requested (see ThumbnailQueue.request_variant).
+    from app.routes.shot_routes import serve_thumbnail
+    app.add_url_rule('/static/thumbnails/<path:filepath>', 'thumbnail_file', serve_thumbnail)
+
+    # Thumbnails finish in the background; tell connected clients.
+    from app.services.events import publish
+    from app.services.thumbnail_cache import ThumbnailCache
+    from app.services.thumbnail_worker import get_thumbnail_queue, READY
+
+    def publish_thumbnail(key, status):
+        ready = status == READY
+        publish('thumbnail', key=key, status=status,
+                url=ThumbnailCache.url_for_key(key) if ready else None,
+                srcset=ThumbnailCache.srcset_for_key(key) if ready else None)
+
+    get_thumbnail_queue().add_listener(publish_thumbnail)
+
+    # Pick up files written into shots/ by other tools (SHOTBUDDY_WATCH=1).
+    from app.config.constants import WATCH_ENABLED
+    if WATCH_ENABLED:
+        from app.services.fs_watcher import start_watcher
+        start_watcher(app)
+
+    @app.teardown_request
+    def discard_staged_uploads(exc):
+        from flask import request
+        request.discard_staged_files()
+
     @app.route("/health")
     def health():
         return {"ok": True}, 200
@@ -1,5 +1,7 @@
 from pathlib import Path
+import hashlib
 import os
+import shutil
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 
@@ -9,14 +11,140 @@ ALLOWED_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
 ALLOWED_VIDEO_EXTENSIONS = {'.mp4', '.mov'}
 
 # Central thumbnail cache location. Stored inside the application's static
-# directory so thumbnails persist across projects. The cache is cleared when
-# switching projects or the page is refreshed.
+# directory so thumbnails persist across projects. Entries are content
+# addressed (source path, size and mtime) and survive project switches and
+# page reloads; the least recently used ones are evicted once the cache grows
+# past THUMBNAIL_CACHE_MAX_BYTES.
 THUMBNAIL_CACHE_DIR = BASE_DIR / "static" / "thumbnails"
+THUMBNAIL_CACHE_MAX_BYTES = int(os.environ.get("SHOTBUDDY_THUMBNAIL_CACHE_MB", 512)) * 1024 * 1024
 
 # Default thumbnail resolution (width, height)
 THUMBNAIL_SIZE = (240, 180)
 
+# Widths of the responsive variants offered next to the default thumbnail
+# (4:3 boxes, rendered lazily on first request). WebP where Pillow supports
+# it, JPEG otherwise.
+THUMBNAIL_WIDTHS = (120, 240, 480, 960)
+
+# Sources are decoded at reduced scale (JPEG draft mode / ``Image.reduce``)
+# down to this multiple of THUMBNAIL_SIZE before the final LANCZOS resample.
+THUMBNAIL_REDUCING_GAP = 2.0
+
+# Worker processes used for background thumbnail generation, per server
+# process: every gunicorn worker runs its own pool. The default shares the
+# CPU cores between the WEB_CONCURRENCY gunicorn workers (gunicorn's own
+# variable for its worker count, set in deploy/shotbuddy.service).
+WEB_CONCURRENCY = max(int(os.environ.get("WEB_CONCURRENCY", 1)), 1)
+THUMBNAIL_WORKERS = int(os.environ.get("SHOTBUDDY_THUMBNAIL_WORKERS", 0)) or max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+
+# Video poster frames are extracted with a local ffmpeg binary. Each job is
+# its own ffmpeg process, so only a few run at a time.
+FFMPEG_BINARY = os.environ.get("SHOTBUDDY_FFMPEG") or shutil.which("ffmpeg")
+POSTER_FRAME_WORKERS = int(os.environ.get("SHOTBUDDY_POSTER_FRAME_WORKERS", 2))
+# Seconds into the clip at which the poster frame is grabbed (skips fades
+# from black). Clips shorter than this use their first frame.
+POSTER_FRAME_OFFSET = float(os.environ.get("SHOTBUDDY_POSTER_FRAME_OFFSET", 0.5))
+
 # Default root directory where Shotbuddy looks for or creates projects when
 # the user provides a relative path. Override with the SHOTBUDDY_BASE_DIR env
 # variable to keep all projects in a single folder.
 PROJECTS_ROOT = Path(os.environ.get("SHOTBUDDY_BASE_DIR", BASE_DIR))
+
+# Server-side state shared between workers (SQLite database, locks,
+# journals, caches). It belongs on a local disk outside the source tree and
+# the projects (SQLite's WAL mode is not safe on network filesystems), so it
+# defaults to $XDG_STATE_HOME/shotbuddy, one folder per PROJECTS_ROOT.
+# Override with SHOTBUDDY_STATE_DIR.
+_STATE_HOME = Path(os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state")
+_ROOT_TAG = hashlib.sha1(str(PROJECTS_ROOT.resolve()).encode("utf-8")).hexdigest()[:12]
+STATE_DIR = Path(os.environ.get("SHOTBUDDY_STATE_DIR") or _STATE_HOME / "shotbuddy" / _ROOT_TAG).resolve()
+
+# SQLite database (WAL mode) shared by all worker processes: generation
+# counters for projects.json and each project's shots, plus cached shot
+# listings. Listings are also recomputed after SHOT_LISTING_TTL seconds so
+# files copied into a project behind the server's back show up.
+SHARED_STATE_DB = STATE_DIR / "state.db"
+SHOT_LISTING_TTL = float(os.environ.get("SHOTBUDDY_LISTING_TTL", 5))
+
+# Optional filesystem watcher (SHOTBUDDY_WATCH=1): one worker watches the
+# shots/ trees of the current and recent projects (inotify, or polling every
+# WATCH_POLL_INTERVAL seconds elsewhere) and invalidates shots changed by
+# external tools. Bursts are merged until WATCH_DEBOUNCE seconds pass
+# without events (at most WATCH_MAX_DELAY). Changed paths are also appended
+# to WATCH_FEED for deploy/realtime_sync.sh. While it runs, shared listings
+# only expire after WATCHED_LISTING_TTL as a safety net. Paths Shotbuddy
+# wrote itself are remembered for WATCH_OWN_WRITES_TTL seconds so the
+# watcher does not report them a second time.
+WATCH_ENABLED = os.environ.get("SHOTBUDDY_WATCH", "0").lower() in ("1", "true", "yes")
+WATCH_DEBOUNCE = float(os.environ.get("SHOTBUDDY_WATCH_DEBOUNCE", 1.0))
+WATCH_MAX_DELAY = 5.0
+WATCH_POLL_INTERVAL = float(os.environ.get("SHOTBUDDY_WATCH_POLL_INTERVAL", 5))
+WATCH_FEED = Path(os.environ.get("SHOTBUDDY_CHANGES_FEED", STATE_DIR / "changes.feed"))
+WATCHED_LISTING_TTL = 300
+WATCH_OWN_WRITES_TTL = 60
+
+# Live change events (/api/events): how often each worker polls the shared
+# events table, the keep-alive interval of open streams and how many events
+# are retained for clients that reconnect.
+EVENT_POLL_INTERVAL = float(os.environ.get("SHOTBUDDY_EVENT_POLL_INTERVAL", 0.5))
+EVENT_HEARTBEAT = 15
+EVENT_RETENTION = 10000
+
+# Uploads are streamed here and renamed into the project, so it should live
+# on the same filesystem as the projects: by default a hidden folder in
+# PROJECTS_ROOT that is never synced or listed as a project.
+UPLOAD_STAGING_DIR = Path(os.environ.get("SHOTBUDDY_STAGING_DIR", PROJECTS_ROOT / ".shotbuddy" / "staging")).resolve()
+
+# Resumable chunked upload sessions (see upload_sessions). Sessions untouched
+# for UPLOAD_SESSION_TTL seconds are removed.
+UPLOAD_SESSIONS_DIR = UPLOAD_STAGING_DIR / "sessions"
+UPLOAD_SESSION_TTL = int(os.environ.get("SHOTBUDDY_UPLOAD_SESSION_TTL", 24 * 3600))
+
+# Chunk size (bytes) advertised to clients of a new upload session; each
+# chunk is one PUT, hashed and fsynced before it is acknowledged.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Per-shot lock files serialising version allocation across worker processes
+# (see FileHandler._version_lock).
+VERSION_LOCK_DIR = STATE_DIR / "locks"
+
+# Version reservations (see FileHandler._reserve_version) older than this many
+# seconds were left behind by a crashed upload and are released by the next
+# upload to the same shot.
+VERSION_RESERVATION_TIMEOUT = int(os.environ.get("SHOTBUDDY_VERSION_RESERVATION_TIMEOUT", 3600))
+
+# /api/shots/media normally streams files itself. Set SHOTBUDDY_ACCEL_REDIRECT
+# to the prefix of an nginx "internal" location aliased to "/" (see
+# deploy/nginx_shotbuddy.conf) to let nginx send the bytes instead.
+MEDIA_ACCEL_PREFIX = os.environ.get("SHOTBUDDY_ACCEL_REDIRECT", "").rstrip("/")
+
+# How a new upload is published to latest_images/latest_videos: "copy" keeps
+# an independent copy (a reflink, with no extra bytes written, on filesystems
+# that support it); "link" makes a hard link to the versioned WIP file, which
+# an edit of either file then changes too.
+PROMOTE_MODE = os.environ.get("SHOTBUDDY_PROMOTE_MODE", "copy").lower()
+
+# Content deduplication of uploads (see app/services/content_store.py): a
+# re-upload identical to the current version keeps that version, one
+# identical to any other file of the project is stored as a hard link to it.
+DEDUP_UPLOADS = os.environ.get("SHOTBUDDY_DEDUP", "1").lower() in ("1", "true", "yes")
+
+# Threads saving the files of one batch upload (/api/shots/upload/batch).
+# Each thread handles the files of one shot in order.
+BATCH_UPLOAD_WORKERS = int(os.environ.get("SHOTBUDDY_BATCH_UPLOAD_WORKERS", 4))
+
+# Sprite atlases of the shot grid (see app/services/sprite_atlas.py): ready
+# thumbnails are pasted into pages of at most ATLAS_TILES_PER_PAGE tiles,
+# ATLAS_COLUMNS wide, each with a caption strip of ATLAS_LABEL_HEIGHT pixels.
+# Pages are rendered in the background; pages no map refers to any more are
+# deleted after ATLAS_RETENTION seconds.
+ATLAS_CACHE_DIR = STATE_DIR / "atlases"
+ATLAS_TILES_PER_PAGE = int(os.environ.get("SHOTBUDDY_ATLAS_TILES", 200))
+ATLAS_COLUMNS = 10
+ATLAS_LABEL_HEIGHT = 20
+ATLAS_RETENTION = 24 * 3600
+
+# Write-ahead journals of shot renames (see app/services/renumber.py). A
+# rename interrupted by a crash is finished from its journal the next time
+# the project is opened.
+RENUMBER_JOURNAL_DIR = STATE_DIR / "journals"
@@ -1,16 +1,18 @@
-from flask import Blueprint, request, jsonify, render_template, current_app, send_from_directory
+from flask import Blueprint, Response, request, jsonify, render_template, current_app, send_from_directory
 from pathlib import Path
 import json
+import queue
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
-from app.services.shot_manager import get_shot_manager, clear_shot_manager_cache
-from app.services.file_handler import FileHandler
 
 project_bp = Blueprint('project', __name__)
 
+PROJECT_PAGE_SIZE = 100
+MAX_PROJECT_PAGE_SIZE = 500
+
 @project_bp.route("/")
 def index():
     return render_template("index.html")
@@ -26,10 +28,6 @@ def get_current_project():
         project_manager = current_app.config['PROJECT_MANAGER']
         project = project_manager.get_current_project()
         if project:
-            file_handler = FileHandler(project["path"])
-            file_handler.clear_thumbnail_cache()
-            clear_shot_manager_cache()
-            get_shot_manager(project["path"]).get_shots()
             return jsonify({"success": True, "data": project})
         return jsonify({"success": False, "error": "No current project"})
     except Exception as e:
@@ -37,17 +35,33 @@ def get_current_project():
 
 @project_bp.route("/api/project/all")
 def get_all_projects():
-    """Return every project.json under PROJECTS_ROOT for full picker."""
+    """Return a page of the project catalog for the full picker."""
     try:
-        from app.config.constants import PROJECTS_ROOT
-        all_projects = []
-        for project_file in PROJECTS_ROOT.glob("**/project.json"):
-            try:
-                with project_file.open('r') as f:
-                    all_projects.append(json.load(f))
-            except Exception:
-                continue
-        return jsonify({"success": True, "data": all_projects})
+        try:
+            offset = max(int(request.args.get("offset", 0)), 0)
+            limit = min(max(int(request.args.get("limit", PROJECT_PAGE_SIZE)), 1), MAX_PROJECT_PAGE_SIZE)
+        except ValueError:
+            return jsonify({"success": False, "error": "offset and limit must be integers"}), 400
+
+        project_manager = current_app.config['PROJECT_MANAGER']
+        projects, total = project_manager.catalog.list(offset, limit)
+        return jsonify({
+            "success": True,
+            "data": projects,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@project_bp.route("/api/project/reindex", methods=["POST"])
+def reindex_projects():
+    """Rebuild the project catalog by walking PROJECTS_ROOT."""
+    try:
+        project_manager = current_app.config['PROJECT_MANAGER']
+        count = project_manager.catalog.reindex()
+        return jsonify({"success": True, "data": {"count": count}})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -56,13 +70,12 @@ def get_recent_projects():
     try:
         project_manager = current_app.config['PROJECT_MANAGER']
         recent_projects = []
-        stored = project_manager.projects.get('recent_projects', [])
+        stored = list(project_manager.projects.get('recent_projects', []))
 
-        # If no stored recent projects, discover ones under PROJECTS_ROOT
+        # If no stored recent projects, fall back to the catalog
         if not stored:
-            from app.config.constants import PROJECTS_ROOT
-            for project_file in PROJECTS_ROOT.glob('**/project.json'):
-                stored.append(str(project_file.parent))
+            projects, _ = project_manager.catalog.list()
+            stored = [p['path'] for p in projects]
 
         # Deduplicate while preserving order
         seen = set()
@@ -74,13 +87,12 @@ def get_recent_projects():
 
         # Build response list
         for project_path in unique_paths:
-            project_file = Path(project_path) / 'project.json'
-            if project_file.exists():
-                try:
-                    with project_file.open('r') as f:
-                        recent_projects.append(json.load(f))
-                except Exception:
-                    continue
+            try:
+                project = project_manager.read_project_file(project_path)
+            except Exception:
+                continue
+            if project is not None:
+                recent_projects.append(project)
         return jsonify({"success": True, "data": recent_projects})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -117,13 +129,11 @@ def open_project():
 
         if project_file.exists():
             try:
-                with project_file.open('r') as f:
-                    project_info = json.load(f)
+                project_info = project_manager.read_project_file(project_path)
                 # Ensure the stored path reflects the actual location
                 if project_info.get("path") != path_str:
                     project_info["path"] = path_str
-                    with project_file.open('w') as wf:
-                        json.dump(project_info, wf, indent=2)
+                    project_manager.write_project_file(project_path, project_info)
             except Exception as e:
                 return jsonify({"success": False, "error": f"project.json exists but failed to load: {e}"}), 400
         elif shots_dir.exists():
@@ -133,8 +143,7 @@ def open_project():
                 "created": datetime.now().isoformat(),
                 "shots": []
             }
-            with project_file.open('w') as f:
-                json.dump(project_info, f, indent=2)
+            project_manager.write_project_file(project_path, project_info)
         else:
             return jsonify({"success": False, "error": "No recognizable project structure"}), 400
 
@@ -151,17 +160,10 @@ def open_project():
             project_manager.projects['recent_projects'] = project_manager.projects['recent_projects'][:5]
 
         project_manager.save_projects()
+        project_manager.catalog.upsert(project_info)
 
-        # When switching projects, clear cached thumbnails and reset any
-        # cached ShotManager instances to ensure thumbnails are regenerated
-        # for the current project only.
-        file_handler = FileHandler(path_str)
-        file_handler.clear_thumbnail_cache()
-        clear_shot_manager_cache()
-
-        # Generate fresh thumbnails for the newly opened project
-        shot_manager = get_shot_manager(path_str)
-        shot_manager.get_shots()
+        # Thumbnails are content addressed, so nothing needs to be flushed
+        # when switching projects; /api/shots fills in anything missing.
 
         return jsonify({"success": True, "data": project_info})
     except Exception as e:
@@ -203,8 +205,7 @@ def create_project():
         }
 
         # Write the project file first
-        with (project_dir / "project.json").open('w') as f:
-            json.dump(project_info, f, indent=2)
+        project_manager.write_project_file(project_dir, project_info)
 
         # Defensive state update
         path_str = str(resolved_dir)
@@ -219,6 +220,40 @@ def create_project():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@project_bp.route("/api/events")
+def events():
+    """Server-sent events stream of shot changes from every worker."""
+    from app.config.constants import EVENT_HEARTBEAT
+    from app.services.events import get_event_bus
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid Last-Event-ID"}), 400
+
+    bus = get_event_bus()
+    subscription = bus.subscribe(last_id)
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = subscription.get(timeout=EVENT_HEARTBEAT)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            bus.unsubscribe(subscription)
+
+    return Response(stream(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Stop nginx from buffering the stream.
+        "X-Accel-Buffering": "no",
+    })
+
 @project_bp.route("/api/sync/status")
 def sync_status():
     try:
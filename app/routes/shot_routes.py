@@ -1,15 +1,32 @@
-from flask import Blueprint, request, jsonify, send_file, current_app
+from flask import Blueprint, Response, request, jsonify, send_file, current_app
 from pathlib import Path
+from urllib.parse import quote
 import subprocess
+import hashlib
 import logging
+import os
+import re
 
 from app.services.shot_manager import get_shot_manager
 from app.services.file_handler import FileHandler
+from app.services.upload_sessions import UploadSessionStore, UploadOffsetError
+from app.config.constants import (
+    ALLOWED_IMAGE_EXTENSIONS,
+    ALLOWED_VIDEO_EXTENSIONS,
+    MEDIA_ACCEL_PREFIX,
+    UPLOAD_CHUNK_SIZE,
+)
 
 import platform
 
 shot_bp = Blueprint('shot', __name__)
 
+THUMBNAIL_KEY_RE = re.compile(r"^[0-9a-f]{40}$")
+# ``<key>.jpg`` or a responsive variant ``<key>_w<width>.<ext>``.
+THUMBNAIL_NAME_RE = re.compile(r"^(?P<key>[0-9a-f]{40})(?:_w(?P<width>\d+))?\.(?P<ext>jpg|webp)$")
+THUMBNAIL_MAX_AGE = 365 * 24 * 3600
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
 @shot_bp.route("/", strict_slashes=False, methods=["GET"])
 def get_shots():
     try:
@@ -19,8 +36,53 @@ def get_shots():
             return jsonify({"success": False, "error": "No current project"}), 400
 
         shot_manager = get_shot_manager(project["path"])
-        shots = shot_manager.get_shots()
-        return jsonify({"success": True, "data": shots})
+
+        # Paged / projected listing: only the requested rows and fields are
+        # computed. These responses carry no revision.
+        if any(arg in request.args for arg in ("offset", "limit", "fields", "range")):
+            try:
+                offset = max(int(request.args.get("offset", 0)), 0)
+                limit = request.args.get("limit")
+                limit = max(int(limit), 0) if limit is not None else None
+            except ValueError:
+                return jsonify({"success": False, "error": "offset and limit must be integers"}), 400
+            fields = request.args.get("fields")
+            fields = [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "name"] if fields is not None else None
+            name_from, _, name_to = request.args.get("range", "").partition("..")
+            try:
+                shots, total = shot_manager.get_shots_page(
+                    offset, limit, fields, name_from.strip() or None, name_to.strip() or None
+                )
+            except ValueError as e:
+                return jsonify({"success": False, "error": str(e)}), 400
+            return jsonify({"success": True, "data": shots, "total": total, "offset": offset, "limit": limit})
+
+        since = request.args.get("since")
+        try:
+            since = int(since) if since is not None else None
+        except ValueError:
+            return jsonify({"success": False, "error": "since must be an integer revision"}), 400
+
+        if since is not None:
+            listing, changed, removed = shot_manager.get_changes(since)
+        else:
+            listing, changed, removed = shot_manager.get_listing(), None, None
+
+        revision = listing["revision"]
+        if changed is not None:
+            body = {"success": True, "delta": True, "revision": revision, "changed": changed, "removed": removed}
+        else:
+            body = {"success": True, "data": listing["shots"], "revision": revision}
+        response = jsonify(body)
+
+        if revision is not None:
+            # The project is part of the tag so a cached response for one
+            # project never validates against another at the same revision.
+            project_tag = hashlib.sha1(project["path"].encode("utf-8")).hexdigest()[:8]
+            response.set_etag(f"{project_tag}-{revision}")
+            response.headers["Cache-Control"] = "no-cache"
+            response.make_conditional(request)
+        return response
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -71,6 +133,151 @@ def upload_file():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@shot_bp.route("/upload/batch", methods=["POST"])
+def upload_batch():
+    """Upload many files in one request.
+
+    ``file`` is repeated once per file; ``shot_name`` and ``file_type`` are
+    either given once for all files or once per file, in the same order.
+    """
+    try:
+        files = request.files.getlist('file')
+        shot_names = request.form.getlist('shot_name')
+        file_types = request.form.getlist('file_type')
+
+        if not files or not shot_names or not file_types:
+            return jsonify({"success": False, "error": "Missing required parameters"}), 400
+        if any(f.filename == '' for f in files):
+            return jsonify({"success": False, "error": "No file selected"}), 400
+        if len(shot_names) not in (1, len(files)) or len(file_types) not in (1, len(files)):
+            return jsonify({"success": False, "error": "shot_name and file_type must be given once or once per file"}), 400
+        if len(shot_names) == 1:
+            shot_names *= len(files)
+        if len(file_types) == 1:
+            file_types *= len(files)
+
+        project_manager = current_app.config['PROJECT_MANAGER']
+        project = project_manager.get_current_project()
+        if not project:
+            return jsonify({"success": False, "error": "No current project"}), 400
+
+        file_handler = FileHandler(project['path'])
+        results = file_handler.save_files(list(zip(files, shot_names, file_types)))
+        failed = sum(1 for r in results if not r['success'])
+        return jsonify({"success": True, "data": {
+            "results": results,
+            "uploaded": len(results) - failed,
+            "failed": failed,
+        }})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@shot_bp.route("/uploads", methods=["POST"])
+def create_upload_session():
+    """Start a resumable chunked upload."""
+    try:
+        data = request.get_json()
+        shot_name = data.get("shot_name")
+        file_type = data.get("file_type")
+        filename = data.get("filename")
+        size = data.get("size")
+        if not shot_name or not file_type or not filename or not isinstance(size, int):
+            return jsonify({"success": False, "error": "Missing required parameters"}), 400
+
+        project_manager = current_app.config['PROJECT_MANAGER']
+        project = project_manager.get_current_project()
+        if not project:
+            return jsonify({"success": False, "error": "No current project"}), 400
+
+        from app.services.shot_manager import validate_shot_name
+        validate_shot_name(shot_name)
+        FileHandler.validate_file_type(filename, file_type)
+
+        store = UploadSessionStore()
+        session = store.create(project["path"], shot_name, file_type, filename, size)
+        return jsonify({"success": True, "data": {
+            "id": session["id"],
+            "offset": session["offset"],
+            "size": session["size"],
+            "chunk_size": UPLOAD_CHUNK_SIZE,
+        }})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@shot_bp.route("/uploads/<upload_id>", methods=["GET"])
+def get_upload_session(upload_id):
+    """Return the acknowledged offset of an upload session."""
+    try:
+        session = UploadSessionStore().get(upload_id)
+        return jsonify({"success": True, "data": {"offset": session["offset"], "size": session["size"]}})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@shot_bp.route("/uploads/<upload_id>", methods=["PUT"])
+def put_upload_chunk(upload_id):
+    """Append a chunk. The start offset comes from ``Content-Range`` or ``?offset=``."""
+    try:
+        content_range = request.headers.get("Content-Range")
+        if content_range:
+            match = CONTENT_RANGE_RE.match(content_range)
+            if not match:
+                return jsonify({"success": False, "error": "Invalid Content-Range"}), 400
+            offset = int(match.group(1))
+        else:
+            offset = request.args.get("offset", type=int)
+        if offset is None:
+            return jsonify({"success": False, "error": "Chunk offset required"}), 400
+        if request.content_length is None:
+            return jsonify({"success": False, "error": "Content-Length required"}), 411
+
+        session = UploadSessionStore().write_chunk(
+            upload_id,
+            offset,
+            request.stream,
+            request.content_length,
+            sha256=request.headers.get("X-Chunk-SHA256"),
+        )
+        return jsonify({"success": True, "data": {"offset": session["offset"], "size": session["size"]}})
+    except UploadOffsetError as e:
+        return jsonify({"success": False, "error": str(e), "data": {"offset": e.expected}}), 409
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@shot_bp.route("/uploads/<upload_id>/finalize", methods=["POST"])
+def finalize_upload(upload_id):
+    """Version and publish a completed upload like ``/upload`` does."""
+    try:
+        from werkzeug.datastructures import FileStorage
+
+        with UploadSessionStore().open_completed(upload_id) as (session, data_path):
+            file_handler = FileHandler(session["project"])
+            with data_path.open("rb") as stream:
+                upload = FileStorage(stream=stream, filename=session["filename"])
+                result = file_handler.save_file(upload, session["shot_name"], session["file_type"])
+        return jsonify({"success": True, "data": result})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@shot_bp.route("/uploads/<upload_id>", methods=["DELETE"])
+def abort_upload(upload_id):
+    try:
+        UploadSessionStore().discard(upload_id)
+        return jsonify({"success": True})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @shot_bp.route("/notes", methods=["POST"])
 def save_shot_notes():
     try:
@@ -116,6 +323,40 @@ def rename_shot():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@shot_bp.route("/renumber", methods=["POST"])
+def renumber_shots():
+    """Rename many shots at once.
+
+    The body is either ``{"mapping": {old: new, ...}}`` or ``{"start": 10,
+    "step": 10}`` to renumber every shot in order.
+    """
+    try:
+        data = request.get_json() or {}
+        mapping = data.get("mapping")
+        if mapping is not None and not (
+            isinstance(mapping, dict) and all(isinstance(v, str) for v in mapping.values())
+        ):
+            return jsonify({"success": False, "error": "mapping must map old to new shot names"}), 400
+        try:
+            start = int(data.get("start", 10))
+            step = int(data.get("step", 10))
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "start and step must be integers"}), 400
+
+        project_manager = current_app.config['PROJECT_MANAGER']
+        project = project_manager.get_current_project()
+        if not project:
+            return jsonify({"success": False, "error": "No current project"}), 400
+
+        shot_manager = get_shot_manager(project["path"])
+        renamed, shots = shot_manager.renumber_shots(mapping, start, step)
+
+        return jsonify({"success": True, "data": {"renamed": renamed, "shots": shots}})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @shot_bp.route("/create-between", methods=["POST"])
 def create_shot_between():
     try:
@@ -136,21 +377,178 @@ def create_shot_between():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+@shot_bp.route("/thumbnails/status")
+def thumbnail_status():
+    """Report the state of queued thumbnails (``?keys=key1,key2``)."""
+    try:
+        from app.services.thumbnail_cache import ThumbnailCache
+        from app.services.thumbnail_worker import get_thumbnail_queue, READY
+
+        keys = [k for k in request.args.get("keys", "").split(",") if THUMBNAIL_KEY_RE.match(k)]
+        queue = get_thumbnail_queue()
+        data = {}
+        for key in keys:
+            status = queue.status(key)
+            data[key] = {
+                "status": status,
+                "url": ThumbnailCache.url_for_key(key) if status == READY else None,
+                "srcset": ThumbnailCache.srcset_for_key(key) if status == READY else None,
+            }
+        return jsonify({"success": True, "data": data})
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
 @shot_bp.route("/thumbnail/<path:filepath>")
 def serve_thumbnail(filepath):
-    """Serve a thumbnail from the cache directory."""
+    """Serve a thumbnail or variant from the cache, queueing it if missing.
+
+    nginx serves ``/static/thumbnails/`` itself and only falls back to this
+    route for files that are missing: evicted thumbnails and variants that
+    were never requested before.  Those are rendered by the thumbnail
+    workers, never on the request thread; meanwhile a variant is answered
+    with the base thumbnail and anything else with ``503``, both uncached.
+    """
     try:
-        from app.config.constants import THUMBNAIL_CACHE_DIR
-
-        thumb_path = THUMBNAIL_CACHE_DIR / Path(filepath).name
-        thumb_dir = THUMBNAIL_CACHE_DIR.resolve()
-        thumb_path = thumb_path.resolve()
+        from app.services.thumbnail_cache import get_thumbnail_cache
+        from app.services.thumbnail_worker import get_thumbnail_queue, FAILED
 
-        if not str(thumb_path).startswith(str(thumb_dir)):
+        match = THUMBNAIL_NAME_RE.match(filepath)
+        if not match:
             return "Invalid path", 400
+        key = match["key"]
+        width = int(match["width"]) if match["width"] else None
+
+        cache = get_thumbnail_cache()
+        queue = get_thumbnail_queue()
+        if width is None:
+            thumb_path = cache.lookup(key)
+            status = None if thumb_path else queue.restore(key)
+        else:
+            if cache.variant_name(key, width) != filepath:
+                return "File not found", 404
+            thumb_path = cache.lookup_variant(key, width)
+            status = None if thumb_path else queue.request_variant(key, width)
+
+        if thumb_path is None:
+            if status is None or status == FAILED:
+                return "File not found", 404
+            base_path = cache.lookup(key) if width is not None else None
+            if base_path is not None:
+                response = send_file(base_path, mimetype="image/jpeg", max_age=0)
+            else:
+                response = Response("Thumbnail is being rendered", status=503)
+                response.headers["Retry-After"] = "1"
+            response.cache_control.no_store = True
+            return response
+
+        # Keys change with their source, so the content never does.
+        response = send_file(thumb_path, max_age=THUMBNAIL_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    except Exception as e:
+        return str(e), 500
+
+@shot_bp.route("/atlas", methods=["GET"])
+def get_atlas():
+    """Return the sprite atlas map of the current project's grid."""
+    try:
+        from app.services.sprite_atlas import SpriteAtlas
 
-        if thumb_path.is_file():
-            return send_file(str(thumb_path))
-        return "File not found", 404
+        project_manager = current_app.config['PROJECT_MANAGER']
+        project = project_manager.get_current_project()
+        if not project:
+            return jsonify({"success": False, "error": "No current project"}), 400
+
+        listing = get_shot_manager(project["path"]).get_listing()
+        atlas = SpriteAtlas(project["path"]).get(listing)
+        response = jsonify({"success": True, "data": atlas})
+
+        revision = listing["revision"]
+        if revision is not None and listing.get("complete") and not atlas["pending"]:
+            project_tag = hashlib.sha1(project["path"].encode("utf-8")).hexdigest()[:8]
+            response.set_etag(f"atlas-{project_tag}-{revision}")
+            response.headers["Cache-Control"] = "no-cache"
+            response.make_conditional(request)
+        return response
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@shot_bp.route("/atlas/<name>.jpg")
+def serve_atlas_page(name):
+    """Serve an atlas page. Page names are content hashes, so they never change."""
+    try:
+        from app.services.sprite_atlas import SpriteAtlas
+
+        if not THUMBNAIL_KEY_RE.match(name):
+            return "Invalid path", 400
+        page_path = SpriteAtlas.page_path(name)
+        if not page_path.is_file():
+            return "File not found", 404
+        response = send_file(page_path, mimetype="image/jpeg", max_age=THUMBNAIL_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
     except Exception as e:
         return str(e), 500
+
+@shot_bp.route("/contact-sheet", methods=["GET"])
+def download_contact_sheet():
+    """Download the atlas pages of the current project as a PDF contact sheet."""
+    try:
+        from app.services.sprite_atlas import SpriteAtlas
+
+        project_manager = current_app.config['PROJECT_MANAGER']
+        project = project_manager.get_current_project()
+        if not project:
+            return jsonify({"success": False, "error": "No current project"}), 400
+
+        listing = get_shot_manager(project["path"]).get_listing()
+        pdf = SpriteAtlas(project["path"]).contact_sheet(listing)
+        response = Response(pdf, mimetype="application/pdf")
+        filename = f"{project.get('name') or Path(project['path']).name}_contact_sheet.pdf"
+        response.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+        return response
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@shot_bp.route("/media/<path:relpath>")
+def serve_media(relpath):
+    """Serve an asset of the current project (``relpath`` is relative to it).
+
+    Byte ranges, ``ETag`` and ``Last-Modified`` are handled by ``send_file``
+    (gunicorn hands whole files to ``sendfile``).  With
+    ``SHOTBUDDY_ACCEL_REDIRECT`` set, nginx serves the bytes instead.
+    """
+    try:
+        project = current_app.config['PROJECT_MANAGER'].get_current_project()
+        if not project:
+            return jsonify({"success": False, "error": "No current project"}), 400
+
+        project_root = Path(project['path']).resolve()
+        media_path = (project_root / relpath).resolve()
+        # Same rule as FileHandler._validate_path_within_project, limited to
+        # the shots/ tree so project.json and friends are never served.
+        shots_root = str(project_root / 'shots') + os.sep
+        if not str(media_path).startswith(shots_root):
+            return jsonify({"success": False, "error": "Invalid path"}), 400
+        if media_path.suffix.lower() not in ALLOWED_IMAGE_EXTENSIONS | ALLOWED_VIDEO_EXTENSIONS:
+            return jsonify({"success": False, "error": "Not a media file"}), 400
+        if not media_path.is_file():
+            return jsonify({"success": False, "error": "File not found"}), 404
+
+        if MEDIA_ACCEL_PREFIX:
+            # The internal nginx location aliases "/", so the validated
+            # absolute path is passed on as is.
+            response = Response(status=200)
+            response.headers['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX + quote(media_path.as_posix())
+            # Let nginx pick the type from the extension.
+            del response.headers['Content-Type']
+            return response
+
+        # latest_* files are replaced in place, so clients revalidate.
+        return send_file(media_path, conditional=True, etag=True, max_age=0)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
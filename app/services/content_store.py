@@ -0,0 +1,90 @@
+"""Content-addressed lookup of uploaded versions.
+
+Every versioned file written by ``FileHandler.save_file`` is recorded with
+the SHA-256 of its bytes in a ``content`` table of the shared state
+database.  A later upload with the same digest is either recognised as a
+re-upload of the current version (nothing is written) or stored as a hard
+link to the existing file instead of a second copy.
+
+Rows are keyed by ``(project, path)`` and looked up through an index on
+``(project, digest)``, so a lookup costs the same however many versions a
+project has.  A row is only trusted while the file still has the size and
+mtime it was recorded with; rows of moved, deleted or edited files are
+dropped when they are next looked up.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+from pathlib import Path
+
+from app.services.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    project TEXT NOT NULL,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (project, path)
+);
+CREATE INDEX IF NOT EXISTS content_by_digest ON content (project, digest);
+"""
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(fileobj):
+    """Return the SHA-256 hex digest of the rest of ``fileobj``."""
+    digest = hashlib.sha256()
+    for block in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+class ContentStore:
+    """Digest -> file lookup for the versioned files of one project."""
+
+    def __init__(self, project_path, state=None):
+        self.project_path = Path(project_path).resolve()
+        self.project = str(self.project_path)
+        self.state = state or get_shared_state()
+        self.state.connection().executescript(SCHEMA)
+
+    def _relative(self, path):
+        return Path(path).resolve().relative_to(self.project_path).as_posix()
+
+    def find(self, digest):
+        """Return the existing files of the project whose content is ``digest``."""
+        conn = self.state.connection()
+        rows = conn.execute(
+            'SELECT path, size, mtime_ns FROM content WHERE project = ? AND digest = ?',
+            (self.project, digest),
+        ).fetchall()
+        found, stale = [], []
+        for rel, size, mtime_ns in rows:
+            path = self.project_path / rel
+            try:
+                st = os.stat(path)
+            except OSError:
+                stale.append((self.project, rel))
+                continue
+            if st.st_size == size and st.st_mtime_ns == mtime_ns:
+                found.append(path)
+            else:
+                stale.append((self.project, rel))
+        if stale:
+            conn.executemany('DELETE FROM content WHERE project = ? AND path = ?', stale)
+        return found
+
+    def add(self, path, digest):
+        """Record that ``path`` (inside the project) holds ``digest``."""
+        st = os.stat(path)
+        self.state.connection().execute(
+            'INSERT OR REPLACE INTO content (project, path, digest, size, mtime_ns) VALUES (?, ?, ?, ?, ?)',
+            (self.project, self._relative(path), digest, st.st_size, st.st_mtime_ns),
+        )
@@ -0,0 +1,186 @@
+"""Change events for live updates (``/api/events``).
+
+Mutations publish small events (``upload``, ``shot_created``,
+``shot_renamed``, ``shots_renumbered``, ``notes``, ``thumbnail``, ``files_changed``) into an ``events`` table of the
+shared state database, so an event published by one gunicorn worker reaches
+clients connected to any other.  Each worker runs a single poller thread
+that reads new rows and fans them out to its own subscribers (one queue per
+open event stream); no external broker is involved.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import threading
+import time
+
+from flask import has_request_context, request
+
+from app.config.constants import EVENT_POLL_INTERVAL, EVENT_RETENTION
+from app.services.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    project TEXT,
+    shot TEXT,
+    data TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+# Request header the frontend uses to recognise (and skip) its own events.
+CLIENT_HEADER = 'X-Shotbuddy-Client'
+
+# Events replayed at most when a client reconnects with Last-Event-ID.  A
+# client that missed more (or whose events were already pruned) gets a single
+# ``reset`` event instead and refetches the listing.
+MAX_REPLAY = 500
+
+
+class Subscription:
+    """Queue of events for one open stream."""
+
+    def __init__(self, last_id):
+        self.last_id = last_id
+        self.queue = queue.Queue()
+
+    def get(self, timeout=None):
+        """Return the next event dict; raises ``queue.Empty`` on timeout."""
+        return self.queue.get(timeout=timeout)
+
+    def _deliver(self, events):
+        for event in events:
+            if event['id'] > self.last_id:
+                self.queue.put(event)
+                self.last_id = event['id']
+
+
+class EventBus:
+    """Publishes events to the shared database and fans them out locally."""
+
+    def __init__(self, state=None, poll_interval=EVENT_POLL_INTERVAL, retention=EVENT_RETENTION):
+        self.state = state or get_shared_state()
+        self.state.connection().executescript(SCHEMA)
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._poller = None
+        self._cursor = 0
+        self._published = 0
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+    def publish(self, event_type, project=None, shot=None, **data):
+        """Store an event and return its id."""
+        if has_request_context():
+            data.setdefault('origin', request.headers.get(CLIENT_HEADER))
+        conn = self.state.connection()
+        cursor = conn.execute(
+            'INSERT INTO events (type, project, shot, data, created) VALUES (?, ?, ?, ?, ?)',
+            (event_type, str(project) if project else None, shot, json.dumps(data), time.time()),
+        )
+        event_id = cursor.lastrowid
+        self._published += 1
+        if self._published % 100 == 0:
+            conn.execute('DELETE FROM events WHERE id <= ?', (event_id - self.retention,))
+        return event_id
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def latest_id(self):
+        row = self.state.connection().execute('SELECT MAX(id) FROM events').fetchone()
+        return row[0] or 0
+
+    def read_since(self, last_id, limit=MAX_REPLAY):
+        rows = self.state.connection().execute(
+            'SELECT id, type, project, shot, data, created FROM events WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, limit),
+        ).fetchall()
+        return [
+            {'id': r[0], 'type': r[1], 'project': r[2], 'shot': r[3], 'created': r[5], **json.loads(r[4])}
+            for r in rows
+        ]
+
+    # ------------------------------------------------------------------
+    # Local fan-out
+    # ------------------------------------------------------------------
+    def subscribe(self, last_id=None):
+        """Open a subscription; with ``last_id`` missed events are replayed first."""
+        with self._lock:
+            if self._poller is None or not self._poller.is_alive():
+                self._cursor = self.latest_id()
+                self._poller = threading.Thread(target=self._poll_loop, name='event-poller', daemon=True)
+                self._poller.start()
+            sub = Subscription(self._cursor if last_id is None else last_id)
+            if last_id is not None and last_id < self._cursor:
+                missed = self._cursor - last_id
+                events = self.read_since(last_id, limit=min(missed, MAX_REPLAY))
+                # Ids are consecutive, so a gap at the start means pruned events.
+                if missed > MAX_REPLAY or not events or events[0]['id'] != last_id + 1:
+                    sub.queue.put(self._reset_event())
+                else:
+                    sub._deliver(events)
+                sub.last_id = self._cursor
+            elif last_id is not None and last_id > self._cursor and last_id > self.latest_id():
+                # An id this database never issued (e.g. the state dir was
+                # recreated); ids just ahead of the poller are simply waited for.
+                sub.queue.put(self._reset_event())
+                sub.last_id = self._cursor
+            self._subscribers.add(sub)
+        return sub
+
+    def _reset_event(self):
+        """Tell a client its missed events cannot be replayed; it refetches instead."""
+        return {'id': self._cursor, 'type': 'reset', 'project': None, 'shot': None, 'created': time.time()}
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+                try:
+                    events = self.read_since(self._cursor)
+                except Exception as e:
+                    logger.warning("Failed to read events: %s", e)
+                    continue
+                if not events:
+                    continue
+                self._cursor = events[-1]['id']
+                for sub in self._subscribers:
+                    sub._deliver(events)
+
+
+_default_bus = None
+_default_bus_lock = threading.Lock()
+
+
+def get_event_bus():
+    """Return the process-wide ``EventBus``."""
+    global _default_bus
+    if _default_bus is None:
+        with _default_bus_lock:
+            if _default_bus is None:
+                _default_bus = EventBus()
+    return _default_bus
+
+
+def publish(event_type, project=None, shot=None, **data):
+    """Publish an event; failures are logged and never break the caller."""
+    try:
+        get_event_bus().publish(event_type, project, shot, **data)
+    except Exception as e:
+        logger.warning("Failed to publish %s event: %s", event_type, e)
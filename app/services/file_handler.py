@@ -1,20 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import shutil
-from PIL import Image
+import hashlib
 import logging
+import os
+import time
 from flask import current_app
 
 logger = logging.getLogger(__name__)
-from app.services.shot_manager import get_shot_manager
+from app.services.content_store import ContentStore
+from app.services.events import publish
+from app.services.fs_watcher import note_writes
+from app.services.shot_manager import get_shot_manager, validate_shot_name
+from app.services.shot_scanner import VERSIONED_RE, list_files, reservation_marker, reserved_name
+from app.services.thumbnail_cache import get_thumbnail_cache, ThumbnailCache
+from app.services.thumbnail_worker import get_thumbnail_queue, READY
+from app.services.upload_staging import link_duplicate, promote, store_upload, upload_digest
 from app.config.constants import (
     ALLOWED_IMAGE_EXTENSIONS,
     ALLOWED_VIDEO_EXTENSIONS,
-    THUMBNAIL_CACHE_DIR,
+    BATCH_UPLOAD_WORKERS,
+    DEDUP_UPLOADS,
     THUMBNAIL_SIZE,
+    VERSION_LOCK_DIR,
+    VERSION_RESERVATION_TIMEOUT,
 )
-
-# Ensure the thumbnail cache directory exists.
-THUMBNAIL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+from app.utils import file_lock
 
 class FileHandler:
     def __init__(self, project_path):
@@ -36,6 +46,9 @@ class FileHandler:
         # Optional storage service for rclone syncs
         self.storage_service = current_app.config.get('STORAGE_SERVICE') if current_app else None
 
+        # Digest -> existing file lookup for deduplicating uploads
+        self.content_store = ContentStore(self.project_path) if DEDUP_UPLOADS else None
+
     def _validate_path_within_project(self, file_path):
         """Ensure file_path is within the project directory."""
         try:
@@ -52,21 +65,12 @@ class FileHandler:
 
     def clear_thumbnail_cache(self):
         """Remove all files from the thumbnail cache."""
-        if not THUMBNAIL_CACHE_DIR.exists():
-            THUMBNAIL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
-            return
-
-        for thumb in THUMBNAIL_CACHE_DIR.iterdir():
-            if thumb.is_file():
-                try:
-                    thumb.unlink()
-                except Exception as e:
-                    logger.warning("Could not delete thumbnail %s: %s", thumb, e)
+        get_thumbnail_cache().clear()
 
-    def save_file(self, file, shot_name, file_type):
-        """Save uploaded file with proper versioning"""
-        shot_dir = self.wip_dir / shot_name
-        file_ext = Path(file.filename).suffix.lower()
+    @staticmethod
+    def validate_file_type(filename, file_type):
+        """Check ``filename`` is allowed for ``file_type`` and return its extension."""
+        file_ext = Path(filename).suffix.lower()
 
         if file_type == 'image' and file_ext not in ALLOWED_IMAGE_EXTENSIONS:
             raise ValueError(f"Invalid image format. Allowed: {', '.join(ALLOWED_IMAGE_EXTENSIONS)}")
@@ -74,6 +78,78 @@ class FileHandler:
             raise ValueError(f"Invalid video format. Allowed: {', '.join(ALLOWED_VIDEO_EXTENSIONS)}")
         elif file_type in {'driver', 'target', 'result'} and file_ext not in ALLOWED_VIDEO_EXTENSIONS:
             raise ValueError(f"Invalid video format. Allowed: {', '.join(ALLOWED_VIDEO_EXTENSIONS)}")
+        return file_ext
+
+    def save_file(self, file, shot_name, file_type):
+        """Save uploaded file with proper versioning"""
+        result, changed = self._save(file, shot_name, file_type)
+        if changed:
+            get_shot_manager(self.project_path).invalidate(shot_name)
+            publish('upload', self.project_path, shot_name, file_type=file_type, version=result['version'])
+
+            # Queue only the touched paths for the next remote sync (fire-and-forget)
+            if self.storage_service:
+                self.storage_service.mark_dirty(*changed)
+        return result
+
+    def save_files(self, uploads):
+        """Save a batch of ``(file, shot_name, file_type)`` uploads.
+
+        Uploads to the same shot are saved one after another, in order, so
+        their versions are consecutive; different shots are saved in parallel
+        on up to ``BATCH_UPLOAD_WORKERS`` threads.  The shot listing, the live
+        event and the remote sync are triggered once for the whole batch.
+
+        Returns one result per upload, in order; failed uploads have
+        ``success`` false and an ``error`` instead of the upload metadata.
+        """
+        by_shot = {}
+        for i, (_file, shot_name, _file_type) in enumerate(uploads):
+            by_shot.setdefault(shot_name, []).append(i)
+
+        results = [None] * len(uploads)
+        changed = []
+        changed_shots = set()
+        app = current_app._get_current_object()
+
+        def save_shot(indices):
+            with app.app_context():
+                for i in indices:
+                    file, shot_name, file_type = uploads[i]
+                    try:
+                        validate_shot_name(shot_name)
+                        result, paths = self._save(file, shot_name, file_type)
+                    except Exception as e:
+                        logger.warning("Batch upload of %s to %s failed: %s", file.filename, shot_name, e)
+                        results[i] = {'success': False, 'filename': file.filename, 'shot_name': shot_name, 'error': str(e)}
+                        continue
+                    results[i] = {'success': True, 'filename': file.filename, 'shot_name': shot_name,
+                                  'file_type': file_type, **result}
+                    if paths:
+                        changed.extend(paths)
+                        changed_shots.add(shot_name)
+
+        workers = max(1, min(BATCH_UPLOAD_WORKERS, len(by_shot)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-upload') as pool:
+            # Consume the iterator so exceptions outside save_shot surface here.
+            list(pool.map(save_shot, by_shot.values()))
+
+        if changed_shots:
+            get_shot_manager(self.project_path).invalidate(*changed_shots)
+            publish('upload', self.project_path, None, shots=sorted(changed_shots),
+                    count=sum(1 for r in results if r['success']))
+            if self.storage_service:
+                self.storage_service.mark_dirty(*changed)
+        return results
+
+    def _save(self, file, shot_name, file_type):
+        """Store ``file`` and publish it; return ``(result, changed_paths)``.
+
+        ``changed_paths`` is empty when nothing on disk changed (a duplicate
+        of the current version).
+        """
+        shot_dir = self.wip_dir / shot_name
+        file_ext = self.validate_file_type(file.filename, file_type)
 
         if not shot_dir.exists():
             get_shot_manager(self.project_path).create_shot_structure(shot_name)
@@ -82,59 +158,182 @@ class FileHandler:
         shot_dir = self._validate_path_within_project(shot_dir)
 
         if file_type in {'image', 'video'}:
-            wip_dir = shot_dir / ('images' if file_type == 'image' else 'videos')
-            version = self.get_next_version(wip_dir, shot_name, file_ext)
-
-            wip_filename = f'{shot_name}_v{version:03d}{file_ext}'
-            wip_path = wip_dir / wip_filename
-            wip_path = self._validate_path_within_project(wip_path)
-            file.save(str(wip_path))
-
+            dest_dir = shot_dir / ('images' if file_type == 'image' else 'videos')
+            base = shot_name
             final_dir = self.latest_images_dir if file_type == 'image' else self.latest_videos_dir
-            final_filename = f'{shot_name}{file_ext}'
-            final_path = final_dir / final_filename
-            final_path = self._validate_path_within_project(final_path)
-
-            for existing_file in final_dir.glob(f'{shot_name}.*'):
-                existing_file.unlink()
-
-            shutil.copy2(str(wip_path), str(final_path))
         else:
             # lipsync driver/target/result
             dest_dir = shot_dir / 'lipsync'
             dest_dir.mkdir(exist_ok=True)
             dest_dir = self._validate_path_within_project(dest_dir)
             base = f'{shot_name}_{file_type}'
-            version = self.get_next_version(dest_dir, base, file_ext)
-            wip_filename = f'{base}_v{version:03d}{file_ext}'
-            wip_path = dest_dir / wip_filename
-            wip_path = self._validate_path_within_project(wip_path)
-            file.save(str(wip_path))
-
-            final_path = dest_dir / f'{base}{file_ext}'
-            final_path = self._validate_path_within_project(final_path)
-            for existing_file in dest_dir.glob(f'{base}.*'):
-                if existing_file != wip_path:
-                    existing_file.unlink()
-
-            shutil.copy2(str(wip_path), str(final_path))
-
-        thumbnail_path = None
-        if file_type == 'image':
-            thumbnail_path = self.create_thumbnail(str(final_path), shot_name)
+            final_dir = dest_dir
+
+        wip_path, version, duplicate = self._store_version(file, dest_dir, base, file_ext)
+        final_path = self._validate_path_within_project(final_dir / f'{base}{file_ext}')
+
+        removed = []
+        promoted = False
+        if not (duplicate and final_path.exists()):
+            with self._version_lock(dest_dir, base):
+                # Concurrent uploads may finish out of order; never replace
+                # the published file with an older version.
+                if not self._newer_version_stored(dest_dir, base, version):
+                    for existing_file in final_dir.glob(f'{base}.*'):
+                        get_thumbnail_cache().discard(existing_file)
+                        existing_file.unlink(missing_ok=True)
+                        removed.append(existing_file)
+
+                    promote(wip_path, final_path)
+                    promoted = True
+
+        # Thumbnails (poster frames for videos) are rendered by the background
+        # worker pools so the upload returns as soon as the file is on disk.
+        thumbnail_key, thumbnail_status = get_thumbnail_queue().request(final_path if promoted or duplicate else wip_path)
 
         result = {
             'wip_path': str(wip_path),
             'final_path': str(final_path),
             'version': version,
-            'thumbnail': f"static/thumbnails/{Path(thumbnail_path).name}" if thumbnail_path else None
+            'duplicate': duplicate,
+            'thumbnail': ThumbnailCache.url_for_key(thumbnail_key).lstrip('/') if thumbnail_status == READY else None,
+            'thumbnail_srcset': ThumbnailCache.srcset_for_key(thumbnail_key) if thumbnail_status == READY else None,
+            'thumbnail_key': thumbnail_key,
+            'thumbnail_status': thumbnail_status,
         }
 
-        # Trigger remote sync (fire-and-forget)
-        if self.storage_service:
-            self.storage_service.trigger_sync()
-
-        return result
+        if duplicate and not removed:
+            changed = []
+        else:
+            changed = [wip_path, *([final_path] if promoted else []), *removed]
+            # Before the batch this upload may belong to is over, so the
+            # watcher never reports it as an external change.
+            note_writes(*changed)
+        return result, changed
+
+    def _store_version(self, file, dest_dir, base, file_ext):
+        """Store ``file`` as the next version of ``base`` in ``dest_dir``.
+
+        Returns ``(wip_path, version, duplicate)``.  An upload identical to the
+        current version is not stored again: ``duplicate`` is true and the
+        current version is returned.  One identical to any other file of the
+        project becomes a hard link to that file.
+        """
+        matches = []
+        if self.content_store:
+            digest = upload_digest(file)
+            matches = self.content_store.find(digest)
+
+        with self._version_lock(dest_dir, base):
+            self._expire_reservations(dest_dir, base)
+            version = self.get_next_version(dest_dir, base, file_ext)
+            current = dest_dir / f'{base}_v{version - 1:03d}{file_ext}'
+            if version > 1 and current in matches:
+                logger.info("Upload is identical to %s, keeping version %d", current.name, version - 1)
+                return current, version - 1, True
+            version, wip_path = self._reserve_version(dest_dir, base, file_ext, version)
+
+        # The bytes are written outside the lock, into a hidden file that is
+        # renamed over the reservation once complete.  The reserved file keeps
+        # other uploads off this version meanwhile, and listings skip it while
+        # its marker exists (see ``scan_shot``).
+        try:
+            if not (matches and link_duplicate(matches[0], wip_path)):
+                store_upload(file, wip_path)
+        except BaseException:
+            wip_path.unlink(missing_ok=True)
+            self._release_reservation(wip_path)
+            raise
+        self._release_reservation(wip_path)
+        if self.content_store:
+            self.content_store.add(wip_path, digest)
+        return wip_path, version, False
+
+    @staticmethod
+    def _version_lock(dest_dir, base):
+        """Lock serialising version allocation for ``base`` in ``dest_dir``.
+
+        Only held while a version number is picked and while the newest
+        version is published, so uploads to different shots never wait for
+        each other.
+        """
+        VERSION_LOCK_DIR.mkdir(parents=True, exist_ok=True)
+        key = hashlib.sha1(str(Path(dest_dir) / base).encode('utf-8')).hexdigest()
+        return file_lock(VERSION_LOCK_DIR / f'{key}.lock')
+
+    def _reserve_version(self, dest_dir, base, file_ext, version):
+        """Reserve ``version`` (or the next free one) for an upload in progress.
+
+        The reservation is the empty file of the version, created with
+        ``O_EXCL`` (which also keeps off writers that do not take the version
+        lock: other tools, older servers), plus its hidden marker created
+        first, so the empty file is never mistaken for a stored version, even
+        a genuinely empty one.  Returns ``(version, path)``.
+        """
+        while True:
+            wip_path = self._validate_path_within_project(dest_dir / f'{base}_v{version:03d}{file_ext}')
+            marker = wip_path.with_name(reservation_marker(wip_path.name))
+            try:
+                os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            except FileExistsError:
+                version += 1
+                continue
+            try:
+                os.close(os.open(wip_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                return version, wip_path
+            except FileExistsError:
+                marker.unlink(missing_ok=True)
+                version += 1
+            except BaseException:
+                marker.unlink(missing_ok=True)
+                raise
+
+    @staticmethod
+    def _release_reservation(wip_path):
+        wip_path.with_name(reservation_marker(wip_path.name)).unlink(missing_ok=True)
+
+    @staticmethod
+    def _expire_reservations(dest_dir, base):
+        """Release the reservations of ``base`` left behind by crashed uploads.
+
+        A reservation whose marker is older than ``VERSION_RESERVATION_TIMEOUT``
+        is dropped together with its file if that is still empty, freeing the
+        version number; a file that was stored completely is kept and becomes
+        visible.  Called with the version lock held.
+        """
+        cutoff = time.time() - VERSION_RESERVATION_TIMEOUT
+        for name in list_files(dest_dir):
+            reserved = reserved_name(name)
+            match = reserved and VERSIONED_RE.match(reserved)
+            if not (match and match['prefix'] == base):
+                continue
+            marker = dest_dir / name
+            try:
+                if marker.stat().st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            try:
+                if (dest_dir / reserved).stat().st_size == 0:
+                    (dest_dir / reserved).unlink()
+            except FileNotFoundError:
+                pass
+            logger.warning("Releasing stale reservation of %s", dest_dir / reserved)
+            marker.unlink(missing_ok=True)
+
+    @staticmethod
+    def _newer_version_stored(dest_dir, base, version):
+        """Whether a version of ``base`` above ``version`` is fully stored.
+
+        Versions still being uploaded are reserved and do not count; their
+        content only appears, complete, when it is renamed over the
+        reservation.
+        """
+        for name in list_files(dest_dir, skip_reserved=True):
+            match = VERSIONED_RE.match(name)
+            if match and match['prefix'] == base and int(match['version']) > version:
+                return True
+        return False
 
     def get_next_version(self, wip_dir, shot_name, file_ext):
         if not wip_dir.exists():
@@ -163,27 +362,8 @@ class FileHandler:
     def create_thumbnail(self, image_path, shot_name, size=THUMBNAIL_SIZE):
         """Create thumbnail for image and save it to the central cache"""
         try:
-            with Image.open(image_path) as img:
-                img.thumbnail(size, Image.Resampling.LANCZOS)
-
-                # Unique thumbnail name
-                image_path = Path(image_path)
-                thumb_filename = f"{shot_name}_{image_path.stem}_thumb.jpg"
-                thumb_path = THUMBNAIL_CACHE_DIR / thumb_filename
-
-                if thumb_path.exists():
-                    thumb_path.unlink()
-
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    background = Image.new('RGB', img.size, (64, 64, 64))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if 'A' in img.mode else None)
-                    img = background
-
-                img.save(str(thumb_path), 'JPEG', quality=85)
-                return str(thumb_path)
-
+            thumb_path = get_thumbnail_cache().get(image_path, size)
+            return str(thumb_path) if thumb_path else None
         except Exception as e:
             logger.warning("Error creating thumbnail: %s", e)
             return None
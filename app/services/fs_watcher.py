@@ -0,0 +1,511 @@
+"""Filesystem watcher for changes made outside Shotbuddy.
+
+ComfyUI exports, files dropped over SMB or ``deploy/restore.sh`` write
+straight into ``shots/``, bypassing ``FileHandler``.  With
+``SHOTBUDDY_WATCH=1`` one worker process (whichever holds
+``STATE_DIR/watcher.lock``) watches the ``shots/`` tree of the current and
+recent projects:
+
+* on Linux through inotify (via ``ctypes``, no extra dependency), with one
+  watch per folder down to ``wip/<shot>/<sub>``;
+* elsewhere, or when inotify is unavailable, by polling the shot signatures
+  (see ``ShotIndex``) and the ``latest_*`` folders.
+
+Events are collected per project and flushed once the burst is over: the
+affected shots are invalidated (so every worker's listing is rebuilt),
+rescanned (which queues their thumbnails), announced as a ``files_changed``
+event and their paths are handed to ``StorageService.mark_dirty`` and
+appended to ``WATCH_FEED`` for ``deploy/realtime_sync.sh``.
+
+Shotbuddy's own writers already do all of that for the files they touch,
+so they record them with :func:`note_writes` (in the shared state, as the
+writer is often another worker).  A changed path that is still in the state
+it was noted in is the app's own write: it only goes to the feed.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import stat
+import struct
+import sys
+import threading
+import time
+
+from app.config.constants import (
+    STATE_DIR,
+    WATCH_DEBOUNCE,
+    WATCH_FEED,
+    WATCH_ENABLED,
+    WATCH_MAX_DELAY,
+    WATCH_OWN_WRITES_TTL,
+    WATCH_POLL_INTERVAL,
+)
+from app.services.shared_state import get_shared_state
+from app.services.shot_index import ShotIndex
+from app.utils import try_lock
+
+logger = logging.getLogger(__name__)
+
+LATEST_DIRS = ('latest_images', 'latest_videos')
+SHOT_SUBDIRS = ('images', 'videos', 'lipsync')
+
+# How often the watched projects are re-read and, for non-owners, how often
+# the watcher lock is retried.
+REFRESH_INTERVAL = 5.0
+LOCK_RETRY_INTERVAL = 30.0
+
+# The feed is truncated once it grows past this size.
+FEED_MAX_BYTES = 10 * 1024 * 1024
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+OWN_WRITES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS own_writes (
+    path TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    noted REAL NOT NULL
+);
+"""
+_own_writes_ready = False
+
+
+def _path_state(path):
+    """Return what identifies a write to ``path``: mtime and size of a file."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return 'missing'
+    if stat.S_ISDIR(st.st_mode):
+        # Folders change whenever something is added to them; only their
+        # creation or removal is a write of their own.
+        return 'dir'
+    return f'{st.st_mtime_ns}:{st.st_size}'
+
+
+def _own_writes_db():
+    global _own_writes_ready
+    conn = get_shared_state().connection()
+    if not _own_writes_ready:
+        conn.executescript(OWN_WRITES_SCHEMA)
+        _own_writes_ready = True
+    return conn
+
+
+def note_writes(*paths):
+    """Record ``paths`` (created, modified or deleted) as written by Shotbuddy.
+
+    A no-op unless the watcher is enabled; failures are logged and never
+    break the caller.
+    """
+    if not WATCH_ENABLED or not paths:
+        return
+    now = time.time()
+    try:
+        rows = []
+        for path in paths:
+            path = os.path.realpath(path)
+            rows.append((path, _path_state(path), now))
+        _own_writes_db().executemany(
+            'INSERT OR REPLACE INTO own_writes (path, state, noted) VALUES (?, ?, ?)', rows
+        )
+    except Exception as e:
+        logger.warning("Failed to note own writes: %s", e)
+
+
+def own_writes(paths):
+    """Return those of ``paths`` that are still as Shotbuddy left them."""
+    conn = _own_writes_db()
+    conn.execute('DELETE FROM own_writes WHERE noted < ?', (time.time() - WATCH_OWN_WRITES_TTL,))
+    own = set()
+    for path in paths:
+        real = os.path.realpath(path)
+        row = conn.execute('SELECT state FROM own_writes WHERE path = ?', (real,)).fetchone()
+        if row is not None and row[0] == _path_state(real):
+            own.add(path)
+    return own
+
+
+def _watched_dirs(shots_dir):
+    """Yield every folder below ``shots_dir`` that needs a watch."""
+    yield shots_dir
+    for name in ('wip', *LATEST_DIRS):
+        path = os.path.join(shots_dir, name)
+        if os.path.isdir(path):
+            yield path
+    wip = os.path.join(shots_dir, 'wip')
+    try:
+        with os.scandir(wip) as it:
+            shots = [e.path for e in it if e.is_dir() and not e.name.startswith('.')]
+    except FileNotFoundError:
+        return
+    for shot in shots:
+        yield shot
+        for sub in SHOT_SUBDIRS:
+            path = os.path.join(shot, sub)
+            if os.path.isdir(path):
+                yield path
+
+
+def _depth(shots_dir, path):
+    """Depth of ``path`` below ``shots_dir`` (``wip/SH010/images`` is 3)."""
+    rel = os.path.relpath(path, shots_dir)
+    return 0 if rel == '.' else rel.count(os.sep) + 1
+
+
+class InotifyBackend:
+    """Recursive watches on ``shots/`` trees through the inotify syscalls."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._paths = {}  # wd -> (shots_dir, path)
+        self._wds = {}  # path -> wd
+
+    def _watch_dir(self, shots_dir, path):
+        if path in self._wds:
+            return
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            logger.warning("Cannot watch %s: %s", path, os.strerror(err))
+            return
+        self._paths[wd] = (shots_dir, path)
+        self._wds[path] = wd
+
+    def watch(self, shots_dir):
+        for path in _watched_dirs(shots_dir):
+            self._watch_dir(shots_dir, path)
+
+    def _forget(self, wd):
+        _shots_dir, path = self._paths.pop(wd)
+        # A re-created folder may already have a new watch under its path.
+        if self._wds.get(path) == wd:
+            del self._wds[path]
+
+    def _unwatch_tree(self, path):
+        """Drop the watches of ``path`` and the folders below it."""
+        for wd, (_root, watched) in list(self._paths.items()):
+            if watched == path or watched.startswith(path + os.sep):
+                self._rm_watch(self.fd, wd)
+                self._forget(wd)
+
+    def unwatch(self, shots_dir):
+        for wd, (root, path) in list(self._paths.items()):
+            if root == shots_dir:
+                self._rm_watch(self.fd, wd)
+                self._forget(wd)
+
+    def poll(self, timeout):
+        """Return ``(changed_paths, overflowed_roots)`` seen within ``timeout`` seconds."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return [], []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return [], []
+
+        changed, overflow = [], []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow.extend({root for root, _ in self._paths.values()})
+                continue
+            watched = self._paths.get(wd)
+            if watched is None:
+                continue
+            shots_dir, directory = watched
+            if mask & IN_IGNORED:
+                self._forget(wd)
+                continue
+            if mask & IN_DELETE_SELF:
+                # Its IN_IGNORED follows; forget the path now so a folder
+                # re-created under it in the same batch gets a watch.
+                self._forget(wd)
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR and mask & IN_MOVED_FROM:
+                # A moved folder keeps its watches under their old paths;
+                # drop them, the new location is watched on IN_MOVED_TO.
+                self._unwatch_tree(path)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and _depth(shots_dir, path) <= 3:
+                # Files may land in a new folder before its watch exists;
+                # reporting the folder makes the shot rescan anyway.
+                for sub in _watched_dirs(shots_dir):
+                    if sub == path or sub.startswith(path + os.sep):
+                        self._watch_dir(shots_dir, sub)
+            changed.append(path)
+        return changed, overflow
+
+
+class PollingBackend:
+    """Fallback that compares shot signatures and ``latest_*`` listings."""
+
+    def __init__(self, interval=WATCH_POLL_INTERVAL):
+        self.interval = interval
+        self._snapshots = {}
+        self._next = 0.0
+
+    @staticmethod
+    def _snapshot(shots_dir):
+        snap = {}
+        wip = os.path.join(shots_dir, 'wip')
+        try:
+            with os.scandir(wip) as it:
+                for entry in it:
+                    if entry.is_dir() and not entry.name.startswith('.'):
+                        snap[entry.path] = tuple(ShotIndex.signature(entry.path))
+        except FileNotFoundError:
+            pass
+        for name in LATEST_DIRS:
+            try:
+                with os.scandir(os.path.join(shots_dir, name)) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            st = entry.stat()
+                            snap[entry.path] = (st.st_mtime_ns, st.st_size)
+            except FileNotFoundError:
+                pass
+        return snap
+
+    def watch(self, shots_dir):
+        self._snapshots[shots_dir] = self._snapshot(shots_dir)
+
+    def unwatch(self, shots_dir):
+        self._snapshots.pop(shots_dir, None)
+
+    def poll(self, timeout):
+        now = time.monotonic()
+        if now < self._next:
+            time.sleep(min(timeout, self._next - now))
+            return [], []
+        self._next = now + self.interval
+        changed = []
+        for shots_dir, old in list(self._snapshots.items()):
+            new = self._snapshot(shots_dir)
+            changed.extend(path for path in new.keys() | old.keys() if new.get(path) != old.get(path))
+            self._snapshots[shots_dir] = new
+        return changed, []
+
+
+def classify(shots_dir, path):
+    """Return the shot name ``path`` belongs to, or ``None``."""
+    rel = os.path.relpath(path, shots_dir).split(os.sep)
+    if len(rel) < 2 or any(part.startswith('.') for part in rel):
+        return None
+    if rel[0] == 'wip':
+        return rel[1]
+    if rel[0] in LATEST_DIRS:
+        return rel[1].split('.', 1)[0]
+    return None
+
+
+class ShotWatcher:
+    """Background thread feeding external changes into the shot caches."""
+
+    def __init__(self, app):
+        self.app = app
+        self.backend = None
+        self._thread = None
+        self._lock_file = None
+        self._roots = {}  # shots dir -> project path
+        self._pending = {}  # project path -> {'shots': set, 'paths': {path: shot}, 'first': t, 'last': t}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='shot-watcher', daemon=True)
+            self._thread.start()
+
+    def _make_backend(self):
+        if sys.platform.startswith('linux'):
+            try:
+                return InotifyBackend()
+            except (OSError, AttributeError) as e:
+                logger.warning("inotify unavailable (%s), polling for changes", e)
+        return PollingBackend()
+
+    def _run(self):
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        while self._lock_file is None:
+            self._lock_file = try_lock(STATE_DIR / 'watcher.lock')
+            if self._lock_file is None:
+                # Another worker watches; take over if it goes away.
+                time.sleep(LOCK_RETRY_INTERVAL)
+        logger.info("Filesystem watcher started in process %s", os.getpid())
+
+        self.backend = self._make_backend()
+        next_refresh = 0.0
+        while True:
+            try:
+                now = time.monotonic()
+                if now >= next_refresh:
+                    self._refresh_roots()
+                    next_refresh = now + REFRESH_INTERVAL
+                changed, overflow = self.backend.poll(0.5)
+                for path in changed:
+                    self._record(path)
+                for shots_dir in overflow:
+                    self._record_all(shots_dir)
+                self._flush_due()
+            except Exception:
+                logger.exception("Filesystem watcher error")
+                time.sleep(1)
+
+    def _refresh_roots(self):
+        projects = self.app.config['PROJECT_MANAGER'].projects
+        paths = [projects.get('current_project'), *projects.get('recent_projects', [])]
+        wanted = {}
+        for project in paths:
+            if project and os.path.isdir(os.path.join(project, 'shots')):
+                wanted[os.path.join(project, 'shots')] = project
+        for shots_dir in self._roots.keys() - wanted.keys():
+            self.backend.unwatch(shots_dir)
+        for shots_dir in wanted.keys() - self._roots.keys():
+            self.backend.watch(shots_dir)
+        self._roots = wanted
+
+    def _root_for(self, path):
+        for shots_dir, project in self._roots.items():
+            if path == shots_dir or path.startswith(shots_dir + os.sep):
+                return shots_dir, project
+        return None, None
+
+    def _pending_for(self, project):
+        now = time.monotonic()
+        pending = self._pending.setdefault(project, {'shots': set(), 'paths': {}, 'first': now})
+        pending['last'] = now
+        return pending
+
+    def _record(self, path):
+        shots_dir, project = self._root_for(path)
+        if shots_dir is None:
+            return
+        shot = classify(shots_dir, path)
+        if shot is None:
+            return
+        self._pending_for(project)['paths'][path] = shot
+
+    def _record_all(self, shots_dir):
+        project = self._roots.get(shots_dir)
+        if project is None:
+            return
+        try:
+            with os.scandir(os.path.join(shots_dir, 'wip')) as it:
+                shots = {e.name for e in it if e.is_dir()}
+        except FileNotFoundError:
+            shots = set()
+        self._pending_for(project)['shots'].update(shots)
+
+    def _flush_due(self):
+        now = time.monotonic()
+        for project, pending in list(self._pending.items()):
+            if now - pending['last'] >= WATCH_DEBOUNCE or now - pending['first'] >= WATCH_MAX_DELAY:
+                del self._pending[project]
+                self._flush(project, pending['shots'], pending['paths'])
+
+    def _flush(self, project, shots, paths):
+        # The feed gets every changed path, including Shotbuddy's own writes:
+        # deploy/realtime_sync.sh relies on it to push uploads and renames.
+        self._append_feed(self._expand(paths))
+
+        # Everything else already happened for the app's own writes.
+        try:
+            own = own_writes(paths)
+        except Exception as e:
+            logger.warning("Cannot read own writes, reporting all changes: %s", e)
+            own = set()
+        shots = shots | {shot for path, shot in paths.items() if path not in own}
+        external = self._expand(path for path in paths if path not in own)
+
+        from app.services.events import publish
+        from app.services.shot_manager import get_shot_manager, validate_shot_name
+
+        valid = []
+        for shot in shots:
+            try:
+                validate_shot_name(shot)
+                valid.append(shot)
+            except ValueError:
+                continue
+        if not valid:
+            return
+        logger.info("External changes in %s: %s", project, ', '.join(sorted(valid)))
+
+        with self.app.app_context():
+            shot_manager = get_shot_manager(project)
+            shot_manager.invalidate(*valid)
+            for shot in valid:
+                if (shot_manager.wip_dir / shot).is_dir():
+                    # Rescans the shot and queues thumbnails for its assets.
+                    shot_manager.get_shot_info(shot, save_index=False)
+            shot_manager.index.save()
+            publish('files_changed', project, None, shots=sorted(valid))
+
+            storage = self.app.config.get('STORAGE_SERVICE')
+            if storage and external:
+                storage.mark_dirty(*external)
+
+    @staticmethod
+    def _expand(paths):
+        """Return the sorted files of ``paths``.
+
+        New folders (and, when polling, changed shot folders) are reported as
+        a whole; they stand for all their files (unchanged ones are skipped
+        by rclone's size/modtime check).
+        """
+        files = set()
+        for path in paths:
+            if os.path.isdir(path):
+                for dirpath, dirnames, filenames in os.walk(path):
+                    dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+                    files.update(os.path.join(dirpath, f) for f in filenames if not f.startswith('.'))
+            else:
+                files.add(path)
+        return sorted(files)
+
+    @staticmethod
+    def _append_feed(paths):
+        if not paths:
+            return
+        try:
+            if WATCH_FEED.exists() and WATCH_FEED.stat().st_size > FEED_MAX_BYTES:
+                WATCH_FEED.write_text('')
+            with WATCH_FEED.open('a', encoding='utf-8') as f:
+                f.writelines(f'{path}\n' for path in paths)
+        except OSError as e:
+            logger.warning("Cannot append to change feed %s: %s", WATCH_FEED, e)
+
+
+def start_watcher(app):
+    """Start the watcher thread for ``app`` (only one process actually watches)."""
+    watcher = ShotWatcher(app)
+    watcher.start()
+    return watcher
@@ -0,0 +1,118 @@
+"""Catalog of known projects.
+
+The project picker used to glob ``**/project.json`` under ``PROJECTS_ROOT``,
+which walks every shot, version and lipsync folder of every project.  The
+catalog keeps one row per project in the shared state database instead.
+Creating or opening a project records it; :meth:`ProjectCatalog.reindex`
+rediscovers projects with a walk that stops descending at each project's
+``shots/`` and ``_legacy/`` folders.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from app.config.constants import PROJECTS_ROOT
+from app.services.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS projects_by_name ON projects (name COLLATE NOCASE, path);
+"""
+
+# Bumped on every reindex; 0 means the catalog was never built.
+CATALOG_GENERATION = 'catalog'
+
+# Folders inside a project that never contain other projects.
+PRUNED_DIRS = {'shots', '_legacy'}
+
+
+def discover_projects(root=PROJECTS_ROOT):
+    """Yield ``(project_dir, project_info)`` for every ``project.json`` under ``root``."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Hidden folders hold server state (.shotbuddy) or VCS data.
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        if 'project.json' not in filenames:
+            continue
+        dirnames[:] = [d for d in dirnames if d not in PRUNED_DIRS]
+        try:
+            with open(os.path.join(dirpath, 'project.json'), 'r') as f:
+                yield Path(dirpath), json.load(f)
+        except Exception as e:
+            logger.warning("Skipping unreadable project.json in %s: %s", dirpath, e)
+
+
+class ProjectCatalog:
+    """Projects table in the shared state database."""
+
+    def __init__(self, state=None):
+        self.state = state or get_shared_state()
+        self.state.connection().executescript(SCHEMA)
+
+    def upsert(self, project_info):
+        """Record (or refresh) the project described by ``project_info``."""
+        path = str(project_info['path'])
+        self.state.connection().execute(
+            'INSERT OR REPLACE INTO projects (path, name, data, updated) VALUES (?, ?, ?, ?)',
+            (path, project_info.get('name') or Path(path).name, json.dumps(project_info), time.time()),
+        )
+
+    def remove(self, path):
+        self.state.connection().execute('DELETE FROM projects WHERE path = ?', (str(path),))
+
+    def list(self, offset=0, limit=None):
+        """Return ``(projects, total)`` ordered by name."""
+        if not self.state.generation(CATALOG_GENERATION):
+            self.reindex()
+        conn = self.state.connection()
+        total = conn.execute('SELECT COUNT(*) FROM projects').fetchone()[0]
+        rows = conn.execute(
+            'SELECT data FROM projects ORDER BY name COLLATE NOCASE, path LIMIT ? OFFSET ?',
+            (-1 if limit is None else limit, offset),
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows], total
+
+    def reindex(self, root=PROJECTS_ROOT):
+        """Rebuild the catalog from disk and return the number of projects found."""
+        found = []
+        for project_dir, info in discover_projects(root):
+            # The folder is the source of truth for the path (see open_project).
+            info['path'] = str(project_dir.resolve())
+            found.append(info)
+
+        root = Path(root).resolve()
+        conn = self.state.connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Projects opened from outside ``root`` are kept while they exist.
+            known = {i['path'] for i in found}
+            stale = []
+            for (path,) in conn.execute('SELECT path FROM projects').fetchall():
+                if path in known:
+                    continue
+                inside = root == Path(path) or root in Path(path).parents
+                if inside or not os.path.exists(os.path.join(path, 'project.json')):
+                    stale.append((path,))
+            conn.executemany('DELETE FROM projects WHERE path = ?', stale)
+            conn.executemany(
+                'INSERT OR REPLACE INTO projects (path, name, data, updated) VALUES (?, ?, ?, ?)',
+                [(i['path'], i.get('name') or Path(i['path']).name, json.dumps(i), now) for i in found],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self.state.bump(CATALOG_GENERATION)
+        logger.info("Indexed %d projects under %s", len(found), root)
+        return len(found)
@@ -2,22 +2,47 @@
 
 from pathlib import Path
 import json
+import os
 from datetime import datetime
 import logging
 from app.config.constants import PROJECTS_FILE
+from app.services.project_catalog import ProjectCatalog
+from app.services.shared_state import get_shared_state
+from app.utils import atomic_write_json
 
 logger = logging.getLogger(__name__)
 
+# Generation counter bumped whenever projects.json is written.
+PROJECTS_GENERATION = 'projects'
+
 class ProjectManager:
-    def __init__(self):
+    def __init__(self, shared_state=None):
         self.projects_file = Path(PROJECTS_FILE).resolve()
-        self.projects = {
+        self.shared_state = shared_state or get_shared_state()
+        self.catalog = ProjectCatalog(self.shared_state)
+        self._projects = {
             'current_project': None,
             'recent_projects': []
         }
+        # project.json path -> ((inode, mtime_ns, size), parsed data)
+        self._project_files = {}
         self.ensure_config_dir()
+        self._generation = self.shared_state.generation(PROJECTS_GENERATION)
         self.load_projects()
 
+    @property
+    def projects(self):
+        """Current/recent project state, reloaded when another worker saved it."""
+        generation = self.shared_state.generation(PROJECTS_GENERATION)
+        if generation != self._generation:
+            self._generation = generation
+            self.load_projects()
+        return self._projects
+
+    @projects.setter
+    def projects(self, value):
+        self._projects = value
+
     def ensure_config_dir(self):
         config_dir = self.projects_file.parent
         config_dir.mkdir(parents=True, exist_ok=True)
@@ -26,21 +51,23 @@ class ProjectManager:
         if self.projects_file.exists():
             try:
                 with self.projects_file.open('r') as f:
-                    self.projects = json.load(f)
-                    if self.projects.get('current_project'):
-                        self.projects['current_project'] = str(Path(self.projects['current_project']).resolve())
-                    self.projects['recent_projects'] = [
-                        str(Path(p).resolve()) for p in self.projects.get('recent_projects', [])
-                    ]
+                    projects = json.load(f)
+                if projects.get('current_project'):
+                    projects['current_project'] = str(Path(projects['current_project']).resolve())
+                projects['recent_projects'] = [
+                    str(Path(p).resolve()) for p in projects.get('recent_projects', [])
+                ]
+                self._projects = projects
             except Exception as e:
                 logger.warning("Failed to load projects.json: %s", e)
-        logger.info("Loaded current project: %s", self.projects.get('current_project'))
+        logger.info("Loaded current project: %s", self._projects.get('current_project'))
 
     def save_projects(self):
         try:
-            with self.projects_file.open('w') as f:
-                json.dump(self.projects, f, indent=2)
-            logger.info("Saved current project: %s", self.projects.get('current_project'))
+            # Atomic so other workers never read a half-written file.
+            atomic_write_json(self.projects_file, self._projects, indent=2)
+            self._generation = self.shared_state.bump(PROJECTS_GENERATION)
+            logger.info("Saved current project: %s", self._projects.get('current_project'))
         except Exception as e:
             logger.warning("Failed to save projects.json: %s", e)
 
@@ -71,8 +98,7 @@ class ProjectManager:
             'shots': []
         }
 
-        with (project_dir / 'project.json').open('w') as f:
-            json.dump(project_info, f, indent=2)
+        self.write_project_file(project_dir, project_info)
 
         self.set_current_project(project_dir)
         return project_info
@@ -92,36 +118,59 @@ class ProjectManager:
         if not project_path:
             logger.warning("No current project path set.")
             return None
-        from app.utils import sanitize_path
-        project_path = sanitize_path(project_path).resolve()
-        
+
+        # Hot path: one stat of project.json, parsed only when it changed.
+        project = self.read_project_file(project_path)
+        if project is not None:
+            return project
+
         # Validate project path exists and contains project.json
-        project_file = project_path / 'project.json'
-        
-        if not project_path.exists():
+        if not os.path.isdir(project_path):
             logger.error("Current project path does not exist: %s", project_path)
             # Clear invalid current project
             self.projects['current_project'] = None
             self.save_projects()
             return None
 
-        if project_file.exists():
-            with project_file.open('r') as f:
-                return json.load(f)
-
         for recent in self.projects.get('recent_projects', []):
             from app.utils import sanitize_path
             recent_path = sanitize_path(recent).resolve()
             if not recent_path.exists():
                 logger.warning("Recent project path does not exist: %s", recent_path)
                 continue
-            fallback = recent_path / 'project.json'
-            if fallback.exists():
+            fallback = self.read_project_file(recent_path)
+            if fallback is not None:
                 logger.info("Falling back to recent project: %s", recent_path)
                 self.set_current_project(recent_path)
-                with fallback.open('r') as f:
-                    return json.load(f)
+                return fallback
 
         logger.error("No valid project.json found.")
         return None
 
+    def read_project_file(self, project_path):
+        """Return the parsed ``project.json`` of ``project_path`` or ``None`` if it is missing.
+
+        Parsed files are kept in memory and reused while the file's inode,
+        mtime and size are unchanged, so repeated lookups cost one ``stat``.
+        """
+        project_file = os.path.join(str(project_path), 'project.json')
+        try:
+            st = os.stat(project_file)
+        except OSError:
+            self._project_files.pop(project_file, None)
+            return None
+
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        cached = self._project_files.get(project_file)
+        if cached is None or cached[0] != signature:
+            with open(project_file, 'r') as f:
+                cached = (signature, json.load(f))
+            self._project_files[project_file] = cached
+        return dict(cached[1])
+
+    def write_project_file(self, project_path, project_info):
+        """Atomically write ``project_info`` to ``project_path/project.json`` and catalog it."""
+        project_file = os.path.join(str(project_path), 'project.json')
+        atomic_write_json(project_file, project_info, indent=2)
+        self._project_files.pop(project_file, None)
+        self.catalog.upsert(project_info)
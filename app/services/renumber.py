@@ -0,0 +1,233 @@
+"""Renaming many shots in one go.
+
+``ShotManager.renumber_shots`` takes a complete old -> new mapping, which may
+swap or rotate names.  The renames are planned up front:
+
+* a shot whose new name is still held by another shot of the batch waits
+  until that shot has moved on, and a cycle (``SH010 <-> SH020``) parks one
+  shot under a hidden temporary name to break it;
+* every shot step is expanded into plain file and folder renames (versions
+  and lipsync files inside the WIP folder, the folder itself, the finals in
+  ``latest_*``).
+
+The resulting list of renames is written to a journal under
+``RENUMBER_JOURNAL_DIR`` (fsynced) before the first one runs, and progress is
+appended to it as they go.  If the process dies halfway, the next
+``ShotManager`` for the project replays the journal from where it stopped,
+so a project is never left half renamed.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+from app.config.constants import ALLOWED_VIDEO_EXTENSIONS, RENUMBER_JOURNAL_DIR
+from app.services.shot_scanner import LIPSYNC_PARTS
+from app.utils import file_lock
+
+logger = logging.getLogger(__name__)
+
+# Temporary names are not shot names, so listings never show them.
+TEMP_PREFIX = '.renumber-'
+
+
+def renumber_mapping(names, start=10, step=10):
+    """Return the mapping that renumbers ``names`` (in order) from ``start`` in ``step``s.
+
+    Sub-shots become top-level shots of their own.
+    """
+    if start < 1 or step < 1:
+        raise ValueError("start and step must be positive")
+    names = sorted(names)
+    last = start + step * (len(names) - 1)
+    if last > 999:
+        raise ValueError(f"{len(names)} shots do not fit from SH{start:03d} in steps of {step}")
+    return {name: f"SH{start + step * i:03d}" for i, name in enumerate(names)}
+
+
+def plan_renames(mapping):
+    """Order the renames of ``mapping`` so no step targets an occupied name.
+
+    Returns ``[(old, new), ...]``; names in the middle of a cycle go through
+    a ``TEMP_PREFIX`` name.
+    """
+    pending = {old: new for old, new in mapping.items() if old != new}
+    steps = []
+    while pending:
+        ready = [old for old, new in pending.items() if new not in pending]
+        if not ready:
+            # Only cycles are left: park one shot to open its cycle.
+            old = next(iter(pending))
+            temp = f"{TEMP_PREFIX}{old}"
+            steps.append((old, temp))
+            pending[temp] = pending.pop(old)
+            continue
+        for old in ready:
+            steps.append((old, pending.pop(old)))
+    return steps
+
+
+def shot_inventory(wip_dir, latest_dirs, name):
+    """Return the files of shot ``name`` that carry its name.
+
+    Items are ``(kind, folder, suffix)`` for a file called ``<shot
+    name><suffix>``: ``version`` and ``lipsync`` (a lipsync final, which has a
+    thumbnail) files live in ``folder`` of the shot's WIP folder, ``final``
+    files in the ``latest_*`` folder ``folder``.  These are the files
+    ``rename_shot`` has always renamed; anything else in the WIP folder just
+    moves with it.
+    """
+    shot_dir = Path(wip_dir) / name
+    items = []
+    for sub in ('images', 'videos'):
+        for f in sorted((shot_dir / sub).glob(f"{name}_v*.*")):
+            items.append(('version', sub, f.name[len(name):]))
+    lipsync_dir = shot_dir / 'lipsync'
+    for part in LIPSYNC_PARTS:
+        for ext in ALLOWED_VIDEO_EXTENSIONS:
+            if (lipsync_dir / f"{name}_{part}{ext}").exists():
+                items.append(('lipsync', 'lipsync', f"_{part}{ext}"))
+        for f in sorted(lipsync_dir.glob(f"{name}_{part}_v*.*")):
+            items.append(('version', 'lipsync', f.name[len(name):]))
+    for latest_dir, extensions in latest_dirs:
+        for ext in extensions:
+            if (Path(latest_dir) / f"{name}{ext}").exists():
+                items.append(('final', str(latest_dir), ext))
+    return items
+
+
+def expand_steps(steps, wip_dir, latest_dirs):
+    """Turn shot steps into ``(ops, rekeys)``.
+
+    ``ops`` are ``[src, dst]`` path renames in execution order; ``rekeys``
+    are ``[old, new]`` paths of finals whose cached thumbnails move with them.
+    """
+    wip_dir = Path(wip_dir)
+    inventories = {}
+    origin = {}
+    ops = []
+    for old, new in steps:
+        source = origin.pop(old, old)
+        origin[new] = source
+        if source not in inventories:
+            inventories[source] = shot_inventory(wip_dir, latest_dirs, source)
+        items = inventories[source]
+        # Files inside the WIP folder first, then the folder, then the finals.
+        for kind, folder, suffix in items:
+            if kind != 'final':
+                parent = wip_dir / old / folder
+                ops.append([str(parent / f"{old}{suffix}"), str(parent / f"{new}{suffix}")])
+        ops.append([str(wip_dir / old), str(wip_dir / new)])
+        for kind, folder, suffix in items:
+            if kind == 'final':
+                ops.append([str(Path(folder) / f"{old}{suffix}"), str(Path(folder) / f"{new}{suffix}")])
+
+    rekeys = []
+    for new, source in origin.items():
+        for kind, folder, suffix in inventories[source]:
+            if kind == 'final':
+                rekeys.append([str(Path(folder) / f"{source}{suffix}"), str(Path(folder) / f"{new}{suffix}")])
+            elif kind == 'lipsync':
+                rekeys.append([
+                    str(wip_dir / source / folder / f"{source}{suffix}"),
+                    str(wip_dir / new / folder / f"{new}{suffix}"),
+                ])
+    return ops, rekeys
+
+
+class RenumberJournal:
+    """Write-ahead journal of one project's renames (JSON lines).
+
+    The first line is the plan (``mapping``, ``ops``, ``rekeys``); each later
+    line is the index of a finished op.
+    """
+
+    def __init__(self, project_path):
+        project = str(Path(project_path).resolve())
+        name = hashlib.sha1(project.encode('utf-8')).hexdigest()
+        self.path = RENUMBER_JOURNAL_DIR / f"renumber-{name}.jsonl"
+        self.lock_path = RENUMBER_JOURNAL_DIR / f"renumber-{name}.lock"
+
+    def exists(self):
+        return self.path.exists()
+
+    def lock(self):
+        """Serialise renames of the project across workers."""
+        RENUMBER_JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+        return file_lock(self.lock_path)
+
+    def begin(self, mapping, ops, rekeys):
+        """Durably record the plan before any of it runs."""
+        RENUMBER_JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'mapping': mapping, 'ops': ops, 'rekeys': rekeys}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._fsync_dir()
+        self._progress = open(self.path, 'a', encoding='utf-8')
+
+    def mark_done(self, index):
+        # Not fsynced: replaying an op that already ran is a no-op.
+        self._progress.write(f"{index}\n")
+        self._progress.flush()
+
+    def load(self):
+        """Return ``(plan, next op index)`` of an unfinished journal."""
+        with open(self.path, encoding='utf-8') as f:
+            plan = json.loads(f.readline())
+            done = -1
+            for line in f:
+                try:
+                    done = max(done, int(line))
+                except ValueError:
+                    break  # torn last line
+        self._progress = open(self.path, 'a', encoding='utf-8')
+        return plan, done + 1
+
+    def finish(self):
+        """Drop the journal once every op and its follow-up work is done."""
+        self.path.unlink(missing_ok=True)
+        self._fsync_dir()
+
+    def close(self):
+        if getattr(self, '_progress', None) is not None:
+            self._progress.close()
+            self._progress = None
+
+    @staticmethod
+    def _fsync_dir():
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(RENUMBER_JOURNAL_DIR, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def check_ops(ops):
+    """Raise ``ValueError`` if an op would overwrite a path no earlier op frees."""
+    freed = set()
+    for src, dst in ops:
+        if dst not in freed and os.path.lexists(dst):
+            raise ValueError(f"Cannot rename {Path(src).name}: {dst} already exists")
+        freed.add(src)
+
+
+def run_ops(journal, ops, start=0):
+    """Execute ``ops[start:]``, recording each in ``journal``.
+
+    An op whose source is already gone ran before a crash and is skipped.
+    """
+    for index in range(start, len(ops)):
+        src, dst = ops[index]
+        if os.path.lexists(src):
+            if os.path.lexists(dst):
+                raise RuntimeError(f"Cannot rename {src}: {dst} already exists")
+            os.rename(src, dst)
+        journal.mark_done(index)
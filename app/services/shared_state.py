@@ -0,0 +1,147 @@
+"""State shared between worker processes.
+
+gunicorn runs several workers, each with its own ``ProjectManager`` and
+``ShotManager`` objects.  This module keeps a small SQLite database (WAL mode,
+so readers never block the writer) under ``STATE_DIR`` that every worker
+opens:
+
+``generations``
+    Named counters.  Whoever changes shared state bumps the matching
+    counter; everyone else compares it with the value they last saw and
+    reloads when it moved.  ``projects`` covers ``projects.json``,
+    ``project:<path>`` the shots of one project.
+``cache``
+    Computed values (JSON) stored together with the generation they were
+    computed at, so a shot listing built by one worker is reused by the
+    others until the project changes.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from app.config.constants import SHARED_STATE_DB
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    created REAL NOT NULL,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SharedState:
+    """Generation counters and a small value cache in a shared SQLite file."""
+
+    def __init__(self, path=SHARED_STATE_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def connection(self):
+        """Return this thread's connection (modules may keep their own tables here)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; every statement is its own short transaction.
+            conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # ------------------------------------------------------------------
+    # Generations
+    # ------------------------------------------------------------------
+    def generation(self, name):
+        """Return the current value of counter ``name`` (0 if never bumped)."""
+        row = self.connection().execute(
+            'SELECT value FROM generations WHERE name = ?', (name,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, name):
+        """Increment counter ``name`` and return its new value."""
+        conn = self.connection()
+        conn.execute(
+            'INSERT INTO generations (name, value) VALUES (?, 1) '
+            'ON CONFLICT(name) DO UPDATE SET value = value + 1',
+            (name,),
+        )
+        return self.generation(name)
+
+    # ------------------------------------------------------------------
+    # Cached values
+    # ------------------------------------------------------------------
+    def get_cached(self, key, generation, max_age=None):
+        """Return the value stored under ``key`` if it was computed at ``generation``.
+
+        With ``max_age`` (seconds) older values are ignored as well.
+        """
+        row = self.connection().execute(
+            'SELECT generation, created, value FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if not row or row[0] != generation:
+            return None
+        if max_age is not None and time.time() - row[1] > max_age:
+            return None
+        return json.loads(row[2])
+
+    def set_cached(self, key, generation, value):
+        """Store ``value`` (JSON serialisable) under ``key`` for ``generation``."""
+        self.connection().execute(
+            'INSERT OR REPLACE INTO cache (key, generation, created, value) VALUES (?, ?, ?, ?)',
+            (key, generation, time.time(), json.dumps(value)),
+        )
+
+    def update_cached(self, key, generation, update):
+        """Atomically replace the value under ``key`` with ``update(previous)``.
+
+        ``previous`` is the stored value regardless of its generation (or
+        ``None``).  The read and the write happen in one transaction, so
+        concurrent updaters see each other's results.  Returns the new value.
+        """
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()
+            value = update(json.loads(row[0]) if row else None)
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, generation, created, value) VALUES (?, ?, ?, ?)',
+                (key, generation, time.time(), json.dumps(value)),
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+
+    def delete_cached(self, key):
+        self.connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+
+_default_state = None
+_default_state_lock = threading.Lock()
+
+
+def get_shared_state():
+    """Return the process-wide ``SharedState``."""
+    global _default_state
+    if _default_state is None:
+        with _default_state_lock:
+            if _default_state is None:
+                _default_state = SharedState()
+    return _default_state
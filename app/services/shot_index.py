@@ -0,0 +1,169 @@
+"""Persistent per-project shot index.
+
+``ShotManager.get_shots`` used to glob every shot folder on every call.  The
+index stores what those scans found in ``shot_index.json`` next to
+``project.json`` and only rescans a shot when the modification times of its
+folders (or its ``notes.txt``) change.  The ``latest_images`` and
+``latest_videos`` folders are listed once and cached against their own mtime.
+
+The file is shared by every process serving the project; each process reloads
+it whenever its mtime changes on disk.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from app.utils import atomic_write_json
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = 'shot_index.json'
+INDEX_FORMAT = 1
+
+# Sub-folders (relative to the shot folder) whose mtimes make up a shot's
+# signature.  ``notes.txt`` is rewritten in place, which does not touch the
+# folder mtime, so it is stat'ed on its own.
+SIGNATURE_PARTS = ('', 'images', 'videos', 'lipsync', 'notes.txt')
+
+# Entries whose newest mtime is this close to the time they were scanned are
+# not trusted: a second write within the filesystem's timestamp granularity
+# would go unnoticed.  They are rescanned on the next call instead.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def _mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class ShotIndex:
+    """Cache of scanned shot data persisted in ``shot_index.json``."""
+
+    def __init__(self, project_path):
+        self.path = Path(project_path) / INDEX_FILENAME
+        self._lock = threading.RLock()
+        self._shots = {}
+        self._latest = {}
+        self._loaded_mtime = None
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def _reload_if_changed(self):
+        mtime = _mtime_ns(self.path)
+        if mtime == self._loaded_mtime:
+            return
+        self._loaded_mtime = mtime
+        self._shots, self._latest = {}, {}
+        if not mtime:
+            return
+        try:
+            with self.path.open('r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == INDEX_FORMAT:
+                self._shots = data.get('shots', {})
+                self._latest = data.get('latest', {})
+        except Exception as e:
+            logger.warning("Ignoring unreadable shot index %s: %s", self.path, e)
+
+    def save(self):
+        """Write the index back to disk if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                atomic_write_json(self.path, {
+                    'format': INDEX_FORMAT,
+                    'shots': self._shots,
+                    'latest': self._latest,
+                })
+                self._loaded_mtime = _mtime_ns(self.path)
+                self._dirty = False
+            except Exception as e:
+                logger.warning("Failed to save shot index %s: %s", self.path, e)
+
+    # ------------------------------------------------------------------
+    # Shot entries
+    # ------------------------------------------------------------------
+    @staticmethod
+    def signature(shot_dir):
+        """Return the mtime signature for ``shot_dir``."""
+        return [_mtime_ns(os.path.join(shot_dir, part)) for part in SIGNATURE_PARTS]
+
+    def get(self, shot_name, signature):
+        """Return the cached entry for ``shot_name`` if ``signature`` matches."""
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._shots.get(shot_name)
+            if not entry or entry.get('sig') != signature:
+                return None
+            if max(signature) >= entry.get('scanned', 0) - RACY_WINDOW_NS:
+                return None
+            return entry
+
+    def put(self, shot_name, signature, entry):
+        """Store a freshly scanned ``entry`` for ``shot_name``."""
+        entry = dict(entry, sig=signature, scanned=time.time_ns())
+        with self._lock:
+            self._reload_if_changed()
+            self._shots[shot_name] = entry
+            self._dirty = True
+        return entry
+
+    def invalidate(self, *shot_names):
+        """Forget cached data for ``shot_names`` and the latest listings."""
+        with self._lock:
+            self._reload_if_changed()
+            for name in shot_names:
+                self._shots.pop(name, None)
+            self._latest = {}
+            self._dirty = True
+
+    def prune(self, shot_names):
+        """Drop entries for shots that are no longer on disk."""
+        keep = set(shot_names)
+        with self._lock:
+            stale = [name for name in self._shots if name not in keep]
+            for name in stale:
+                del self._shots[name]
+            if stale:
+                self._dirty = True
+
+    # ------------------------------------------------------------------
+    # latest_images / latest_videos listings
+    # ------------------------------------------------------------------
+    def latest_files(self, directory):
+        """Return ``{filename_stem: [filenames]}`` for ``directory``.
+
+        The listing is cached against the folder mtime so it costs one
+        ``stat`` per call unless files were added, removed or renamed.
+        """
+        directory = Path(directory)
+        mtime = _mtime_ns(directory)
+        now = time.time_ns()
+        with self._lock:
+            self._reload_if_changed()
+            cached = self._latest.get(directory.name)
+            if cached and cached.get('mtime') == mtime and mtime < cached.get('scanned', 0) - RACY_WINDOW_NS:
+                return cached['files']
+
+            files = {}
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            stem, ext = os.path.splitext(entry.name)
+                            files.setdefault(stem, []).append(entry.name)
+            except FileNotFoundError:
+                pass
+            self._latest[directory.name] = {'mtime': mtime, 'scanned': now, 'files': files}
+            self._dirty = True
+            return files
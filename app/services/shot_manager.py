@@ -1,6 +1,6 @@
 from pathlib import Path
-from PIL import Image
 import logging
+import os
 import re
 
 logger = logging.getLogger(__name__)
@@ -31,70 +31,165 @@ def _format_shot_parts(parts):
     return base
 
 from app.config.constants import (
+    SHOT_LISTING_TTL,
+    WATCH_ENABLED,
+    WATCHED_LISTING_TTL,
     ALLOWED_IMAGE_EXTENSIONS,
     ALLOWED_VIDEO_EXTENSIONS,
-    THUMBNAIL_CACHE_DIR,
-    THUMBNAIL_SIZE,
 )
+from app.services.events import publish
+from app.services.fs_watcher import note_writes
+from app.services.renumber import (
+    RenumberJournal,
+    check_ops,
+    expand_steps,
+    plan_renames,
+    renumber_mapping,
+    run_ops,
+)
+from app.services.shared_state import get_shared_state
+from app.services.shot_index import ShotIndex
+from app.services.shot_scanner import LIPSYNC_PARTS, scan_shot
+from app.services.thumbnail_cache import get_thumbnail_cache, ThumbnailCache
+from app.services.thumbnail_worker import get_thumbnail_queue, PENDING, READY
+
+
+# Format of the shared shot listing (see ShotManager.get_listing) and the
+# number of removed-shot tombstones it keeps for delta responses.
+LISTING_FORMAT = 2
+MAX_TOMBSTONES = 500
+
+# Optional keys of a shot dict (see ShotManager.get_shot_info); ``name`` is
+# always present.
+SHOT_FIELDS = ('notes', 'image', 'video', 'lipsync', 'archived')
 
 class ShotManager:
-    def __init__(self, project_path):
+    def __init__(self, project_path, storage_service=None):
         self.project_path = Path(project_path)
+        self.storage_service = storage_service
         self.shots_dir = self.project_path / 'shots'
         self.wip_dir = self.shots_dir / 'wip'
         self.latest_images_dir = self.shots_dir / 'latest_images'
         self.latest_videos_dir = self.shots_dir / 'latest_videos'
         self.legacy_dir = self.project_path / '_legacy'
+        self.index = ShotIndex(self.project_path)
+        # Shared across workers: bumped on every change to this project's shots.
+        self.generation_key = f'project:{self.project_path}'
+        self.listing_key = f'shots:{self.project_path}'
 
         self.wip_dir.mkdir(parents=True, exist_ok=True)
         self.latest_images_dir.mkdir(parents=True, exist_ok=True)
         self.latest_videos_dir.mkdir(parents=True, exist_ok=True)
 
+        # Resolved once; final paths are reported with symlinks resolved.
+        self._project_root = self.project_path.resolve()
+        self._real_dirs = {
+            self.latest_images_dir: str(self.latest_images_dir.resolve()),
+            self.latest_videos_dir: str(self.latest_videos_dir.resolve()),
+        }
+
+        # A bulk rename interrupted by a crash is finished before anything
+        # looks at the shots.
+        journal = RenumberJournal(self.project_path)
+        if journal.exists():
+            try:
+                with journal.lock():
+                    self._recover_renames(journal)
+            except Exception as e:
+                logger.error("Could not finish interrupted shot renames in %s: %s", self.project_path, e)
+
     def rename_shot(self, old_name, new_name):
         """Rename a shot and all associated files."""
-        validate_shot_name(old_name)
-        validate_shot_name(new_name)
-        old_dir = self.wip_dir / old_name
-        new_dir = self.wip_dir / new_name
-
-        if not old_dir.exists():
-            raise ValueError(f"Shot {old_name} does not exist")
-        if new_dir.exists():
-            raise ValueError(f"Shot {new_name} already exists")
-
-        old_dir.rename(new_dir)
-
-        for sub in ["images", "videos"]:
-            d = new_dir / sub
-            if d.exists():
-                for f in d.glob(f"{old_name}_v*.*"):
-                    f.rename(d / f.name.replace(old_name, new_name, 1))
-
-        lipsync_dir = new_dir / "lipsync"
-        if lipsync_dir.exists():
-            for part in ["driver", "target", "result"]:
-                for ext in ALLOWED_VIDEO_EXTENSIONS:
-                    src = lipsync_dir / f"{old_name}_{part}{ext}"
-                    if src.exists():
-                        src.rename(lipsync_dir / f"{new_name}_{part}{ext}")
-                for f in lipsync_dir.glob(f"{old_name}_{part}_v*.*"):
-                    f.rename(lipsync_dir / f.name.replace(old_name, new_name, 1))
-
-        for ext in ALLOWED_IMAGE_EXTENSIONS:
-            src = self.latest_images_dir / f"{old_name}{ext}"
-            if src.exists():
-                src.rename(self.latest_images_dir / f"{new_name}{ext}")
-
-        for ext in ALLOWED_VIDEO_EXTENSIONS:
-            src = self.latest_videos_dir / f"{old_name}{ext}"
-            if src.exists():
-                src.rename(self.latest_videos_dir / f"{new_name}{ext}")
-
-        if THUMBNAIL_CACHE_DIR.exists():
-            for thumb in THUMBNAIL_CACHE_DIR.glob(f"{old_name}_*_thumb.jpg"):
-                thumb.rename(THUMBNAIL_CACHE_DIR / thumb.name.replace(old_name, new_name, 1))
-
-        return self.get_shot_info(new_name)
+        self._rename_shots({old_name: new_name})
+        shot_info = self.get_shot_info(new_name)
+        publish('shot_renamed', self.project_path, new_name, old_name=old_name)
+        return shot_info
+
+    def renumber_shots(self, mapping=None, start=10, step=10):
+        """Rename many shots in one pass and return ``(mapping, shots)``.
+
+        ``mapping`` (old name -> new name) may swap or rotate names; without
+        it every shot is renumbered, in order, from ``start`` in steps of
+        ``step``.  The renames are journaled (see app/services/renumber.py)
+        and shot info is only computed once, for the listing at the end.
+        """
+        if mapping is None:
+            mapping = renumber_mapping(self.list_shot_names(), start, step)
+        mapping = {old: new for old, new in mapping.items() if old != new}
+        if mapping:
+            self._rename_shots(mapping)
+            publish('shots_renumbered', self.project_path, renamed=mapping)
+        return mapping, self.get_shots()
+
+    def _latest_dirs(self):
+        return [
+            (self.latest_images_dir, sorted(ALLOWED_IMAGE_EXTENSIONS)),
+            (self.latest_videos_dir, sorted(ALLOWED_VIDEO_EXTENSIONS)),
+        ]
+
+    def _rename_shots(self, mapping):
+        """Rename the shots of ``mapping`` (old -> new) under the project's journal."""
+        for old_name, new_name in mapping.items():
+            validate_shot_name(old_name)
+            validate_shot_name(new_name)
+        if len(set(mapping.values())) != len(mapping):
+            raise ValueError("Two shots cannot be given the same name")
+
+        journal = RenumberJournal(self.project_path)
+        with journal.lock():
+            self._recover_renames(journal)
+            for old_name, new_name in mapping.items():
+                if not (self.wip_dir / old_name).is_dir():
+                    raise ValueError(f"Shot {old_name} does not exist")
+                # A name is free if its shot is renamed away in the same batch.
+                if new_name not in mapping and (self.wip_dir / new_name).exists():
+                    raise ValueError(f"Shot {new_name} already exists")
+            ops, rekeys = expand_steps(plan_renames(mapping), self.wip_dir, self._latest_dirs())
+            check_ops(ops)
+            moved = [f for old_name in mapping for f in self._shot_files(old_name)]
+            moved_dirs = [d for old_name in mapping for d in (self.wip_dir / old_name).rglob('*') if d.is_dir()]
+
+            journal.begin(mapping, ops, rekeys)
+            try:
+                self._finish_renames(journal, mapping, ops, rekeys)
+            finally:
+                journal.close()
+
+        # The remote needs the old paths removed and the new ones pushed; the
+        # watcher must not report either.
+        renamed = [f for new_name in mapping.values() for f in self._shot_files(new_name)]
+        renamed_dirs = [d for new_name in mapping.values() for d in (self.wip_dir / new_name).rglob('*') if d.is_dir()]
+        note_writes(*moved, *renamed, *moved_dirs, *renamed_dirs)
+        if self.storage_service:
+            self.storage_service.mark_dirty(*moved, *renamed)
+
+    def _finish_renames(self, journal, mapping, ops, rekeys, start=0):
+        run_ops(journal, ops, start)
+        note_writes(*(path for op in ops for path in op))
+        thumbnail_cache = get_thumbnail_cache()
+        for old_path, new_path in rekeys:
+            thumbnail_cache.rekey(old_path, new_path)
+        self.invalidate(*mapping, *mapping.values())
+        journal.finish()
+
+    def _recover_renames(self, journal):
+        """Finish renames a crashed worker left in ``journal`` (caller holds its lock)."""
+        if not journal.exists():
+            return
+        plan, start = journal.load()
+        logger.warning("Finishing interrupted shot renames in %s (%d of %d done)",
+                       self.project_path, start, len(plan['ops']))
+        try:
+            self._finish_renames(journal, plan['mapping'], plan['ops'], plan['rekeys'], start)
+        finally:
+            journal.close()
+
+    def _shot_files(self, shot_name):
+        """Return every file belonging to ``shot_name`` (WIP tree and finals)."""
+        files = [p for p in (self.wip_dir / shot_name).rglob('*') if p.is_file()]
+        for final_dir in (self.latest_images_dir, self.latest_videos_dir):
+            files.extend(final_dir.glob(f'{shot_name}.*'))
+        return files
 
     def create_shot_structure(self, shot_name):
         """Create folder structure for a shot."""
@@ -110,6 +205,9 @@ class ShotManager:
         self.latest_images_dir.mkdir(parents=True, exist_ok=True)
         self.latest_videos_dir.mkdir(parents=True, exist_ok=True)
 
+        note_writes(shot_dir, *(shot_dir / sub for sub in ('images', 'videos', 'lipsync')))
+        self.invalidate(shot_name)
+        publish('shot_created', self.project_path, shot_name)
         return shot_dir
 
     def get_next_shot_number(self):
@@ -125,23 +223,206 @@ class ShotManager:
 
         return (max(existing_shots) + 10) if existing_shots else 10
 
+    def invalidate(self, *shot_names):
+        """Mark ``shot_names`` as changed for this and every other worker."""
+        self.index.invalidate(*shot_names)
+        self.index.save()
+        try:
+            get_shared_state().bump(self.generation_key)
+        except Exception as e:
+            logger.warning("Failed to bump shot generation for %s: %s", self.project_path, e)
+
     def get_shots(self):
         """Get all shots in the project."""
+        return self.get_listing()['shots']
+
+    def get_listing(self):
+        """Return the shot listing together with its revision bookkeeping.
+
+        The result is a dict with ``shots``, the project-level ``revision``
+        (bumped whenever any shot's data changes), ``revs`` (shot name ->
+        revision of its last change), ``removed`` (tombstones: name ->
+        revision it disappeared at) and ``horizon`` (deltas from revisions
+        older than this cannot be answered because tombstones were dropped).
+
+        The listing is shared between workers and reused until a shot of the
+        project changes or it is older than ``SHOT_LISTING_TTL`` (with the
+        filesystem watcher running, ``WATCHED_LISTING_TTL``).
+        """
         # Ensure we're looking at the correct project's wip directory
         if not self.wip_dir.exists() or not self.project_path.exists():
+            return self._unshared_listing([])
+
+        # The generation is read once, before the scan: a change another
+        # worker makes while we scan bumps it past the one the result is
+        # stored under, so the result is never served as current.
+        try:
+            generation = get_shared_state().generation(self.generation_key)
+        except Exception as e:
+            logger.warning("Shared state unavailable, scanning shots: %s", e)
+            return self._unshared_listing(self._scan_shots())
+
+        cached = self._cached_listing(generation)
+        if cached is not None:
+            return cached
+
+        shots = self._scan_shots()
+        try:
+            return get_shared_state().update_cached(
+                self.listing_key, generation, lambda previous: self._listing(shots, previous)
+            )
+        except Exception as e:
+            logger.warning("Failed to cache shot listing: %s", e)
+            return self._unshared_listing(shots)
+
+    def _cached_listing(self, generation=None):
+        """Return the shared listing if it is current and complete, else ``None``.
+
+        ``generation`` is the project generation the caller read; by default
+        the current one.
+        """
+        try:
+            if generation is None:
+                generation = get_shared_state().generation(self.generation_key)
+            max_age = WATCHED_LISTING_TTL if WATCH_ENABLED else SHOT_LISTING_TTL
+            cached = get_shared_state().get_cached(self.listing_key, generation, max_age=max_age)
+        except Exception as e:
+            logger.warning("Shared state unavailable, scanning shots: %s", e)
+            return None
+        # Listings with thumbnails still rendering are not reused: their
+        # status changes without the project generation moving.
+        if isinstance(cached, dict) and cached.get('format') == LISTING_FORMAT and cached['complete']:
+            return cached
+        return None
+
+    def _unshared_listing(self, shots):
+        # Without shared state there is no revision history to speak of.
+        return dict(self._listing(shots, None), revision=None)
+
+    def _listing(self, shots, previous):
+        """Build the listing for ``shots``, advancing ``previous``'s revisions."""
+        if not (isinstance(previous, dict) and previous.get('format') == LISTING_FORMAT):
+            previous = {'revision': 0, 'shots': [], 'revs': {}, 'removed': {}, 'horizon': 0}
+        revision = previous['revision']
+        revs = dict(previous['revs'])
+        removed = dict(previous['removed'])
+        horizon = previous['horizon']
+
+        old = {shot['name']: shot for shot in previous['shots']}
+        new = {shot['name']: shot for shot in shots}
+        changed = [name for name, shot in new.items() if old.get(name) != shot]
+        gone = [name for name in old if name not in new]
+        if changed or gone or not revision:
+            revision += 1
+            for name in changed:
+                revs[name] = revision
+                removed.pop(name, None)
+            for name in gone:
+                revs.pop(name, None)
+                removed[name] = revision
+            if len(removed) > MAX_TOMBSTONES:
+                oldest = sorted(removed.items(), key=lambda item: item[1])[:len(removed) - MAX_TOMBSTONES]
+                for name, rev in oldest:
+                    del removed[name]
+                    horizon = max(horizon, rev)
+
+        return {
+            'format': LISTING_FORMAT,
+            'revision': revision,
+            'shots': shots,
+            'revs': revs,
+            'removed': removed,
+            'horizon': horizon,
+            'complete': not any(self._has_pending_thumbnail(shot) for shot in shots),
+        }
+
+    def list_shot_names(self):
+        """Return the sorted names of all shot folders."""
+        if not self.wip_dir.exists():
             return []
+        with os.scandir(self.wip_dir) as it:
+            return sorted(e.name for e in it if e.name.startswith('SH') and e.is_dir())
 
+    def get_shots_page(self, offset=0, limit=None, fields=None, name_from=None, name_to=None):
+        """Return ``(shots, total)`` for one page of the listing.
+
+        Only the shots in the page are looked at, and only for ``fields``, so
+        the cost does not grow with the project.  A fresh shared listing is
+        sliced instead when one exists.  ``name_from``/``name_to`` bound the
+        shot names inclusively; an upper bound without a sub-shot part also
+        includes that shot's sub-shots (``SH200`` covers ``SH200_050``).
+        """
+        if fields is not None:
+            unknown = set(fields) - set(SHOT_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        def in_range(name):
+            if name_from and name < name_from:
+                return False
+            if name_to:
+                bound = name if '_' in name_to else name.split('_')[0]
+                if bound > name_to:
+                    return False
+            return True
+
+        end = None if limit is None else offset + limit
+        cached = self._cached_listing()
+        if cached is not None:
+            selected = [shot for shot in cached['shots'] if in_range(shot['name'])]
+            page = [
+                shot if fields is None else {k: v for k, v in shot.items() if k == 'name' or k in fields}
+                for shot in selected[offset:end]
+            ]
+            return page, len(selected)
+
+        names = [name for name in self.list_shot_names() if in_range(name)]
+        shots = []
+        for name in names[offset:end]:
+            try:
+                shot_info = self.get_shot_info(name, save_index=False, fields=fields)
+                if shot_info:
+                    shots.append(shot_info)
+            except Exception as e:
+                logger.warning("Failed to get shot info for %s: %s", name, e)
+        self.index.save()
+        return shots, len(names)
+
+    def get_changes(self, since):
+        """Return ``(listing, changed_shots, removed_names)`` since revision ``since``.
+
+        ``changed_shots`` is ``None`` when the delta cannot be computed (the
+        revision is unknown or older than the retained tombstones); callers
+        should then send the full listing.
+        """
+        listing = self.get_listing()
+        if listing['revision'] is None or since < listing['horizon'] or since > listing['revision']:
+            return listing, None, None
+        changed = [shot for shot in listing['shots'] if listing['revs'].get(shot['name'], 0) > since]
+        removed = sorted(name for name, rev in listing['removed'].items() if rev > since)
+        return listing, changed, removed
+
+    @staticmethod
+    def _has_pending_thumbnail(shot):
+        assets = [shot.get('image'), shot.get('video'), *(shot.get('lipsync') or {}).values()]
+        return any(isinstance(a, dict) and a.get('thumbnail_status') == PENDING for a in assets)
+
+    def _scan_shots(self):
+        """Build the listing from the per-project shot index."""
         shots = []
         # Only look at directories that are actually shot folders
-        for shot_dir in sorted(self.wip_dir.iterdir()):
-            if shot_dir.is_dir() and shot_dir.name.startswith('SH'):
-                try:
-                    shot_info = self.get_shot_info(shot_dir.name)
-                    if shot_info:  # Only add if shot info is valid
-                        shots.append(shot_info)
-                except Exception as e:
-                    logger.warning("Failed to get shot info for %s: %s", shot_dir.name, e)
-                    continue
+        names = self.list_shot_names()
+        for name in names:
+            try:
+                shot_info = self.get_shot_info(name, save_index=False)
+                if shot_info:  # Only add if shot info is valid
+                    shots.append(shot_info)
+            except Exception as e:
+                logger.warning("Failed to get shot info for %s: %s", name, e)
+                continue
+
+        self.index.prune(names)
+        self.index.save()
         return shots
 
     def create_shot_between(self, after_shot=None):
@@ -234,145 +515,82 @@ class ShotManager:
 
         return f"{base_shot}_{next_num:03d}"
 
-    def get_shot_info(self, shot_name):
-        """Get information about a specific shot."""
+    def get_shot_info(self, shot_name, save_index=True, fields=None):
+        """Get information about a specific shot.
+
+        ``fields`` limits the result to these keys (``name`` is always
+        included); ``None`` returns everything.
+        """
         validate_shot_name(shot_name)
-        
-        # Ensure we're working within the correct project
-        if not self.project_path.exists():
-            logger.error("Project path does not exist: %s", self.project_path)
-            return None
-            
         shot_dir = self.wip_dir / shot_name
-        
-        # Validate shot directory is within project bounds
-        try:
-            shot_dir = shot_dir.resolve()
-            if not str(shot_dir).startswith(str(self.project_path.resolve())):
-                logger.error("Shot directory outside project bounds: %s", shot_dir)
-                return None
-        except Exception as e:
-            logger.error("Invalid shot directory path: %s", e)
-            return None
 
-        if not shot_dir.exists():
+        # The signature stats the shot folder anyway; a zero mtime means it
+        # (or the whole project) is missing.
+        signature = ShotIndex.signature(shot_dir)
+        if not signature[0]:
             logger.warning("Shot directory does not exist: %s", shot_dir)
             return None
 
-        # Load notes
-        notes = ''
-        notes_file = shot_dir / 'notes.txt'
-        if notes_file.exists():
+        entry = self.index.get(shot_name, signature)
+        if entry is None:
+            # Validate shot directory is within project bounds (it could be a
+            # symlink). Only needed when the folder changed.
             try:
-                with open(notes_file, 'r', encoding='utf-8') as f:
-                    notes = f.read().strip()
-            except Exception:
-                pass
-
-        # Latest image
-        latest_image, image_version = self._get_latest_asset(
-            self.latest_images_dir, shot_dir / 'images',
-            shot_name, ALLOWED_IMAGE_EXTENSIONS
-        )
-        latest_image = str(Path(latest_image).resolve()) if latest_image else None
-
-        # Latest video
-        latest_video, video_version = self._get_latest_asset(
-            self.latest_videos_dir, shot_dir / 'videos',
-            shot_name, ALLOWED_VIDEO_EXTENSIONS
-        )
-        latest_video = str(Path(latest_video).resolve()) if latest_video else None
-
-        # Lipsync videos
-        lipsync_dir = shot_dir / 'lipsync'
-        lipsync = {}
-        for part in ['driver', 'target', 'result']:
-            file_path, ver = self._get_latest_asset(
-                lipsync_dir, lipsync_dir,
-                f'{shot_name}_{part}', ALLOWED_VIDEO_EXTENSIONS
-            )
-            file_path = str(Path(file_path).resolve()) if file_path else None
-            lipsync[part] = {
-                'file': file_path,
-                'version': ver,
-                'thumbnail': None  # will be replaced with image thumb below
-            }
-
-        # Thumbnails
-        image_thumb = self.get_thumbnail_path(Path(latest_image), shot_name) if latest_image else None
-
-        # Video thumbnails mirror the image thumbnail.  No separate thumbnail is
-        # generated for videos. Same for lipsync clips.
-        video_thumb = image_thumb
-        for part in lipsync.values():
-            part['thumbnail'] = image_thumb
-
-        logger.debug("%s -> Image thumbnail: %s", shot_name, image_thumb)
-        logger.debug("%s -> Video thumbnail: %s", shot_name, video_thumb)
-
-        return {
-            'name': shot_name,
-            'notes': notes,
-            'image': {
+                if not str(shot_dir.resolve()).startswith(str(self._project_root)):
+                    logger.error("Shot directory outside project bounds: %s", shot_dir)
+                    return None
+            except Exception as e:
+                logger.error("Invalid shot directory path: %s", e)
+                return None
+            entry = self.index.put(shot_name, signature, scan_shot(shot_dir, shot_name))
+        if save_index:
+            self.index.save()
+
+        info = {'name': shot_name}
+        if fields is None or 'notes' in fields:
+            info['notes'] = entry['notes']
+
+        # Thumbnails are rendered in the background; until they are ready
+        # the status is ``pending`` and ``thumbnail`` is ``None``.  Videos and
+        # lipsync clips get a poster frame of their own.  Assets that were
+        # not requested cost no filesystem access at all.
+        if fields is None or 'image' in fields:
+            latest_image = self._latest_final(self.latest_images_dir, shot_name, ALLOWED_IMAGE_EXTENSIONS)
+            info['image'] = {
                 'file': latest_image,
-                'version': image_version,
-                'thumbnail': image_thumb
-            },
-            'video': {
+                'version': entry['image_version'],
+                **self._thumbnail_fields(latest_image)
+            }
+        if fields is None or 'video' in fields:
+            latest_video = self._latest_final(self.latest_videos_dir, shot_name, ALLOWED_VIDEO_EXTENSIONS)
+            info['video'] = {
                 'file': latest_video,
-                'version': video_version,
-                'thumbnail': video_thumb
-            },
-            'lipsync': lipsync,
-            'archived': False  # TODO: Implement archiving
-        }
-
-
-    def _get_latest_asset(self, final_dir, wip_dir, shot_name, extensions):
-        """Helper for finding the latest final or highest versioned WIP asset."""
-        # Validate directories are within project bounds
-        try:
-            project_root = self.project_path.resolve()
-            if final_dir and final_dir.exists():
-                final_dir = final_dir.resolve()
-                if not str(final_dir).startswith(str(project_root)):
-                    logger.error("Final directory outside project bounds: %s", final_dir)
-                    return None, 0
-            if wip_dir and wip_dir.exists():
-                wip_dir = wip_dir.resolve()
-                if not str(wip_dir).startswith(str(project_root)):
-                    logger.error("WIP directory outside project bounds: %s", wip_dir)
-                    return None, 0
-        except Exception as e:
-            logger.error("Path validation error: %s", e)
-            return None, 0
-
-        latest_final = None
-        if final_dir.exists():
-            for ext in extensions:
-                candidate = final_dir / f'{shot_name}{ext}'
-                if candidate.exists():
-                    latest_final = str(candidate)
-                    break
-
-        version = 0
-        if wip_dir.exists():
-            wip_files = []
-            for ext in extensions:
-                wip_files.extend(wip_dir.glob(f'{shot_name}_v*{ext}'))
-
-            versions = []
-            for f in wip_files:
-                try:
-                    version_str = f.stem.split('_v')[1]
-                    versions.append(int(version_str))
-                except (IndexError, ValueError):
-                    continue
-
-            if versions:
-                version = max(versions)
-
-        return latest_final, version
+                'version': entry['video_version'],
+                **self._thumbnail_fields(latest_video)
+            }
+        if fields is None or 'lipsync' in fields:
+            lipsync_dir = shot_dir / 'lipsync'
+            lipsync = {}
+            for part in LIPSYNC_PARTS:
+                cached = entry['lipsync'][part]
+                lipsync[part] = {
+                    'file': str(lipsync_dir / cached['file']) if cached['file'] else None,
+                    'version': cached['version'],
+                }
+                lipsync[part].update(self._thumbnail_fields(lipsync[part]['file']))
+            info['lipsync'] = lipsync
+        if fields is None or 'archived' in fields:
+            info['archived'] = False  # TODO: Implement archiving
+        return info
+
+    def _latest_final(self, final_dir, shot_name, extensions):
+        """Return the absolute path of the final asset for ``shot_name``."""
+        names = self.index.latest_files(final_dir).get(shot_name, ())
+        for ext in extensions:
+            filename = f'{shot_name}{ext}'
+            if filename in names:
+                return os.path.join(self._real_dirs[final_dir], filename)
+        return None
 
     def save_shot_notes(self, shot_name, notes):
         """Save notes for a shot."""
@@ -387,33 +605,42 @@ class ShotManager:
                 f.write(notes)
         except Exception as e:
             raise ValueError(f"Failed to save notes: {str(e)}")
+        note_writes(notes_file)
+        self.invalidate(shot_name)
+        publish('notes', self.project_path, shot_name)
+        if self.storage_service:
+            self.storage_service.mark_dirty(notes_file)
+
+    def _thumbnail_fields(self, source):
+        """Return the thumbnail fields of an asset dict without blocking."""
+        if not source:
+            return {'thumbnail': None, 'thumbnail_srcset': None, 'thumbnail_key': None, 'thumbnail_status': None}
+        try:
+            key, status = get_thumbnail_queue().request(source)
+        except Exception as e:
+            logger.warning("Error queueing thumbnail: %s", e)
+            key, status = None, None
+        return {
+            'thumbnail': ThumbnailCache.url_for_key(key) if status == READY else None,
+            'thumbnail_srcset': ThumbnailCache.srcset_for_key(key) if status == READY else None,
+            'thumbnail_key': key,
+            'thumbnail_status': status,
+        }
 
     def get_thumbnail_path(self, image_path, shot_name):
         """Return (and create if necessary) the thumbnail for an image."""
         if not image_path:
             return None
 
-        image_path = Path(image_path)
-        thumb_filename = f"{shot_name}_{image_path.stem}_thumb.jpg"
-        thumb_path = THUMBNAIL_CACHE_DIR / thumb_filename
-
-        if not thumb_path.exists():
-            try:
-                THUMBNAIL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
-                with Image.open(image_path) as img:
-                    img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
-                    if img.mode in ("RGBA", "LA", "P"):
-                        background = Image.new("RGB", img.size, (64, 64, 64))
-                        if img.mode == "P":
-                            img = img.convert("RGBA")
-                        background.paste(img, mask=img.split()[-1] if "A" in img.mode else None)
-                        img = background
-                    img.save(str(thumb_path), "JPEG", quality=85)
-            except Exception as e:
-                logger.warning("Error creating thumbnail: %s", e)
-                return None
+        try:
+            thumb_path = get_thumbnail_cache().get(image_path)
+        except Exception as e:
+            logger.warning("Error creating thumbnail: %s", e)
+            return None
+        if thumb_path is None:
+            return None
 
-        return f"/static/thumbnails/{thumb_filename}"
+        return f"/static/thumbnails/{thumb_path.name}"
 
 def get_shot_manager(project_path, cache=None):
     """Retrieve a cached ``ShotManager`` for the given path."""
@@ -424,7 +651,7 @@ def get_shot_manager(project_path, cache=None):
 
     path_key = str(Path(project_path).resolve())
     if path_key not in cache:
-        cache[path_key] = ShotManager(path_key)
+        cache[path_key] = ShotManager(path_key, current_app.config.get('STORAGE_SERVICE'))
     return cache[path_key]
 
 
@@ -0,0 +1,99 @@
+"""Single-pass scanning of a shot folder.
+
+Each sub-folder of a shot (``images``, ``videos``, ``lipsync``) is listed
+exactly once with ``os.scandir``, and the entries are classified in memory:
+versioned WIP files (``<name>_v<NNN><ext>``) and, for lipsync, the published
+clip of each part (``<name>_<part><ext>``).  The previous implementation ran
+one glob per allowed extension per folder and one ``exists()`` per candidate
+final, i.e. dozens of syscalls per shot.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+
+from app.config.constants import ALLOWED_IMAGE_EXTENSIONS, ALLOWED_VIDEO_EXTENSIONS
+
+LIPSYNC_PARTS = ('driver', 'target', 'result')
+
+# ``<prefix>_v<digits><ext>`` – ``prefix`` is the shot name or, for lipsync,
+# ``<shot>_<part>``.
+VERSIONED_RE = re.compile(r'^(?P<prefix>.+)_v(?P<version>\d+)(?P<ext>\.[^.]+)$')
+
+# A version reserved by an upload still in progress has a hidden marker next
+# to it, ``.<name>.reserving`` (see ``FileHandler._reserve_version``).
+RESERVATION_SUFFIX = '.reserving'
+
+
+def reservation_marker(name):
+    """Return the name of the marker reserving the file ``name``."""
+    return f'.{name}{RESERVATION_SUFFIX}'
+
+
+def reserved_name(marker):
+    """Return the file reserved by ``marker``, or ``None`` if it is not a marker."""
+    if marker.startswith('.') and marker.endswith(RESERVATION_SUFFIX):
+        return marker[1:-len(RESERVATION_SUFFIX)]
+    return None
+
+
+def list_files(directory, skip_reserved=False):
+    """Return the names of the regular files in ``directory`` (empty if it is missing).
+
+    ``skip_reserved`` leaves out files reserved by uploads still in progress.
+    """
+    try:
+        with os.scandir(directory) as it:
+            names = [entry.name for entry in it if entry.is_file()]
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+    if skip_reserved:
+        present = set(names)
+        names = [name for name in names if reservation_marker(name) not in present]
+    return names
+
+
+def max_versions(names, extensions):
+    """Return ``{prefix: highest version}`` for the versioned files in ``names``."""
+    versions = {}
+    for name in names:
+        match = VERSIONED_RE.match(name)
+        if match and match['ext'] in extensions:
+            prefix = match['prefix']
+            versions[prefix] = max(versions.get(prefix, 0), int(match['version']))
+    return versions
+
+
+def read_notes(shot_dir):
+    try:
+        with open(os.path.join(shot_dir, 'notes.txt'), 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except (OSError, ValueError):  # missing or undecodable
+        return ''
+
+
+def scan_shot(shot_dir, shot_name):
+    """Return the shot index entry for ``shot_dir`` (see ``ShotIndex``)."""
+    shot_dir = str(shot_dir)
+    notes = read_notes(shot_dir)
+
+    images = max_versions(list_files(os.path.join(shot_dir, 'images'), skip_reserved=True), ALLOWED_IMAGE_EXTENSIONS)
+    videos = max_versions(list_files(os.path.join(shot_dir, 'videos'), skip_reserved=True), ALLOWED_VIDEO_EXTENSIONS)
+
+    lipsync_names = list_files(os.path.join(shot_dir, 'lipsync'), skip_reserved=True)
+    lipsync_versions = max_versions(lipsync_names, ALLOWED_VIDEO_EXTENSIONS)
+    present = set(lipsync_names)
+    lipsync = {}
+    for part in LIPSYNC_PARTS:
+        base = f'{shot_name}_{part}'
+        final = next((f'{base}{ext}' for ext in ALLOWED_VIDEO_EXTENSIONS if f'{base}{ext}' in present), None)
+        lipsync[part] = {'file': final, 'version': lipsync_versions.get(base, 0)}
+
+    return {
+        'notes': notes,
+        'notes_digest': hashlib.sha1(notes.encode('utf-8')).hexdigest(),
+        'image_version': images.get(shot_name, 0),
+        'video_version': videos.get(shot_name, 0),
+        'lipsync': lipsync,
+    }
@@ -0,0 +1,293 @@
+"""Sprite atlases of the shot grid.
+
+The grid shows one thumbnail per asset, which for a large project means
+hundreds of requests.  ``SpriteAtlas`` pastes the ready thumbnails of a
+project, in listing order, into a few pages of up to ``ATLAS_TILES_PER_PAGE``
+tiles and returns a map from thumbnail key to page and offset.  Every tile
+is captioned with its shot, asset and version, so the pages double as a
+contact sheet (:meth:`SpriteAtlas.contact_sheet` bundles them into a PDF).
+
+Pages are cut at shots whose name hashes to a page boundary (see
+:func:`atlas_pages`), not every N tiles, so a shot added, removed or updated
+only changes the page it sits on.  A page is named after a hash of the tiles
+it holds; thumbnail keys change whenever their source does, so a page name
+identifies its content and page images are immutable.  After a change only
+the pages whose tiles differ are rendered again, on a background thread:
+until then the map leaves them out (``pending`` counts them) and the grid
+keeps loading those thumbnails one by one.  The complete map is cached in
+the shared state for the listing revision it was built at.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+
+from app.config.constants import (
+    ATLAS_CACHE_DIR,
+    ATLAS_COLUMNS,
+    ATLAS_LABEL_HEIGHT,
+    ATLAS_RETENTION,
+    ATLAS_TILES_PER_PAGE,
+    THUMBNAIL_SIZE,
+)
+from app.services.shared_state import get_shared_state
+from app.services.thumbnail_cache import TOUCH_INTERVAL, get_thumbnail_cache
+from app.services.thumbnail_worker import READY
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever the page layout changes, so old pages and maps are not reused.
+ATLAS_FORMAT = 2
+ATLAS_URL_PREFIX = "/api/shots/atlas/"
+
+# A page ends after about one shot in SHOTS_PER_PAGE (by name hash).  Shots
+# have two tiles on average, so pages usually stay well below the cap.
+SHOTS_PER_PAGE = max(1, ATLAS_TILES_PER_PAGE // 4)
+
+# Pages are rendered one at a time per process, next to the thumbnail pool.
+RENDER_WORKERS = 1
+
+BACKGROUND = (26, 26, 26)
+EMPTY_TILE = (64, 64, 64)
+LABEL_COLOR = (200, 200, 200)
+
+_render_lock = threading.Lock()
+_rendering = {}  # page name -> Future
+_render_executor = None
+
+
+def _shot_tiles(shot, seen):
+    """Return ``(key, caption)`` for the ready thumbnails of ``shot`` not in ``seen``."""
+    tiles = []
+    assets = [('image', shot.get('image')), ('video', shot.get('video'))]
+    assets += list((shot.get('lipsync') or {}).items())
+    for label, asset in assets:
+        if not isinstance(asset, dict) or asset.get('thumbnail_status') != READY:
+            continue
+        key = asset['thumbnail_key']
+        if key in seen:
+            continue
+        seen.add(key)
+        tiles.append((key, f"{shot['name']} {label} v{asset['version']:03d}"))
+    return tiles
+
+
+def _ends_page(shot_name):
+    digest = hashlib.sha1(shot_name.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % SHOTS_PER_PAGE == 0
+
+
+def atlas_pages(shots):
+    """Split the ready thumbnails of ``shots`` into pages of ``(key, caption)`` tiles.
+
+    A page ends after every shot whose name is a boundary (:func:`_ends_page`)
+    and, early, before a shot that would take it past
+    ``ATLAS_TILES_PER_PAGE`` tiles.  Boundaries depend on nothing but the
+    shot's own name, so a changed shot can at most move the breaks up to the
+    next boundary; the pages before and after it stay the same.
+    """
+    pages, tiles, seen = [], [], set()
+    for shot in shots:
+        shot_tiles = _shot_tiles(shot, seen)
+        if tiles and len(tiles) + len(shot_tiles) > ATLAS_TILES_PER_PAGE:
+            pages.append(tiles)
+            tiles = []
+        tiles.extend(shot_tiles)
+        if tiles and _ends_page(shot['name']):
+            pages.append(tiles)
+            tiles = []
+    if tiles:
+        pages.append(tiles)
+    return pages
+
+
+def page_name(tiles):
+    """Return the content name of a page holding ``tiles``."""
+    payload = json.dumps([ATLAS_FORMAT, THUMBNAIL_SIZE, ATLAS_COLUMNS, ATLAS_LABEL_HEIGHT, tiles])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _get_render_executor():
+    global _render_executor
+    if _render_executor is None:
+        _render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="atlas-page")
+    return _render_executor
+
+
+class SpriteAtlas:
+    """Atlas pages and offset map for the shots of one project."""
+
+    def __init__(self, project_path):
+        self.project_path = Path(project_path).resolve()
+        self.cache_key = f'atlas:{self.project_path}'
+        ATLAS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def page_path(name):
+        return ATLAS_CACHE_DIR / f"{name}.jpg"
+
+    def get(self, listing, wait_for_pages=False):
+        """Return the atlas map for ``listing`` (see ``ShotManager.get_listing``).
+
+        The map has the ``revision`` it was built at, the ``tile`` size,
+        ``pages`` (``name``, ``url``, ``columns``, ``width``, ``height``),
+        ``tiles``: thumbnail key -> ``[page index, x, y]`` of its top left
+        corner, and ``pending``, the number of pages still being rendered.
+        Thumbnails that are not ready yet, or whose page is pending, are left
+        out.  ``wait_for_pages`` blocks until the pending pages are done.
+        """
+        revision = listing['revision']
+        if revision is not None:
+            try:
+                cached = get_shared_state().get_cached(self.cache_key, revision)
+            except Exception as e:
+                logger.warning("Shared state unavailable, building atlas: %s", e)
+                cached = None
+            if (isinstance(cached, dict) and cached.get('format') == ATLAS_FORMAT
+                    and all(self._touch(page['name']) for page in cached['pages'])):
+                return cached
+
+        pages = atlas_pages(listing['shots'])
+        atlas, queued = self._build(pages, revision)
+        if queued:
+            self.prune({page_name(tiles) for tiles in pages})
+            if wait_for_pages:
+                wait(queued)
+                atlas, queued = self._build(pages, revision)
+        # A listing with thumbnails still rendering gets a new revision once
+        # they are ready; until then (and while pages are rendered) the map
+        # is rebuilt on every request.
+        if revision is not None and listing.get('complete') and not queued:
+            try:
+                get_shared_state().set_cached(self.cache_key, revision, atlas)
+            except Exception as e:
+                logger.warning("Failed to cache atlas for %s: %s", self.project_path, e)
+        return atlas
+
+    def _build(self, pages, revision):
+        """Return the map of the rendered ``pages`` and the futures of the queued ones."""
+        width, height = THUMBNAIL_SIZE
+        cell_height = height + ATLAS_LABEL_HEIGHT
+        entries, positions, queued = [], {}, []
+        for tiles in pages:
+            name = page_name(tiles)
+            columns = min(ATLAS_COLUMNS, len(tiles))
+            rows = -(-len(tiles) // columns)
+            if not self._touch(name):
+                queued.append(self._queue_page(name, tiles, columns, rows))
+                continue
+            index = len(entries)
+            entries.append({
+                'name': name,
+                'url': f"{ATLAS_URL_PREFIX}{name}.jpg",
+                'columns': columns,
+                'width': columns * width,
+                'height': rows * cell_height,
+            })
+            for slot, (key, _) in enumerate(tiles):
+                positions[key] = [index, (slot % columns) * width, (slot // columns) * cell_height]
+        atlas = {
+            'format': ATLAS_FORMAT,
+            'revision': revision,
+            'tile': {'width': width, 'height': height, 'label_height': ATLAS_LABEL_HEIGHT},
+            'pages': entries,
+            'tiles': positions,
+            'pending': len(queued),
+        }
+        return atlas, queued
+
+    def _queue_page(self, name, tiles, columns, rows):
+        """Render page ``name`` in the background (once); return its future."""
+        with _render_lock:
+            future = _rendering.get(name)
+            if future is None:
+                future = _get_render_executor().submit(self._render_job, name, tiles, columns, rows)
+                _rendering[name] = future
+        return future
+
+    def _render_job(self, name, tiles, columns, rows):
+        try:
+            # Another worker process may have rendered it meanwhile.
+            if not self._touch(name):
+                self._render_page(tiles, self.page_path(name), columns, rows)
+        except Exception:
+            logger.exception("Failed to render atlas page %s", name)
+        finally:
+            with _render_lock:
+                _rendering.pop(name, None)
+
+    def _render_page(self, tiles, dest, columns, rows):
+        """Paste the thumbnails of ``tiles`` into one page and write it to ``dest``."""
+        width, height = THUMBNAIL_SIZE
+        cell_height = height + ATLAS_LABEL_HEIGHT
+        thumbnails = get_thumbnail_cache()
+        font = ImageFont.load_default(size=12)
+        page = Image.new('RGB', (columns * width, rows * cell_height), BACKGROUND)
+        draw = ImageDraw.Draw(page)
+        for slot, (key, caption) in enumerate(tiles):
+            x, y = (slot % columns) * width, (slot // columns) * cell_height
+            thumb_path = thumbnails.lookup(key) or thumbnails.restore(key)
+            if thumb_path is None:
+                page.paste(EMPTY_TILE, (x, y, x + width, y + height))
+            else:
+                # Cropped to the cell like the grid's ``object-fit: cover``.
+                with Image.open(thumb_path) as thumb:
+                    page.paste(ImageOps.fit(thumb.convert('RGB'), (width, height)), (x, y))
+            draw.text((x + 4, y + height + 3), caption, fill=LABEL_COLOR, font=font)
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        page.save(str(tmp), 'JPEG', quality=85)
+        os.replace(tmp, dest)
+
+    def _touch(self, name):
+        """Return whether page ``name`` exists, refreshing its mtime for :meth:`prune`."""
+        path = self.page_path(name)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return False
+        if time.time() - st.st_mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return True
+
+    def prune(self, keep=()):
+        """Delete pages not used for ``ATLAS_RETENTION`` seconds, except ``keep``.
+
+        Pages are shared by every project, so only age decides: a client
+        holding an older map can still load its pages for a while.
+        """
+        cutoff = time.time() - ATLAS_RETENTION
+        with os.scandir(ATLAS_CACHE_DIR) as it:
+            for entry in it:
+                if not entry.name.endswith('.jpg') or entry.name[:-len('.jpg')] in keep:
+                    continue
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                except OSError:
+                    pass
+
+    def contact_sheet(self, listing):
+        """Return the atlas pages of ``listing`` as a PDF (bytes), one page each."""
+        atlas = self.get(listing, wait_for_pages=True)
+        if not atlas['pages']:
+            raise ValueError("No thumbnails to put on a contact sheet yet")
+        pages = [Image.open(self.page_path(page['name'])) for page in atlas['pages']]
+        try:
+            buf = io.BytesIO()
+            pages[0].save(buf, 'PDF', save_all=True, append_images=pages[1:], resolution=150)
+        finally:
+            for page in pages:
+                page.close()
+        return buf.getvalue()
@@ -8,6 +8,14 @@ Key goals
 1. **Single responsibility** – Every file write goes through this service.
 2. **Automatic sync** – After a successful write, the service optionally
    invokes an *asynchronous* rclone command to propagate changes to a remote.
+   A single scheduler thread debounces and coalesces sync requests: at most
+   one rclone run is in flight, triggers arriving meanwhile are merged into
+   one follow-up run, and failures are retried with exponential backoff.
+   Writers record the paths they touched with :meth:`StorageService.mark_dirty`
+   in a journal shared by all workers; a run only pushes those paths
+   (``rclone copy --files-from`` / ``rclone delete --files-from``). A full
+   ``rclone sync`` still runs on a slow schedule to reconcile anything the
+   journal missed.
 3. **Configurability** – Local root directory and rclone remote are supplied via
    environment variables so they can be changed without touching the code.
 
@@ -18,15 +26,22 @@ et al. to call the new methods.
 from __future__ import annotations
 
 import os
+import shutil
 import subprocess
+import tempfile
 import threading
 from pathlib import Path
 from typing import Union, BinaryIO, Optional
 import logging
 import time
 
+from app.config.constants import STATE_DIR
+from app.utils import file_lock
+
 logger = logging.getLogger(__name__)
 
+COPY_CHUNK_SIZE = 1024 * 1024
+
 
 class StorageService:
     """Wrapper for local file I/O with optional rclone background sync."""
@@ -45,8 +60,38 @@ class StorageService:
         self.rclone_remote = rclone_remote or os.environ.get("RCLONE_REMOTE")
 
         # Custom flags passed to every rclone invocation – if not provided use a
-        # sane default optimised for many small files.
-        self.rclone_flags = rclone_flags or ["--fast-list", "--update"]
+        # sane default optimised for many small files. Server-side state
+        # (upload staging, shared caches) is never pushed.
+        self.rclone_flags = rclone_flags or ["--fast-list", "--update", "--exclude", "/.shotbuddy/**"]
+
+        # --- sync scheduling ---
+        # Quiet period after the last trigger before a run starts, and the
+        # longest a trigger may wait while new ones keep arriving.
+        self.sync_debounce = float(os.environ.get("SHOTBUDDY_SYNC_DEBOUNCE", 5))
+        self.sync_max_delay = float(os.environ.get("SHOTBUDDY_SYNC_MAX_DELAY", 60))
+        self.retry_base_delay = float(os.environ.get("SHOTBUDDY_SYNC_RETRY_BASE", 30))
+        self.retry_max_delay = float(os.environ.get("SHOTBUDDY_SYNC_RETRY_MAX", 900))
+        self.full_sync_interval = float(os.environ.get("SHOTBUDDY_FULL_SYNC_INTERVAL", 6 * 3600))
+
+        # Dirty-path journal shared by every worker process.
+        self.state_dir = STATE_DIR
+        self.journal_path = self.state_dir / "sync_journal"
+        self._journal_lock_path = self.state_dir / "sync_journal.lock"
+        self._full_sync_stamp = self.state_dir / "last_full_sync"
+        # Held for every rclone run, so at most one runs across all workers.
+        self._sync_lock_path = self.state_dir / "sync.lock"
+
+        self._cond = threading.Condition()
+        self._worker: threading.Thread | None = None
+        self._sync_requested = False
+        self._queued_triggers = 0
+        self._first_trigger: float | None = None
+        self._last_trigger: float | None = None
+        self._retry_at: float | None = None
+        self._in_flight = False
+        self._consecutive_failures = 0
+        self._full_sync_requested = False
+        self._next_full_sync = time.monotonic() + self.full_sync_interval
 
         # --- sync status ---
         self._last_sync_ok: bool | None = None
@@ -54,6 +99,13 @@ class StorageService:
         self._last_sync_output: str | None = None
         self._last_sync_error: str | None = None
 
+        if self.rclone_remote:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            # Start the scheduler now so the periodic full sync also runs on
+            # a server that receives no uploads.
+            with self._cond:
+                self._ensure_worker()
+
     # ---------------------------------------------------------------------
     # Public API
     # ---------------------------------------------------------------------
@@ -66,13 +118,18 @@ class StorageService:
         dest.parent.mkdir(parents=True, exist_ok=True)
         dest.write_bytes(data)
         logger.debug("Saved %d bytes to %s", len(data), dest)
-        self._trigger_sync()
+        self.mark_dirty(dest)
         return dest
 
     def save_fileobj(self, fileobj: BinaryIO, relative_path: Union[str, Path]) -> Path:
-        """Stream *fileobj* to disk and return absolute path."""
-        data = fileobj.read()
-        return self.save_bytes(data, relative_path)
+        """Stream *fileobj* to disk in chunks and return absolute path."""
+        dest = self._resolve_dest(relative_path)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with dest.open("wb") as out:
+            shutil.copyfileobj(fileobj, out, COPY_CHUNK_SIZE)
+        logger.debug("Streamed %s", dest)
+        self.mark_dirty(dest)
+        return dest
 
     def copy_from_path(self, src: Union[str, Path], relative_dest: Union[str, Path]) -> Path:
         """Copy an existing *src* path into storage.
@@ -85,9 +142,9 @@ class StorageService:
             raise FileNotFoundError(src)
         dest = self._resolve_dest(relative_dest)
         dest.parent.mkdir(parents=True, exist_ok=True)
-        dest.write_bytes(src.read_bytes())
+        shutil.copyfile(src, dest)
         logger.debug("Copied %s -> %s", src, dest)
-        self._trigger_sync()
+        self.mark_dirty(dest)
         return dest
 
     # ------------------------------------------------------------------
@@ -104,66 +161,248 @@ class StorageService:
     # ------------------------------------------------------------------
     # rclone
     # ------------------------------------------------------------------
-    def _trigger_sync(self) -> None:
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._sync_loop, name="rclone-sync", daemon=True)
+            self._worker.start()
+
+    def _trigger_sync(self, full: bool = False) -> None:
+        if not self.rclone_remote:
+            logger.debug("No rclone remote configured – skipping sync")
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            self._sync_requested = True
+            self._full_sync_requested = self._full_sync_requested or full
+            self._queued_triggers += 1
+            if self._first_trigger is None:
+                self._first_trigger = now
+            self._last_trigger = now
+            self._ensure_worker()
+            self._cond.notify()
+
+    # ------------------------------------------------------------------
+    # Dirty-path journal
+    # ------------------------------------------------------------------
+    def mark_dirty(self, *paths: Union[str, Path]) -> None:
+        """Record *paths* as changed (created, modified or deleted) and request a sync.
+
+        Paths may be absolute or relative to ``local_root``; paths outside the
+        root are ignored.
+        """
         if not self.rclone_remote:
             logger.debug("No rclone remote configured – skipping sync")
             return
 
-        def _run():
-            cmd = [
-                "rclone",
-                "sync",
-                str(self.local_root),
-                f"{self.rclone_remote}",
-                *self.rclone_flags,
-            ]
-            logger.info("[StorageService] rclone sync: %s", " ".join(cmd))
+        lines = []
+        for path in paths:
+            path = Path(path)
+            if path.is_absolute():
+                try:
+                    path = path.relative_to(self.local_root)
+                except ValueError:
+                    logger.debug("Not syncing %s: outside %s", path, self.local_root)
+                    continue
+            lines.append(path.as_posix() + "\n")
+        if lines:
+            with file_lock(self._journal_lock_path):
+                with self.journal_path.open("a", encoding="utf-8") as f:
+                    f.writelines(lines)
+        self._trigger_sync()
 
+    def _drain_journal(self) -> list[str]:
+        """Return and clear the recorded dirty paths (deduplicated)."""
+        with file_lock(self._journal_lock_path):
             try:
-                result = subprocess.run(cmd, capture_output=True, text=True, check=False)
-                self._last_sync_time = time.time()
-                self._last_sync_output = result.stdout
-                self._last_sync_error = result.stderr if result.returncode else ""
-                self._last_sync_ok = result.returncode == 0
-
-                if not self._last_sync_ok:
-                    logger.error("rclone sync failed (code %s): %s", result.returncode, result.stderr)
-                    # simple retry once after 30s
-                    time.sleep(30)
-                    retry = subprocess.run(cmd, capture_output=True, text=True, check=False)
-                    self._last_sync_time = time.time()
-                    self._last_sync_output = retry.stdout
-                    self._last_sync_error = retry.stderr if retry.returncode else ""
-                    self._last_sync_ok = retry.returncode == 0
-                    if self._last_sync_ok:
-                        logger.info("rclone retry successful")
-                    else:
-                        logger.error("rclone retry failed: %s", retry.stderr)
-            except Exception as exc:
-                self._last_sync_ok = False
-                self._last_sync_error = str(exc)
-                self._last_sync_time = time.time()
-                logger.exception("Unexpected error during rclone sync: %s", exc)
-
-        # Fire-and-forget background thread so the request returns immediately.
-        t = threading.Thread(target=_run, daemon=True)
-        t.start()
+                with self.journal_path.open("r+", encoding="utf-8") as f:
+                    paths = list(dict.fromkeys(line.strip() for line in f if line.strip()))
+                    f.truncate(0)
+            except FileNotFoundError:
+                paths = []
+        return paths
+
+    def _requeue(self, paths: list[str]) -> None:
+        if not paths:
+            return
+        with file_lock(self._journal_lock_path):
+            with self.journal_path.open("a", encoding="utf-8") as f:
+                f.writelines(p + "\n" for p in paths)
+
+    def _next_run_due(self) -> float:
+        """Monotonic time at which the pending sync may start."""
+        due = min(self._last_trigger + self.sync_debounce, self._first_trigger + self.sync_max_delay)
+        if self._retry_at is not None:
+            due = max(due, self._retry_at)
+        return due
+
+    def _sync_loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._sync_requested:
+                    remaining = self._next_full_sync - time.monotonic()
+                    if remaining <= 0:
+                        # Periodic reconcile; _full_sync_due() skips it if
+                        # another worker ran one recently.
+                        self._sync_requested = True
+                        self._first_trigger = self._last_trigger = time.monotonic()
+                        break
+                    self._cond.wait(remaining)
+                while True:
+                    remaining = self._next_run_due() - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                coalesced = self._queued_triggers
+                self._sync_requested = False
+                self._queued_triggers = 0
+                self._first_trigger = None
+                self._in_flight = True
+
+            logger.debug("Starting rclone sync for %d coalesced trigger(s)", coalesced)
+            ok = self._run_sync()
+
+            with self._cond:
+                self._in_flight = False
+                if ok:
+                    self._consecutive_failures = 0
+                    self._retry_at = None
+                else:
+                    self._consecutive_failures += 1
+                    delay = min(
+                        self.retry_base_delay * 2 ** (self._consecutive_failures - 1),
+                        self.retry_max_delay,
+                    )
+                    logger.error("rclone sync failed, retrying in %.0fs", delay)
+                    self._retry_at = time.monotonic() + delay
+                    # Retry even if nothing new was triggered in the meantime.
+                    self._sync_requested = True
+                    if self._first_trigger is None:
+                        self._first_trigger = self._last_trigger = time.monotonic()
+
+    def _full_sync_due(self) -> bool:
+        if self._full_sync_requested:
+            return True
+        if time.monotonic() < self._next_full_sync:
+            return False
+        # Another worker may have reconciled recently.
+        try:
+            age = time.time() - self._full_sync_stamp.stat().st_mtime
+        except FileNotFoundError:
+            return True
+        if age < self.full_sync_interval:
+            self._next_full_sync = time.monotonic() + self.full_sync_interval - age
+            return False
+        return True
+
+    def _run_sync(self) -> bool:
+        # Every worker has its own scheduler; runs wait for each other here.
+        # A waiting worker then finds the journal drained, or the full sync
+        # stamp fresh, and has little or nothing left to do.
+        with file_lock(self._sync_lock_path):
+            return self._run_sync_locked()
+
+    def _run_sync_locked(self) -> bool:
+        with self._cond:
+            full = self._full_sync_due()
+            self._full_sync_requested = False
+        paths = self._drain_journal()
+
+        if full:
+            ok = self._run_rclone(["sync", str(self.local_root), self.rclone_remote])
+            if ok:
+                self._next_full_sync = time.monotonic() + self.full_sync_interval
+                self._full_sync_stamp.touch()
+            else:
+                self._requeue(paths)
+                with self._cond:
+                    self._full_sync_requested = True
+            return ok
+
+        if not paths:
+            return True
+
+        existing, missing = [], []
+        for path in paths:
+            target = self.local_root / path
+            if target.is_file():
+                existing.append(path)
+            elif not target.exists():
+                missing.append(path)
+        ok = True
+        if existing:
+            ok = self._run_rclone(
+                ["copy", str(self.local_root), self.rclone_remote, "--no-traverse"], files_from=existing
+            )
+        if ok and missing:
+            ok = self._run_rclone(["delete", self.rclone_remote], files_from=missing)
+        if not ok:
+            self._requeue(paths)
+        return ok
+
+    def _run_rclone(self, args: list[str], files_from: Optional[list[str]] = None) -> bool:
+        list_file = None
+        if files_from is not None:
+            fd, list_file = tempfile.mkstemp(prefix="rclone-files-", suffix=".txt", dir=str(self.state_dir))
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.writelines(p + "\n" for p in files_from)
+            args = [*args, "--files-from", list_file]
+
+        cmd = ["rclone", *args, *self.rclone_flags]
+        logger.info("[StorageService] rclone: %s", " ".join(cmd))
+
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, check=False)
+            self._last_sync_time = time.time()
+            self._last_sync_output = result.stdout
+            self._last_sync_error = result.stderr if result.returncode else ""
+            self._last_sync_ok = result.returncode == 0
+
+            if not self._last_sync_ok:
+                logger.error("rclone %s failed (code %s): %s", args[0], result.returncode, result.stderr)
+        except Exception as exc:
+            self._last_sync_ok = False
+            self._last_sync_error = str(exc)
+            self._last_sync_time = time.time()
+            logger.exception("Unexpected error during rclone %s: %s", args[0], exc)
+        finally:
+            if list_file:
+                os.unlink(list_file)
+        return bool(self._last_sync_ok)
 
     # --------------------------------------------------------------
     # Sync status accessor
     # --------------------------------------------------------------
     def get_status(self) -> dict:
-        """Return dict with last rclone sync outcome."""
+        """Return dict with last rclone sync outcome and scheduler state."""
+        with self._cond:
+            next_run_at = None
+            if self._sync_requested:
+                # Convert the monotonic deadline to wall-clock time.
+                next_run_at = time.time() + max(self._next_run_due() - time.monotonic(), 0)
+            scheduler = {
+                "in_flight": self._in_flight,
+                "pending": self._sync_requested,
+                "queue_depth": self._queued_triggers,
+                "next_run_at": next_run_at,
+                "consecutive_failures": self._consecutive_failures,
+                "full_sync_pending": self._full_sync_requested,
+            }
         return {
             "last_sync_ok": self._last_sync_ok,
             "last_sync_time": self._last_sync_time,
             "last_sync_output": self._last_sync_output,
             "last_sync_error": self._last_sync_error,
+            **scheduler,
         }
 
     # ------------------------------------------------------------------
     # Public helper to allow external callers to manually trigger a sync
     # ------------------------------------------------------------------
-    def trigger_sync(self) -> None:  # noqa: D401 – imperative
-        """Kick off an asynchronous rclone sync immediately."""
-        self._trigger_sync() 
\ No newline at end of file
+    def trigger_sync(self, full: bool = False) -> None:  # noqa: D401 – imperative
+        """Request an asynchronous rclone sync (debounced and coalesced).
+
+        Without *full* only paths recorded via :meth:`mark_dirty` are pushed;
+        ``full=True`` reconciles the whole tree with ``rclone sync``.
+        """
+        self._trigger_sync(full=full) 
\ No newline at end of file
@@ -0,0 +1,471 @@
+"""Content-addressed thumbnail cache.
+
+Thumbnails are stored under ``THUMBNAIL_CACHE_DIR`` as ``<key>.jpg`` where the
+key is a hash of the source path, its mtime and byte size and the requested
+thumbnail size.  Stills are resized with Pillow; videos get a poster frame
+extracted by ffmpeg.  A thumbnail therefore stays valid across project switches and
+page reloads and is only regenerated when its source file actually changes.
+
+The cache is bounded by ``THUMBNAIL_CACHE_MAX_BYTES``.  File mtimes double as
+the LRU clock: hits refresh them, and eviction removes the oldest entries.
+
+Because a key changes whenever its source does, thumbnail URLs are immutable
+and nginx serves them straight from disk with a one year lifetime.  The
+source of every key is remembered in the shared state database, so a request
+for an evicted thumbnail (nginx falls back to
+``/api/shots/thumbnail/<name>``) can queue it again.
+
+Next to ``<key>.jpg`` each key has responsive variants
+``<key>_w<width>.webp`` for the widths in ``THUMBNAIL_WIDTHS`` (see
+:meth:`ThumbnailCache.srcset_for_key`).  They are never rendered up front:
+the first request for one misses, goes through the same fallback and is
+queued on the thumbnail workers (``ThumbnailQueue.request_variant``).
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from PIL import Image, features
+
+from app.config.constants import (
+    ALLOWED_VIDEO_EXTENSIONS,
+    FFMPEG_BINARY,
+    POSTER_FRAME_OFFSET,
+    THUMBNAIL_CACHE_DIR,
+    THUMBNAIL_CACHE_MAX_BYTES,
+    THUMBNAIL_REDUCING_GAP,
+    THUMBNAIL_SIZE,
+    THUMBNAIL_WIDTHS,
+)
+from app.services.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_URL_PREFIX = "/static/thumbnails/"
+
+# Format of the responsive variants: (Pillow format, extension, save options).
+if features.check("webp"):
+    VARIANT_FORMAT = ("WEBP", "webp", {"quality": 80, "method": 4})
+else:
+    VARIANT_FORMAT = ("JPEG", "jpg", {"quality": 85})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnail_sources (
+    key TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL
+);
+"""
+
+# Hits only refresh an entry's mtime when it is older than this, so a busy
+# grid does not turn every read into a metadata write.
+TOUCH_INTERVAL = 3600
+
+# Keys this process knows are recorded in ``thumbnail_sources``.
+MAX_REMEMBERED_KEYS = 100_000
+
+# Eviction trims the cache down to this fraction of the limit so it does not
+# run again on the very next write.
+EVICT_TARGET_RATIO = 0.9
+
+
+def open_reduced(source, size=THUMBNAIL_SIZE):
+    """Open ``source`` and decode it at the smallest scale that still covers ``size``.
+
+    JPEGs are decoded with libjpeg's DCT scaling (``draft``), which never
+    materialises the full resolution frame.  Other formats are decoded fully
+    but shrunk by an integer factor with ``reduce()`` before the caller's
+    final resample.  Both stop at ``THUMBNAIL_REDUCING_GAP`` times the target
+    size so the final LANCZOS pass still has enough pixels to work with.
+    """
+    img = Image.open(source)
+    target = (int(size[0] * THUMBNAIL_REDUCING_GAP), int(size[1] * THUMBNAIL_REDUCING_GAP))
+    if img.format == "JPEG":
+        img.draft("RGB", target)
+        return img
+
+    factor = min(img.width // target[0], img.height // target[1])
+    if factor > 1:
+        try:
+            reduced = img.reduce(factor)
+        except ValueError:
+            # Palette and bilevel images cannot be reduced; the final
+            # resample handles them directly.
+            return img
+        img.close()
+        return reduced
+    return img
+
+
+def render_thumbnail(source, dest, size=THUMBNAIL_SIZE, image_format="JPEG", **save_options):
+    """Decode ``source`` and write a thumbnail of at most ``size`` to ``dest``.
+
+    ``image_format`` and ``save_options`` go to ``Image.save`` (JPEG at
+    quality 85 by default).
+    """
+    dest = Path(dest)
+    if image_format == "JPEG":
+        save_options.setdefault("quality", 85)
+    with open_reduced(source, size) as img:
+        img.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=THUMBNAIL_REDUCING_GAP)
+        if img.mode in ("RGBA", "LA", "P"):
+            background = Image.new("RGB", img.size, (64, 64, 64))
+            if img.mode == "P":
+                img = img.convert("RGBA")
+            background.paste(img, mask=img.split()[-1] if "A" in img.mode else None)
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        img.save(str(tmp), image_format, **save_options)
+    os.replace(tmp, dest)
+
+
+def is_video(source):
+    return Path(source).suffix.lower() in ALLOWED_VIDEO_EXTENSIONS
+
+
+def render_poster_frame(source, dest, size=THUMBNAIL_SIZE, timeout=60):
+    """Grab a single frame near the start of ``source`` with ffmpeg and write it to ``dest``."""
+    if not FFMPEG_BINARY:
+        raise RuntimeError("ffmpeg not found; set SHOTBUDDY_FFMPEG")
+    dest = Path(dest)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp.jpg")
+    scale = f"scale={size[0]}:{size[1]}:force_original_aspect_ratio=decrease"
+    try:
+        # Seeking before -i only decodes from the nearest keyframe. Clips
+        # shorter than the offset yield no frame, so retry from the start.
+        for offset in (POSTER_FRAME_OFFSET, 0):
+            cmd = [
+                FFMPEG_BINARY, "-nostdin", "-v", "error", "-y",
+                "-ss", str(offset), "-i", str(source),
+                "-frames:v", "1", "-vf", scale, "-q:v", "4",
+                str(tmp),
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=False)
+            if result.returncode == 0 and tmp.exists() and tmp.stat().st_size:
+                os.replace(tmp, dest)
+                return
+        raise RuntimeError(f"ffmpeg could not extract a frame: {result.stderr.strip()}")
+    finally:
+        try:
+            tmp.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def variant_size(width):
+    """Return the bounding box of the variant ``width`` pixels wide."""
+    return (width, width * THUMBNAIL_SIZE[1] // THUMBNAIL_SIZE[0])
+
+
+def render_variant(source, dest, width):
+    """Write the ``VARIANT_FORMAT`` variant of the image ``source`` that is ``width`` pixels wide."""
+    image_format, _, options = VARIANT_FORMAT
+    render_thumbnail(source, dest, variant_size(width), image_format, **options)
+
+
+def render_video_variants(source, poster, dests):
+    """Write the variants ``dests`` (``{width: path}``) of the video ``source``.
+
+    Widths the cached poster frame ``poster`` (the base thumbnail, or
+    ``None``) is wide enough for are derived from it.  ffmpeg then runs once,
+    for the widest of the others, and they are all derived from that frame.
+    """
+    wider = {}
+    for width, dest in dests.items():
+        if poster is not None and width <= THUMBNAIL_SIZE[0]:
+            try:
+                render_variant(poster, dest, width)
+                continue
+            except FileNotFoundError:  # evicted meanwhile
+                poster = None
+        wider[width] = dest
+    if not wider:
+        return
+    first = Path(next(iter(wider.values())))
+    frame = first.with_name(f".{first.name}.{os.getpid()}.{threading.get_ident()}.frame.jpg")
+    try:
+        render_poster_frame(source, frame, variant_size(max(wider)))
+        for width, dest in wider.items():
+            render_variant(frame, dest, width)
+    finally:
+        try:
+            frame.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class ThumbnailCache:
+    """Size-bounded LRU cache of thumbnails keyed on their source file."""
+
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR, max_bytes=THUMBNAIL_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._approx_bytes = None
+        self._state = None
+        self._remembered = set()
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+    @staticmethod
+    def key_for(source, size=THUMBNAIL_SIZE, stat=None):
+        """Return the cache key for ``source`` or ``None`` if it is missing."""
+        source = os.path.abspath(source)
+        try:
+            stat = stat or os.stat(source)
+        except OSError:
+            return None
+        raw = f"{source}\0{size[0]}x{size[1]}\0{stat.st_mtime_ns}\0{stat.st_size}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def path_for_key(self, key):
+        return self.cache_dir / f"{key}.jpg"
+
+    @staticmethod
+    def url_for_key(key):
+        return f"{THUMBNAIL_URL_PREFIX}{key}.jpg"
+
+    @staticmethod
+    def variant_name(key, width):
+        return f"{key}_w{width}.{VARIANT_FORMAT[1]}"
+
+    def variant_path(self, key, width):
+        return self.cache_dir / self.variant_name(key, width)
+
+    @classmethod
+    def srcset_for_key(cls, key):
+        """Return an ``srcset`` attribute value listing the variants of ``key``."""
+        return ", ".join(
+            f"{THUMBNAIL_URL_PREFIX}{cls.variant_name(key, width)} {width}w" for width in THUMBNAIL_WIDTHS
+        )
+
+    # ------------------------------------------------------------------
+    # Lookup / generation
+    # ------------------------------------------------------------------
+    def lookup(self, key):
+        """Return the thumbnail path for ``key`` if it is cached, else ``None``."""
+        thumb_path = self.path_for_key(key)
+        try:
+            st = thumb_path.stat()
+        except FileNotFoundError:
+            return None
+
+        if time.time() - st.st_mtime > TOUCH_INTERVAL:
+            # nginx serves the variants without telling us, so they are kept
+            # as fresh as their base; otherwise eviction would take them first.
+            for path in (thumb_path, *(self.variant_path(key, width) for width in THUMBNAIL_WIDTHS)):
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+        return thumb_path
+
+    def get(self, source, size=THUMBNAIL_SIZE):
+        """Return the cached thumbnail path for ``source``, generating it inline if needed."""
+        key = self.key_for(source, size)
+        if key is None:
+            return None
+        thumb_path = self.lookup(key)
+        if thumb_path is None:
+            self.remember(key, source, size)
+            thumb_path = self._render(key, source, size)
+        return thumb_path
+
+    def _render(self, key, source, size):
+        thumb_path = self.path_for_key(key)
+        render = render_poster_frame if is_video(source) else render_thumbnail
+        render(source, thumb_path, size)
+        self.record_write(thumb_path)
+        return thumb_path
+
+    # ------------------------------------------------------------------
+    # Key -> source map (for re-rendering evicted entries)
+    # ------------------------------------------------------------------
+    def _sources(self):
+        if self._state is None:
+            state = get_shared_state()
+            state.connection().executescript(SCHEMA)
+            self._state = state
+        return self._state.connection()
+
+    def remember(self, key, source, size=THUMBNAIL_SIZE):
+        """Record which source ``key`` was rendered from.
+
+        Each process writes a key at most once, so calling this for every
+        cache hit is cheap.
+        """
+        if key in self._remembered:
+            return
+        try:
+            self._sources().execute(
+                'INSERT OR REPLACE INTO thumbnail_sources (key, source, width, height) VALUES (?, ?, ?, ?)',
+                (key, os.path.abspath(source), size[0], size[1]),
+            )
+        except Exception as e:
+            logger.warning("Could not record thumbnail source for %s: %s", key, e)
+            return
+        if len(self._remembered) >= MAX_REMEMBERED_KEYS:
+            self._remembered.clear()
+        self._remembered.add(key)
+
+    def source_of(self, key):
+        """Return ``(source, size)`` recorded for ``key`` if it is still current."""
+        conn = self._sources()
+        row = conn.execute(
+            'SELECT source, width, height FROM thumbnail_sources WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        source, width, height = row
+        if self.key_for(source, (width, height)) != key:
+            conn.execute('DELETE FROM thumbnail_sources WHERE key = ?', (key,))
+            return None
+        return source, (width, height)
+
+    def lookup_variant(self, key, width):
+        """Return the path of the ``width`` variant of ``key`` if it is cached."""
+        if width not in THUMBNAIL_WIDTHS:
+            return None
+        variant = self.variant_path(key, width)
+        return variant if variant.exists() else None
+
+    def restore(self, key):
+        """Render ``key`` inline from the recorded source (for background callers).
+
+        Returns the thumbnail path, or ``None`` if the key is unknown or its
+        source changed since (the key is then stale and nobody should be
+        asking for it).  Requests go through ``ThumbnailQueue.restore``.
+        """
+        recorded = self.source_of(key)
+        if recorded is None:
+            return None
+        source, size = recorded
+        return self.lookup(key) or self._render(key, source, size)
+
+    def discard(self, source, size=THUMBNAIL_SIZE):
+        """Drop the entry for ``source`` (call before the source is replaced)."""
+        key = self.key_for(source, size)
+        if key is None:
+            return
+        for width in (None, *THUMBNAIL_WIDTHS):
+            path = self.path_for_key(key) if width is None else self.variant_path(key, width)
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+        self._remembered.discard(key)
+        try:
+            self._sources().execute('DELETE FROM thumbnail_sources WHERE key = ?', (key,))
+        except Exception as e:
+            logger.warning("Could not forget thumbnail source for %s: %s", key, e)
+
+    def rekey(self, old_source, new_source, size=THUMBNAIL_SIZE):
+        """Move the entry for ``old_source`` after it was renamed to ``new_source``.
+
+        A rename keeps mtime and size, so the old key can be recomputed from
+        the stat of the new path.
+        """
+        try:
+            stat = os.stat(new_source)
+        except OSError:
+            return
+        old_key = self.key_for(old_source, size, stat)
+        new_key = self.key_for(new_source, size, stat)
+        for width in THUMBNAIL_WIDTHS:
+            try:
+                os.replace(self.variant_path(old_key, width), self.variant_path(new_key, width))
+            except FileNotFoundError:
+                pass
+        try:
+            os.replace(self.path_for_key(old_key), self.path_for_key(new_key))
+        except FileNotFoundError:
+            pass
+        self.remember(new_key, new_source, size)
+
+    def clear(self):
+        """Remove every cached thumbnail."""
+        for thumb in self.cache_dir.iterdir():
+            if thumb.is_file():
+                try:
+                    thumb.unlink()
+                except Exception as e:
+                    logger.warning("Could not delete thumbnail %s: %s", thumb, e)
+        with self._lock:
+            self._approx_bytes = 0
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+    def record_write(self, thumb_path):
+        """Account for a newly written thumbnail and evict if over budget."""
+        try:
+            written = thumb_path.stat().st_size
+        except OSError:
+            return
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._disk_usage()
+            else:
+                self._approx_bytes += written
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _disk_usage(self):
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file():
+                    total += entry.stat().st_size
+        return total
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its budget."""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICT_TARGET_RATIO
+        entries.sort()
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+                removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            logger.info("Evicted %d thumbnails from cache", removed)
+        with self._lock:
+            self._approx_bytes = total
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache():
+    """Return the process-wide ``ThumbnailCache``."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ThumbnailCache()
+    return _default_cache
@@ -0,0 +1,322 @@
+"""Background thumbnail generation.
+
+Decoding and resizing full resolution stills is CPU bound, so thumbnails are
+rendered in a ``ProcessPoolExecutor`` instead of on the request thread.
+Video poster frames are extracted by ffmpeg subprocesses, throttled through a
+small thread pool.
+
+Callers get the cache key straight away together with a status:
+
+``ready``
+    The thumbnail exists in the cache and can be served.
+``pending``
+    A job is queued or running, in this process or another worker (jobs are
+    recorded in the shared state database); poll
+    ``/api/shots/thumbnails/status``.
+``failed``
+    The last attempt raised; the error is logged.
+
+Listeners registered with :meth:`ThumbnailQueue.add_listener` are called with
+``(key, status)`` whenever a job finishes.  Responsive variants
+(:meth:`ThumbnailQueue.request_variant`) go through the same pools but do not
+notify listeners; clients simply ask for the variant again.
+"""
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from app.config.constants import (
+    FFMPEG_BINARY,
+    POSTER_FRAME_WORKERS,
+    THUMBNAIL_SIZE,
+    THUMBNAIL_WIDTHS,
+    THUMBNAIL_WORKERS,
+)
+from app.services.thumbnail_cache import (
+    get_thumbnail_cache,
+    is_video,
+    render_poster_frame,
+    render_thumbnail,
+    render_variant,
+    render_video_variants,
+)
+from app.services.shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+READY = 'ready'
+PENDING = 'pending'
+FAILED = 'failed'
+
+# Number of failed keys remembered so clients stop polling for them.
+MAX_FAILED_KEYS = 1024
+
+# A job another worker recorded as pending longer ago than this (seconds) is
+# presumed lost with that worker and queued again by whoever is asked.
+PENDING_TIMEOUT = 600
+
+# Finished jobs are forgotten after this many seconds.
+JOB_RETENTION = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnail_jobs (
+    key TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def _pool_context():
+    """Start pool workers from a clean server process instead of forking.
+
+    Forking a gunicorn worker copies its threads' locks (event poller,
+    SQLite connections, the video pool) in whatever state they are in.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if 'forkserver' not in methods:
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['app.services.thumbnail_cache'])
+    return context
+
+
+class ThumbnailQueue:
+    """Deduplicating job queue in front of a process pool."""
+
+    def __init__(self, cache=None, max_workers=THUMBNAIL_WORKERS, video_workers=POSTER_FRAME_WORKERS):
+        self.cache = cache or get_thumbnail_cache()
+        self.max_workers = max(max_workers, 1)
+        self.video_workers = max(video_workers, 1)
+        self._executor = None
+        self._video_executor = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._failed = {}
+        self._listeners = []
+        self._state = None
+        self._recorded = 0
+
+    def add_listener(self, callback):
+        """Call ``callback(key, status)`` whenever a job finishes."""
+        self._listeners.append(callback)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=_pool_context())
+        return self._executor
+
+    def _get_video_executor(self):
+        if self._video_executor is None:
+            self._video_executor = ThreadPoolExecutor(
+                max_workers=self.video_workers, thread_name_prefix="poster-frame"
+            )
+        return self._video_executor
+
+    def _submit(self, source, dest, size):
+        if is_video(source):
+            return self._get_video_executor().submit(render_poster_frame, source, dest, size)
+        return self._submit_to_pool(render_thumbnail, source, dest, size)
+
+    def _submit_to_pool(self, fn, *args):
+        try:
+            return self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            self._executor = None
+            return self._get_executor().submit(fn, *args)
+
+    def request(self, source, size=THUMBNAIL_SIZE):
+        """Return ``(key, status)`` for ``source`` and queue it if needed.
+
+        Videos return ``(None, None)`` when no ffmpeg binary is available.
+        """
+        if is_video(source) and not FFMPEG_BINARY:
+            return None, None
+        key = self.cache.key_for(source, size)
+        if key is None:
+            return None, FAILED
+        if self.cache.lookup(key):
+            # Thumbnails cached before sources were recorded still get
+            # their responsive variants.
+            self.cache.remember(key, source, size)
+            return key, READY
+
+        with self._lock:
+            if key in self._pending:
+                return key, PENDING
+            if key in self._failed:
+                return key, FAILED
+            dest = self.cache.path_for_key(key)
+            self.cache.remember(key, source, size)
+            future = self._submit(str(source), str(dest), size)
+            self._pending[key] = future
+        self._record(key, PENDING)
+        future.add_done_callback(lambda f, key=key: self._on_done(key, f))
+        return key, PENDING
+
+    def restore(self, key):
+        """Queue the evicted thumbnail ``key`` from its recorded source.
+
+        Returns its status, or ``None`` if the key is unknown or stale.
+        """
+        if self.cache.lookup(key):
+            return READY
+        recorded = self.cache.source_of(key)
+        if recorded is None:
+            return None
+        source, size = recorded
+        return self.request(source, size)[1]
+
+    def request_variant(self, key, width):
+        """Return the status of the ``width`` variant of ``key``, queueing it if needed.
+
+        Returns ``None`` if the width is not offered or the key is unknown or
+        stale.
+        """
+        if width not in THUMBNAIL_WIDTHS:
+            return None
+        if self.cache.lookup_variant(key, width):
+            return READY
+        job = self.cache.variant_name(key, width)
+        with self._lock:
+            if job in self._pending:
+                return PENDING
+            if job in self._failed:
+                return FAILED
+        recorded = self.cache.source_of(key)
+        if recorded is None:
+            return None
+        source = recorded[0]
+
+        with self._lock:
+            if job in self._pending:
+                return PENDING
+            if is_video(source):
+                # One job renders every missing variant of a video from the
+                # cached poster frame and at most one ffmpeg frame.
+                dests = {
+                    w: self.cache.variant_path(key, w)
+                    for w in THUMBNAIL_WIDTHS
+                    if w == width or not (
+                        self.cache.variant_name(key, w) in self._pending or self.cache.lookup_variant(key, w)
+                    )
+                }
+                poster = self.cache.lookup(key)
+                future = self._get_video_executor().submit(
+                    render_video_variants,
+                    source,
+                    str(poster) if poster else None,
+                    {w: str(dest) for w, dest in dests.items()},
+                )
+            else:
+                dests = {width: self.cache.variant_path(key, width)}
+                future = self._submit_to_pool(render_variant, source, str(dests[width]), width)
+            for w in dests:
+                self._pending[self.cache.variant_name(key, w)] = future
+        for w, dest in dests.items():
+            future.add_done_callback(
+                lambda f, job=self.cache.variant_name(key, w), dest=dest: self._finish(job, f, dest)
+            )
+        return PENDING
+
+    def status(self, key):
+        """Return the status of ``key`` (``None`` if it is unknown).
+
+        Clients poll through the load balancer, so the job may belong to
+        another worker: its shared record answers then.  A key with a
+        recorded source but neither a file nor a live job is queued here.
+        """
+        with self._lock:
+            if key in self._pending:
+                return PENDING
+            if key in self._failed:
+                return FAILED
+        if self.cache.lookup(key):
+            return READY
+        shared = self._recorded_status(key)
+        if shared is not None:
+            return shared
+        return self.restore(key)
+
+    def _jobs(self):
+        if self._state is None:
+            state = get_shared_state()
+            state.connection().executescript(SCHEMA)
+            self._state = state
+        return self._state.connection()
+
+    def _record(self, key, status):
+        """Share the status of the job for ``key`` with the other workers."""
+        try:
+            conn = self._jobs()
+            if status == READY:
+                conn.execute('DELETE FROM thumbnail_jobs WHERE key = ?', (key,))
+            else:
+                conn.execute(
+                    'INSERT OR REPLACE INTO thumbnail_jobs (key, status, updated) VALUES (?, ?, ?)',
+                    (key, status, time.time()),
+                )
+            self._recorded += 1
+            if self._recorded % 100 == 0:
+                conn.execute('DELETE FROM thumbnail_jobs WHERE updated < ?', (time.time() - JOB_RETENTION,))
+        except Exception as e:
+            logger.warning("Could not record thumbnail job %s: %s", key, e)
+
+    def _recorded_status(self, key):
+        """Return the status another worker recorded for ``key``, if still relevant."""
+        try:
+            row = self._jobs().execute(
+                'SELECT status, updated FROM thumbnail_jobs WHERE key = ?', (key,)
+            ).fetchone()
+        except Exception as e:
+            logger.warning("Could not read thumbnail job %s: %s", key, e)
+            return None
+        if row is None:
+            return None
+        status, updated = row
+        if status == PENDING and updated < time.time() - PENDING_TIMEOUT:
+            return None
+        return status
+
+    def _finish(self, job, future, dest):
+        """Book-keep a finished job; return its status."""
+        error = future.exception()
+        with self._lock:
+            self._pending.pop(job, None)
+            if error is not None:
+                if len(self._failed) >= MAX_FAILED_KEYS:
+                    self._failed.pop(next(iter(self._failed)))
+                self._failed[job] = str(error)
+        if error is not None:
+            logger.warning("Error creating thumbnail %s: %s", job, error)
+            return FAILED
+        self.cache.record_write(dest)
+        return READY
+
+    def _on_done(self, key, future):
+        status = self._finish(key, future, self.cache.path_for_key(key))
+        self._record(key, status)
+        for callback in list(self._listeners):
+            try:
+                callback(key, status)
+            except Exception:
+                logger.exception("Thumbnail listener failed")
+
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+
+def get_thumbnail_queue():
+    """Return the process-wide ``ThumbnailQueue``."""
+    global _default_queue
+    if _default_queue is None:
+        with _default_queue_lock:
+            if _default_queue is None:
+                _default_queue = ThumbnailQueue()
+    return _default_queue
@@ -0,0 +1,185 @@
+"""Resumable chunked uploads.
+
+A session is created with the target shot, asset type, file name and total
+size.  The client then PUTs consecutive byte ranges; each chunk is hashed
+while it is written and only acknowledged (its end becomes the session
+offset) once its checksum matched and it was flushed to disk.  After an
+interruption the client asks for the offset and continues from there.
+
+Finalising hands the assembled file to ``FileHandler.save_file``, so
+versioning, promotion to ``latest_*``, thumbnails and syncing behave exactly
+like a regular upload.  Sessions live under ``UPLOAD_SESSIONS_DIR`` (inside
+the staging dir, so the finished file is renamed into the project rather
+than copied).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import secrets
+import shutil
+import time
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from app.config.constants import UPLOAD_SESSION_TTL, UPLOAD_SESSIONS_DIR
+from app.utils import atomic_write_json, file_lock
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1024 * 1024
+SESSION_ID_LENGTH = 32
+
+
+class UploadOffsetError(ValueError):
+    """Raised when a chunk does not start at the acknowledged offset."""
+
+    def __init__(self, expected):
+        super().__init__(f"Chunk must start at offset {expected}")
+        self.expected = expected
+
+
+class UploadSessionStore:
+    """On-disk store of resumable upload sessions."""
+
+    def __init__(self, root=UPLOAD_SESSIONS_DIR, ttl=UPLOAD_SESSION_TTL):
+        self.root = Path(root)
+        self.ttl = ttl
+
+    def _dir(self, session_id):
+        if len(session_id) != SESSION_ID_LENGTH or not all(c in '0123456789abcdef' for c in session_id):
+            raise ValueError("Invalid upload id")
+        return self.root / session_id
+
+    def _load(self, session_dir):
+        try:
+            with (session_dir / 'meta.json').open('r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError("Unknown upload id")
+
+    @contextmanager
+    def _lock(self, session_dir):
+        """Lock of one session, serialising its chunks, finalisation and removal."""
+        with ExitStack() as stack:
+            try:
+                stack.enter_context(file_lock(session_dir / '.lock'))
+            except FileNotFoundError:  # never created, or removed meanwhile
+                raise ValueError("Unknown upload id") from None
+            yield
+
+    def create(self, project_path, shot_name, file_type, filename, size):
+        """Start a session and return its metadata."""
+        if size < 0:
+            raise ValueError("Invalid size")
+        self.expire()
+        session_id = secrets.token_hex(SESSION_ID_LENGTH // 2)
+        session_dir = self._dir(session_id)
+        session_dir.mkdir(parents=True)
+        (session_dir / 'data.part').touch()
+        now = time.time()
+        meta = {
+            'id': session_id,
+            'project': str(project_path),
+            'shot_name': shot_name,
+            'file_type': file_type,
+            'filename': filename,
+            'size': size,
+            'offset': 0,
+            'created': now,
+            'updated': now,
+        }
+        atomic_write_json(session_dir / 'meta.json', meta)
+        return meta
+
+    def get(self, session_id):
+        return self._load(self._dir(session_id))
+
+    def write_chunk(self, session_id, offset, stream, length, sha256=None):
+        """Append ``length`` bytes from ``stream`` at ``offset``.
+
+        Returns the updated session metadata.  Bytes past the acknowledged
+        offset (left over from an interrupted chunk) are discarded first.
+        """
+        session_dir = self._dir(session_id)
+        with self._lock(session_dir):
+            meta = self._load(session_dir)
+            if offset != meta['offset']:
+                raise UploadOffsetError(meta['offset'])
+            if length is None or length < 0 or offset + length > meta['size']:
+                raise ValueError("Chunk exceeds declared upload size")
+
+            digest = hashlib.sha256()
+            written = 0
+            with (session_dir / 'data.part').open('r+b') as f:
+                f.truncate(offset)
+                f.seek(offset)
+                while written < length:
+                    block = stream.read(min(READ_CHUNK_SIZE, length - written))
+                    if not block:
+                        break
+                    digest.update(block)
+                    f.write(block)
+                    written += len(block)
+
+                if written != length:
+                    f.truncate(offset)
+                    raise ValueError(f"Incomplete chunk: got {written} of {length} bytes")
+                if sha256 and digest.hexdigest() != sha256.lower():
+                    f.truncate(offset)
+                    raise ValueError("Chunk checksum mismatch")
+                f.flush()
+                os.fsync(f.fileno())
+
+            meta['offset'] = offset + written
+            meta['updated'] = time.time()
+            atomic_write_json(session_dir / 'meta.json', meta)
+            return meta
+
+    @contextmanager
+    def open_completed(self, session_id):
+        """Hold a fully uploaded session while it is finalised.
+
+        Yields ``(meta, data_path)`` under the session lock ``write_chunk``
+        takes, so no chunk can land between the completeness check and the
+        move of the data.  Once the block succeeds the session is closed: its
+        metadata goes while the lock is still held (a concurrent finalise
+        then sees an unknown id) and the folder right after.
+        """
+        session_dir = self._dir(session_id)
+        with self._lock(session_dir):
+            meta = self._load(session_dir)
+            if meta['offset'] != meta['size']:
+                raise ValueError(f"Upload incomplete: {meta['offset']} of {meta['size']} bytes received")
+            yield meta, session_dir / 'data.part'
+            (session_dir / 'meta.json').unlink()
+        self.discard(session_id)
+
+    def discard(self, session_id):
+        """Remove a session, waiting for a chunk or finalisation in progress."""
+        session_dir = self._dir(session_id)
+        with self._lock(session_dir):
+            # Whoever takes the lock next sees an unknown id.
+            (session_dir / 'meta.json').unlink(missing_ok=True)
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+    def expire(self):
+        """Remove sessions that have not been touched for ``ttl`` seconds."""
+        if not self.root.exists():
+            return
+        cutoff = time.time() - self.ttl
+        for session_dir in self.root.iterdir():
+            try:
+                # A folder without metadata is what is left of a session
+                # removed while another request was waiting for its lock.
+                try:
+                    updated = (session_dir / 'meta.json').stat().st_mtime
+                except FileNotFoundError:
+                    updated = session_dir.stat().st_mtime
+                if updated < cutoff:
+                    logger.info("Expiring stale upload session %s", session_dir.name)
+                    shutil.rmtree(session_dir, ignore_errors=True)
+            except FileNotFoundError:
+                continue
@@ -0,0 +1,227 @@
+"""Single-write upload handling.
+
+Werkzeug normally spools multipart file parts into an anonymous temporary
+file, and ``FileStorage.save`` then copies that file to its destination.  For
+large videos that meant every upload was written twice before ``save_file``
+even made its ``latest_*`` copy.
+
+``StagingRequest`` instead streams file parts (in werkzeug's fixed-size
+chunks) into named files under ``UPLOAD_STAGING_DIR``.  ``store_upload`` then
+renames the staged file into its versioned WIP location and ``promote``
+reflinks it into ``latest_*`` where the filesystem supports it, so the bytes
+hit the disk exactly once.  Staged parts
+are hashed (SHA-256) as they are written, which gives ``upload_digest`` the
+content digest used for deduplication (see ``content_store``) for free.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from flask import Request
+
+from app.config.constants import PROMOTE_MODE, UPLOAD_STAGING_DIR
+from app.services.content_store import file_digest
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# ioctl cloning a whole file (linux/fs.h), supported by Btrfs, XFS and others.
+FICLONE = 0x40049409
+
+
+def _file_mode():
+    """Return the mode ``open()`` gives new files under the process umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+# Staged files are created 0600 by ``tempfile``; stored uploads get the mode
+# a plain ``FileStorage.save`` would have given them, so nginx, SMB users and
+# rclone running as other users can read them.
+FILE_MODE = _file_mode()
+
+
+class HashingFile:
+    """File wrapper that hashes everything written through it."""
+
+    def __init__(self, fileobj):
+        self._file = fileobj
+        self._digest = hashlib.sha256()
+
+    def write(self, data):
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class StagingRequest(Request):
+    """Request class that spools uploaded files into ``UPLOAD_STAGING_DIR``."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        UPLOAD_STAGING_DIR.mkdir(parents=True, exist_ok=True)
+        stream = tempfile.NamedTemporaryFile(
+            mode="w+b", dir=str(UPLOAD_STAGING_DIR), prefix="upload-", delete=False
+        )
+        self.__dict__.setdefault("_staged_files", []).append(stream.name)
+        return HashingFile(stream)
+
+    def discard_staged_files(self):
+        """Remove staged files that were not moved into a project."""
+        for name in self.__dict__.pop("_staged_files", []):
+            try:
+                os.unlink(name)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Could not remove staged upload %s: %s", name, e)
+
+
+def _staged_path(stream):
+    """Return the on-disk path of ``stream`` if it is a staged upload."""
+    name = getattr(stream, "name", None)
+    if not isinstance(name, str):
+        return None
+    path = Path(name)
+    try:
+        path.relative_to(UPLOAD_STAGING_DIR)
+    except ValueError:
+        return None
+    return path
+
+
+def store_upload(file, dest):
+    """Move the uploaded ``file`` (a ``FileStorage``) to ``dest``.
+
+    Staged uploads are renamed into place; anything else is streamed to a
+    hidden file next to ``dest`` in fixed-size chunks (so memory use stays
+    constant) and renamed over it.  Either way ``dest`` only ever appears
+    complete.
+    """
+    dest = Path(dest)
+    stream = file.stream
+    staged = _staged_path(stream)
+    if staged is not None:
+        stream.flush()
+        try:
+            os.chmod(staged, FILE_MODE)
+            os.replace(staged, dest)
+            return dest
+        except OSError as e:
+            # EXDEV: staging dir on another filesystem. Windows also refuses
+            # to rename a file that is still open.
+            logger.debug("Could not move staged upload to %s (%s), copying", dest, e)
+
+    # Copied next to ``dest`` and renamed over it, so ``dest`` (usually an
+    # empty reservation, see FileHandler) never holds a partial file.
+    tmp = dest.with_name(f".{dest.name}.upload")
+    stream.seek(0)
+    try:
+        with open(tmp, "wb") as out:
+            shutil.copyfileobj(stream, out, COPY_CHUNK_SIZE)
+        os.chmod(tmp, FILE_MODE)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return dest
+
+
+def upload_digest(file):
+    """Return the SHA-256 hex digest of the uploaded ``file``.
+
+    Staged uploads were hashed while they streamed in; other streams are read
+    once and rewound.
+    """
+    stream = file.stream
+    if isinstance(stream, HashingFile):
+        return stream.hexdigest()
+    stream.seek(0)
+    digest = file_digest(stream)
+    stream.seek(0)
+    return digest
+
+
+def link_duplicate(src, dest):
+    """Create ``dest`` as a hard link to the identical file ``src``.
+
+    Returns ``False`` (and leaves ``dest`` alone) where hard links are not
+    possible, so the caller stores the upload itself.
+    """
+    dest = Path(dest)
+    tmp = dest.with_name(f".{dest.name}.link")
+    try:
+        tmp.unlink(missing_ok=True)
+        os.link(src, tmp)
+        # Files stored before uploads got FILE_MODE may still be 0600.
+        os.chmod(tmp, FILE_MODE)
+        # ``dest`` may exist as an empty reservation (see FileHandler).
+        os.replace(tmp, dest)
+        return True
+    except OSError as e:
+        logger.debug("Hard link %s -> %s failed (%s), storing a copy", src, dest, e)
+        return False
+
+
+def clone_file(src, dest):
+    """Copy ``src`` to ``dest`` (metadata included), as a reflink if possible.
+
+    A reflink shares the data blocks until either file is modified, so it is
+    as cheap as a hard link but the two files stay independent.
+    """
+    if fcntl is not None:
+        try:
+            with open(src, 'rb') as fsrc, open(dest, 'wb') as fdest:
+                fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dest)
+            return
+        except OSError as e:
+            logger.debug("Reflink %s -> %s failed (%s), copying", src, dest, e)
+    shutil.copy2(src, dest)
+
+
+def promote(src, dest):
+    """Publish ``src`` as ``dest``.
+
+    With ``PROMOTE_MODE == 'copy'`` (the default) ``dest`` is an independent
+    copy, reflinked where the filesystem supports it (see ``clone_file``).
+    ``'link'`` makes it a hard link to ``src`` instead, so editing either file
+    changes both; filesystems without hard links fall back to a copy.
+    """
+    src, dest = Path(src), Path(dest)
+    tmp = dest.with_name(f".{dest.name}.promote")
+    try:
+        tmp.unlink()
+    except FileNotFoundError:
+        pass
+    if PROMOTE_MODE == "link":
+        try:
+            os.link(src, tmp)
+            os.chmod(tmp, FILE_MODE)
+            os.replace(tmp, dest)
+            return dest
+        except OSError as e:
+            logger.debug("Hard link %s -> %s failed (%s), copying", src, dest, e)
+    clone_file(src, tmp)
+    os.chmod(tmp, FILE_MODE)
+    os.replace(tmp, dest)
+    return dest
@@ -1,5 +1,11 @@
         let currentProject = null;
         let shots = [];
+        // Revision of `shots` and the project it belongs to; lets loadShots
+        // ask for a delta (/api/shots?since=) instead of the full listing.
+        let shotsRevision = null;
+        let shotsProjectPath = null;
+        // Rows fetched ahead of the full listing on a fresh load.
+        const FIRST_PAINT_SHOTS = 50;
         let savedScrollY = 0;
         let savedRowId = null;
         const NEW_SHOT_DROP_TEXT = 'Drop an asset here to create a new shot.';
@@ -17,9 +23,13 @@
             return token || '';
         })();
 
+        // Identifies this tab so it can skip live events caused by its own requests.
+        const CLIENT_ID = Math.random().toString(36).slice(2) + Date.now().toString(36);
+
         const _origFetch = window.fetch.bind(window);
         window.fetch = function(url, options = {}) {
             options.headers = options.headers || {};
+            options.headers['X-Shotbuddy-Client'] = CLIENT_ID;
             if (API_TOKEN) {
                 options.headers['Authorization'] = `Bearer ${API_TOKEN}`;
             }
@@ -110,8 +120,78 @@
         document.addEventListener('DOMContentLoaded', function() {
             checkForProject();
             loadProjectsList();
+            startEventStream();
+
+            // Double-click a preview to open the full image or video
+            // (streamed with range support, so long clips can be scrubbed).
+            document.addEventListener('dblclick', event => {
+                const preview = event.target.closest('[data-media]');
+                if (preview && preview.dataset.media) window.open(preview.dataset.media, '_blank');
+            });
         });
 
+        // URL of an asset file of the current project (see /api/shots/media).
+        function mediaUrl(file) {
+            if (!file || !currentProject) return '';
+            const root = currentProject.path.replace(/\\/g, '/') + '/';
+            const path = file.replace(/\\/g, '/');
+            if (!path.startsWith(root)) return '';
+            const rel = path.slice(root.length).split('/').map(encodeURIComponent).join('/');
+            // A new tab cannot send the Authorization header.
+            const query = API_TOKEN ? `?token=${encodeURIComponent(API_TOKEN)}` : '';
+            return `/api/shots/media/${rel}${query}`;
+        }
+
+        // ---------------------------------------------------------------------------
+        //  Live updates – server-sent events from every server worker
+        // ---------------------------------------------------------------------------
+
+        let liveRefreshTimer = null;
+
+        function startEventStream() {
+            if (!window.EventSource) return;
+            // EventSource cannot send headers, so the token goes in the query.
+            const query = API_TOKEN ? `?token=${encodeURIComponent(API_TOKEN)}` : '';
+            const source = new EventSource(`/api/events${query}`);
+
+            ['upload', 'shot_created', 'shot_renamed', 'shots_renumbered', 'notes', 'files_changed'].forEach(type => {
+                source.addEventListener(type, event => {
+                    const data = JSON.parse(event.data);
+                    if (data.origin === CLIENT_ID) return;
+                    if (!currentProject || data.project !== currentProject.path) return;
+                    scheduleLiveRefresh();
+                });
+            });
+
+            // More events were missed than the server replays: start over
+            // from a full listing.
+            source.addEventListener('reset', () => {
+                if (!currentProject) return;
+                shotsRevision = null;
+                scheduleLiveRefresh();
+            });
+
+            source.addEventListener('thumbnail', event => {
+                const data = JSON.parse(event.data);
+                document.querySelectorAll(`[data-thumb-key="${data.key}"]`).forEach(el => {
+                    applyThumbnail(el, data);
+                });
+            });
+        }
+
+        function scheduleLiveRefresh() {
+            clearTimeout(liveRefreshTimer);
+            liveRefreshTimer = setTimeout(() => {
+                // Re-rendering would drop the text of a note being edited.
+                const active = document.activeElement;
+                if (active && active.classList.contains('notes-input')) {
+                    scheduleLiveRefresh();
+                    return;
+                }
+                loadShots(null, true);
+            }, 300);
+        }
+
         async function checkForProject() {
             try {
                 const response = await fetch('/api/project/current');
@@ -141,17 +221,48 @@
             document.getElementById('project-title').textContent = currentProject.name;
         }
 
-        async function loadShots(rowId = null) {
+        function downloadContactSheet() {
+            // A new tab cannot send the Authorization header.
+            const query = API_TOKEN ? `?token=${encodeURIComponent(API_TOKEN)}` : '';
+            window.open(`/api/shots/contact-sheet${query}`, '_blank');
+        }
+
+        async function loadShots(rowId = null, quiet = false) {
             captureScroll(rowId);
-            document.getElementById('loading').style.display = 'block';
-            document.getElementById('shot-grid').style.display = 'none';
+            if (!quiet) {
+                document.getElementById('loading').style.display = 'block';
+                document.getElementById('shot-grid').style.display = 'none';
+            }
             
             try {
-                const response = await fetch('/api/shots');
+                const projectPath = currentProject ? currentProject.path : null;
+                const canDelta = shotsRevision !== null && shotsProjectPath === projectPath;
+                if (!canDelta) {
+                    // Paint the first rows right away; the full listing
+                    // (which the revision for later deltas comes with)
+                    // follows below.
+                    const first = await (await fetch(`/api/shots?limit=${FIRST_PAINT_SHOTS}`)).json();
+                    if (first.success && first.total > first.data.length) {
+                        shots = first.data;
+                        renderShots();
+                        document.getElementById('loading').style.display = 'none';
+                        document.getElementById('shot-grid').style.display = 'block';
+                    }
+                }
+                const response = await fetch(canDelta ? `/api/shots?since=${shotsRevision}` : '/api/shots');
                 const result = await response.json();
                 
                 if (result.success) {
-                    shots = result.data;
+                    if (result.delta) {
+                        applyShotsDelta(result.changed, result.removed);
+                    } else {
+                        shots = result.data;
+                        if (shotsProjectPath !== projectPath) thumbnailAtlas = null;
+                        // Deltas keep the current map; new thumbnails load on their own.
+                        loadAtlas();
+                    }
+                    shotsRevision = result.revision;
+                    shotsProjectPath = projectPath;
                     renderShots();
                     document.getElementById('loading').style.display = 'none';
                     document.getElementById('shot-grid').style.display = 'block';
@@ -166,6 +277,14 @@
             }
         }
 
+        function applyShotsDelta(changed, removed) {
+            const byName = new Map(shots.map(shot => [shot.name, shot]));
+            removed.forEach(name => byName.delete(name));
+            changed.forEach(shot => byName.set(shot.name, shot));
+            // Same order as the server listing (plain string sort of names).
+            shots = Array.from(byName.values()).sort((a, b) => (a.name < b.name ? -1 : a.name > b.name ? 1 : 0));
+        }
+
         function renderShots() {
             const shotList = document.getElementById("shot-list");
             shotList.innerHTML = "";
@@ -232,6 +351,100 @@
             shotList.appendChild(finalDropZone);
 
             restoreScroll();
+            pollPendingThumbnails();
+        }
+
+        // Thumbnails are generated in the background. Poll for the ones still
+        // pending and swap them in as they become ready.
+        let thumbnailPollTimer = null;
+
+        // Thumbnails come as an <img> with responsive WebP variants so the
+        // browser fetches the smallest one that fills the cell at its DPR;
+        // the JPEG in src is the fallback.
+        function thumbnailImg(url, srcset, sizes = '240px') {
+            if (!url) return '';
+            const srcsetAttr = srcset ? `srcset="${srcset}" sizes="auto, ${sizes}"` : '';
+            return `<img src="${url}" ${srcsetAttr} alt="" loading="lazy" decoding="async">`;
+        }
+
+        // Sprite atlas of the grid (/api/shots/atlas): a few page images
+        // instead of one request per thumbnail. Keys are content hashes, so a
+        // map from an older revision is still right for every key it has.
+        // High-DPI screens keep the sharper srcset image on top of the sprite.
+        let thumbnailAtlas = null;
+        let atlasRetry = null;
+        const ATLAS_RETRY_MS = 2000;
+        const SHARP_THUMBNAILS = window.devicePixelRatio > 1;
+
+        function spriteStyle(key) {
+            const tile = thumbnailAtlas && key ? thumbnailAtlas.tiles[key] : null;
+            if (!tile) return '';
+            const [index, x, y] = tile;
+            const page = thumbnailAtlas.pages[index];
+            const { width, height } = thumbnailAtlas.tile;
+            const px = page.width > width ? x / (page.width - width) * 100 : 0;
+            const py = page.height > height ? y / (page.height - height) * 100 : 0;
+            // CSS backgrounds cannot send the Authorization header.
+            const query = API_TOKEN ? `?token=${encodeURIComponent(API_TOKEN)}` : '';
+            return `background-image: url('${page.url}${query}'); background-size: ${page.columns * 100}% auto; background-position: ${px}% ${py}%;`;
+        }
+
+        function previewThumbnail(file, sizes = '240px') {
+            const sprite = spriteStyle(file.thumbnail_key);
+            const img = sprite && !SHARP_THUMBNAILS ? '' : thumbnailImg(file.thumbnail, file.thumbnail_srcset, sizes);
+            return { attrs: `data-key="${file.thumbnail_key || ''}" style="${sprite}"`, img };
+        }
+
+        async function loadAtlas() {
+            try {
+                const result = await (await fetch('/api/shots/atlas')).json();
+                if (!result.success) return;
+                thumbnailAtlas = result.data;
+                // Pages still rendering are left out; pick them up shortly.
+                clearTimeout(atlasRetry);
+                if (thumbnailAtlas.pending) atlasRetry = setTimeout(loadAtlas, ATLAS_RETRY_MS);
+                document.querySelectorAll('.preview-thumbnail[data-key]').forEach(el => {
+                    const sprite = spriteStyle(el.dataset.key);
+                    if (!sprite) return;
+                    el.style.cssText = sprite;
+                    // Drop images that have not loaded yet; the sprite shows the same picture.
+                    const img = el.querySelector('img');
+                    if (img && !SHARP_THUMBNAILS && !img.complete) img.remove();
+                });
+            } catch (error) {
+                console.error('Error loading thumbnail atlas:', error);
+            }
+        }
+
+        function applyThumbnail(el, info) {
+            if (!info || info.status === 'pending') return;
+            if (info.url) {
+                const sizes = el.classList.contains('lipsync-thumbnail') ? '36px' : '240px';
+                el.innerHTML = thumbnailImg(info.url, info.srcset, sizes);
+            }
+            el.removeAttribute('data-thumb-key');
+        }
+
+        function pollPendingThumbnails(attempt = 0) {
+            clearTimeout(thumbnailPollTimer);
+            const pending = document.querySelectorAll('[data-thumb-key]');
+            if (pending.length === 0 || attempt > 60) return;
+
+            const keys = [...new Set(Array.from(pending, el => el.dataset.thumbKey))];
+            thumbnailPollTimer = setTimeout(async () => {
+                try {
+                    const response = await fetch(`/api/shots/thumbnails/status?keys=${keys.join(',')}`);
+                    const result = await response.json();
+                    if (result.success) {
+                        document.querySelectorAll('[data-thumb-key]').forEach(el => {
+                            applyThumbnail(el, result.data[el.dataset.thumbKey]);
+                        });
+                    }
+                } catch (error) {
+                    console.error('Error polling thumbnails:', error);
+                }
+                pollPendingThumbnails(attempt + 1);
+            }, 1000);
         }
 
         function createShotRow(shot) {
@@ -260,10 +473,9 @@
             const hasFile = file.version > 0;
 
             if (hasFile) {
-                const thumbnailUrl = file.thumbnail ? `${file.thumbnail}?v=${Date.now()}` : null;
-                const thumbnailStyle = thumbnailUrl ? 
-                    `background-image: url('${thumbnailUrl}'); background-size: cover; background-position: center;` : 
-                    'background: #404040;';
+                const pendingAttr = file.thumbnail_status === 'pending' ?
+                    `data-thumb-key="${file.thumbnail_key}"` : '';
+                const preview = previewThumbnail(file);
 
             
                 return `
@@ -273,7 +485,9 @@
                          ondragleave="handleDragLeave(event)">
                         <div class="file-preview">
                             <div class="preview-thumbnail ${type === 'video' ? 'video-thumbnail' : ''}"
-                                style="${thumbnailStyle}"></div>
+                                ${pendingAttr}
+                                data-media="${mediaUrl(file.file)}"
+                                ${preview.attrs}>${preview.img}</div>
 
                             <div class="version-badge">v${String(file.version).padStart(3, '0')}</div>
                         </div>
@@ -302,14 +516,11 @@
                 const hasFile = file.version > 0;
                 const label = part.charAt(0).toUpperCase() + part.slice(1);
                 if (hasFile) {
-                    const thumbnailUrl = file.thumbnail ? `${file.thumbnail}?v=${Date.now()}` : null;
-                    const thumbnailStyle = thumbnailUrl ?
-                        `background-image: url('${thumbnailUrl}'); background-size: cover; background-position: center;` :
-                        'background: #404040;';
+                    const preview = previewThumbnail(file, '36px');
                     html += `
                         <div class="drop-zone lipsync-drop" ondragover="handleDragOver(event, '${part}')" ondrop="handleDrop(event, '${shot.name}', '${part}')" ondragleave="handleDragLeave(event)">
                             <div class="file-preview lipsync-preview">
-                                <div class="preview-thumbnail lipsync-thumbnail" data-label="${label}" style="${thumbnailStyle}"></div>
+                                <div class="preview-thumbnail lipsync-thumbnail" data-label="${label}" data-media="${mediaUrl(file.file)}" ${preview.attrs}>${preview.img}</div>
                                 <div class="version-badge">v${String(file.version).padStart(3, '0')}</div>
                             </div>
                         </div>`;
@@ -396,11 +607,88 @@
                 return;
             }
 
-            const file = files[0];
-            await uploadFile(file, shotName, expectedType);
+            if (files.length === 1) {
+                await uploadFile(files[0], shotName, expectedType);
+            } else {
+                await uploadFiles(Array.from(files), shotName, expectedType);
+            }
+        }
+
+        // Files above this size go through the resumable chunked upload API.
+        const CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024;
+        const CHUNK_MAX_RETRIES = 5;
+
+        async function sha256Hex(blob) {
+            if (!window.crypto || !window.crypto.subtle) return null;
+            const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+            return Array.from(new Uint8Array(digest), b => b.toString(16).padStart(2, '0')).join('');
+        }
+
+        async function uploadFileChunked(file, shotName, fileType) {
+            const initResponse = await fetch('/api/shots/uploads', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ shot_name: shotName, file_type: fileType, filename: file.name, size: file.size })
+            });
+            const init = await initResponse.json();
+            if (!init.success) return init;
+
+            const { id, chunk_size: chunkSize } = init.data;
+            let offset = init.data.offset;
+            let retries = 0;
+            while (offset < file.size) {
+                const chunk = file.slice(offset, Math.min(offset + chunkSize, file.size));
+                const headers = { 'Content-Range': `bytes ${offset}-${offset + chunk.size - 1}/${file.size}` };
+                const checksum = await sha256Hex(chunk);
+                if (checksum) headers['X-Chunk-SHA256'] = checksum;
+                try {
+                    const response = await fetch(`/api/shots/uploads/${id}`, { method: 'PUT', headers, body: chunk });
+                    const result = await response.json();
+                    if (result.success || response.status === 409) {
+                        offset = result.data.offset;
+                        retries = 0;
+                        showNotification(`Uploading ${file.name}... ${Math.round(offset / file.size * 100)}%`);
+                        continue;
+                    }
+                    if (response.status < 500) return result;
+                } catch (error) {
+                    console.error('Chunk upload failed, resuming:', error);
+                }
+                if (++retries > CHUNK_MAX_RETRIES) {
+                    return { success: false, error: 'Upload interrupted' };
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+                // Resume from whatever the server acknowledged.
+                try {
+                    const status = await (await fetch(`/api/shots/uploads/${id}`)).json();
+                    if (status.success) offset = status.data.offset;
+                } catch (error) {
+                    console.error('Could not query upload offset:', error);
+                }
+            }
+
+            const finalize = await fetch(`/api/shots/uploads/${id}/finalize`, { method: 'POST' });
+            return finalize.json();
         }
 
         async function uploadFile(file, shotName, fileType) {
+            if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+                try {
+                    showNotification('Uploading file...');
+                    const result = await uploadFileChunked(file, shotName, fileType);
+                    if (result.success) {
+                        showNotification(`${file.name} uploaded successfully!`);
+                        loadShots(`shot-row-${shotName}`);
+                    } else {
+                        showNotification(result.error || 'Upload failed', 'error');
+                    }
+                } catch (error) {
+                    console.error('Upload error:', error);
+                    showNotification('Upload failed', 'error');
+                }
+                return;
+            }
+
             const formData = new FormData();
             formData.append('file', file);
             formData.append('shot_name', shotName);
@@ -428,6 +716,69 @@
             }
         }
 
+        // Several small files are sent together to /api/shots/upload/batch,
+        // in requests of at most this many bytes (the server caps at 500MB).
+        const BATCH_UPLOAD_MAX_BYTES = 256 * 1024 * 1024;
+
+        async function uploadFiles(files, shotName, fileType) {
+            // Keep the drop order: it decides the version numbers.
+            const batches = [];
+            let batch = [], batchBytes = 0;
+            let uploaded = 0, failed = 0;
+            for (const file of files) {
+                if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+                    if (batch.length) batches.push(batch);
+                    batches.push([file]);
+                    batch = [];
+                    batchBytes = 0;
+                    continue;
+                }
+                if (batch.length && batchBytes + file.size > BATCH_UPLOAD_MAX_BYTES) {
+                    batches.push(batch);
+                    batch = [];
+                    batchBytes = 0;
+                }
+                batch.push(file);
+                batchBytes += file.size;
+            }
+            if (batch.length) batches.push(batch);
+
+            for (const group of batches) {
+                showNotification(`Uploading ${uploaded + failed + 1}-${uploaded + failed + group.length} of ${files.length} files...`);
+                try {
+                    if (group.length === 1 && group[0].size > CHUNKED_UPLOAD_THRESHOLD) {
+                        const result = await uploadFileChunked(group[0], shotName, fileType);
+                        result.success ? uploaded++ : failed++;
+                        continue;
+                    }
+                    const formData = new FormData();
+                    group.forEach(file => formData.append('file', file));
+                    formData.append('shot_name', shotName);
+                    formData.append('file_type', fileType);
+                    const response = await fetch('/api/shots/upload/batch', { method: 'POST', body: formData });
+                    const result = await response.json();
+                    if (result.success) {
+                        uploaded += result.data.uploaded;
+                        failed += result.data.failed;
+                        result.data.results.filter(r => !r.success).forEach(r => console.error(`Upload of ${r.filename} failed:`, r.error));
+                    } else {
+                        failed += group.length;
+                        console.error('Batch upload failed:', result.error);
+                    }
+                } catch (error) {
+                    console.error('Upload error:', error);
+                    failed += group.length;
+                }
+            }
+
+            if (failed) {
+                showNotification(`${uploaded} of ${files.length} files uploaded, ${failed} failed`, 'error');
+            } else {
+                showNotification(`${uploaded} files uploaded successfully!`);
+            }
+            loadShots(`shot-row-${shotName}`);
+        }
+
         function showNotification(message, type = 'success') {
             const notification = document.getElementById('notification');
             notification.textContent = message;
@@ -600,8 +951,18 @@ async function renameShot(oldName, newName) {
 
         async function loadProjectsList() {
             try {
-                const response = await fetch('/api/project/all');
-                const result = await response.json();
+                // The catalog is paginated; collect every page for the picker.
+                const result = { success: true, data: [] };
+                while (true) {
+                    const response = await fetch(`/api/project/all?offset=${result.data.length}&limit=500`);
+                    const page = await response.json();
+                    if (!page.success) {
+                        result.success = false;
+                        break;
+                    }
+                    result.data.push(...page.data);
+                    if (page.data.length === 0 || result.data.length >= page.total) break;
+                }
 
                 if (result.success) {
                     const list = document.getElementById('recent-projects-list');
@@ -1,4 +1,14 @@
+from contextlib import contextmanager
 from pathlib import Path
+import json
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 
 def sanitize_path(path_str: str) -> Path:
@@ -12,3 +22,65 @@ def sanitize_path(path_str: str) -> Path:
     ):
         cleaned = cleaned[1:-1]
     return Path(cleaned).expanduser()
+
+
+def atomic_write_json(path, data, **dump_kwargs):
+    """Write ``data`` as JSON to ``path`` via a temp file and ``os.replace``.
+
+    Readers never observe a half-written file, even when several processes
+    write the same path concurrently (the last rename wins).
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **dump_kwargs)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on ``path`` for the duration of the block.
+
+    The lock file is created if needed.  Locks are per open file, so they
+    serialise threads and processes (e.g. gunicorn workers) alike.
+    """
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def try_lock(path):
+    """Take an exclusive lock on ``path`` without waiting.
+
+    Returns the open lock file (keep it open to hold the lock; closing it
+    releases it) or ``None`` if another process holds the lock.
+    """
+    f = open(path, 'a+b')
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        return None
+    return f
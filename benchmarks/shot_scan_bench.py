@@ -0,0 +1,229 @@
+"""Compare the per-shot folder scan before and after the single-pass scanner.
+
+Usage::
+
+    python benchmarks/shot_scan_bench.py                # 1000 synthetic shots
+    python benchmarks/shot_scan_bench.py --shots 5000
+    python benchmarks/shot_scan_bench.py --strace       # kernel syscall counts (needs strace)
+
+``legacy``
+    The previous ``ShotManager._scan_shot``/``_get_latest_asset`` code: a glob
+    per extension per folder, ``exists()`` per candidate final and
+    ``resolve()`` of every folder, plus the ``exists()``-per-extension lookup
+    in ``latest_images``/``latest_videos``.
+``scanner``
+    ``app.services.shot_scanner.scan_shot`` plus one listing of each
+    ``latest_*`` folder for all shots (what ``ShotIndex.latest_files`` does).
+
+Filesystem calls are counted by wrapping ``os.stat``, ``os.lstat``,
+``os.scandir``, ``os.listdir`` and ``open``; ``--strace`` additionally runs
+each strategy under ``strace -c -f`` and reports the kernel's count.
+"""
+from __future__ import annotations
+
+import argparse
+import builtins
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.config.constants import ALLOWED_IMAGE_EXTENSIONS, ALLOWED_VIDEO_EXTENSIONS  # noqa: E402
+from app.services.shot_scanner import LIPSYNC_PARTS, list_files, scan_shot  # noqa: E402
+
+
+def build_corpus(root, count):
+    wip = root / "shots" / "wip"
+    latest_images = root / "shots" / "latest_images"
+    latest_videos = root / "shots" / "latest_videos"
+    for d in (wip, latest_images, latest_videos):
+        d.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        name = f"SH{i + 1:03d}" if i < 999 else f"SH{(i % 999) + 1:03d}_{(i // 999) * 10 + 40:03d}"
+        shot = wip / name
+        for sub in ("images", "videos", "lipsync"):
+            (shot / sub).mkdir(parents=True, exist_ok=True)
+        for v in range(1, 4):
+            (shot / "images" / f"{name}_v{v:03d}.png").touch()
+        for v in range(1, 3):
+            (shot / "videos" / f"{name}_v{v:03d}.mp4").touch()
+        (shot / "lipsync" / f"{name}_driver_v001.mp4").touch()
+        (shot / "lipsync" / f"{name}_driver.mp4").touch()
+        (shot / "notes.txt").write_text(f"notes for {name}")
+        (latest_images / f"{name}.png").touch()
+        (latest_videos / f"{name}.mp4").touch()
+    return sorted(p.name for p in wip.iterdir())
+
+
+# ---------------------------------------------------------------------------
+# Previous implementation (kept verbatim apart from being module functions)
+# ---------------------------------------------------------------------------
+def _legacy_get_latest_asset(project_path, final_dir, wip_dir, shot_name, extensions):
+    project_root = project_path.resolve()
+    if final_dir and final_dir.exists():
+        final_dir = final_dir.resolve()
+        if not str(final_dir).startswith(str(project_root)):
+            return None, 0
+    if wip_dir and wip_dir.exists():
+        wip_dir = wip_dir.resolve()
+        if not str(wip_dir).startswith(str(project_root)):
+            return None, 0
+
+    latest_final = None
+    if final_dir and final_dir.exists():
+        for ext in extensions:
+            candidate = final_dir / f"{shot_name}{ext}"
+            if candidate.exists():
+                latest_final = str(candidate)
+                break
+
+    version = 0
+    if wip_dir and wip_dir.exists():
+        wip_files = []
+        for ext in extensions:
+            wip_files.extend(wip_dir.glob(f"{shot_name}_v*{ext}"))
+        versions = []
+        for f in wip_files:
+            try:
+                versions.append(int(f.stem.split("_v")[1]))
+            except (IndexError, ValueError):
+                continue
+        if versions:
+            version = max(versions)
+    return latest_final, version
+
+
+def legacy(project_path, names):
+    wip = project_path / "shots" / "wip"
+    latest = {
+        "image": (project_path / "shots" / "latest_images", ALLOWED_IMAGE_EXTENSIONS),
+        "video": (project_path / "shots" / "latest_videos", ALLOWED_VIDEO_EXTENSIONS),
+    }
+    for name in names:
+        shot_dir = (wip / name).resolve()
+        notes_file = shot_dir / "notes.txt"
+        if notes_file.exists():
+            with open(notes_file, "r", encoding="utf-8") as f:
+                f.read()
+        _legacy_get_latest_asset(project_path, None, shot_dir / "images", name, ALLOWED_IMAGE_EXTENSIONS)
+        _legacy_get_latest_asset(project_path, None, shot_dir / "videos", name, ALLOWED_VIDEO_EXTENSIONS)
+        lipsync_dir = shot_dir / "lipsync"
+        for part in LIPSYNC_PARTS:
+            _legacy_get_latest_asset(project_path, lipsync_dir, lipsync_dir, f"{name}_{part}", ALLOWED_VIDEO_EXTENSIONS)
+        for final_dir, exts in latest.values():
+            _legacy_get_latest_asset(project_path, final_dir, None, name, exts)
+
+
+def scanner(project_path, names):
+    wip = project_path / "shots" / "wip"
+    latest_images = set(list_files(project_path / "shots" / "latest_images"))
+    latest_videos = set(list_files(project_path / "shots" / "latest_videos"))
+    for name in names:
+        scan_shot(wip / name, name)
+        next((e for e in ALLOWED_IMAGE_EXTENSIONS if f"{name}{e}" in latest_images), None)
+        next((e for e in ALLOWED_VIDEO_EXTENSIONS if f"{name}{e}" in latest_videos), None)
+
+
+STRATEGIES = {"legacy": legacy, "scanner": scanner}
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+class FsCallCounter:
+    """Count filesystem entry points called from Python while active."""
+
+    PATCHED = (("os", "stat"), ("os", "lstat"), ("os", "scandir"), ("os", "listdir"), ("builtins", "open"))
+
+    def __init__(self):
+        self.count = 0
+        self._saved = []
+
+    def __enter__(self):
+        modules = {"os": os, "builtins": builtins}
+        for mod_name, attr in self.PATCHED:
+            module = modules[mod_name]
+            original = getattr(module, attr)
+            self._saved.append((module, attr, original))
+
+            def wrapper(*args, __original=original, **kwargs):
+                self.count += 1
+                return __original(*args, **kwargs)
+
+            setattr(module, attr, wrapper)
+        return self
+
+    def __exit__(self, *exc):
+        for module, attr, original in self._saved:
+            setattr(module, attr, original)
+
+
+def measure(fn, project_path, names, repeat):
+    with FsCallCounter() as counter:
+        fn(project_path, names)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(project_path, names)
+        timings.append(time.perf_counter() - start)
+    return counter.count, timings
+
+
+def strace_count(strategy, project_path, shots):
+    """Return the kernel syscall count of one run of ``strategy`` (or ``None``)."""
+    if not shutil.which("strace"):
+        return None
+    with tempfile.NamedTemporaryFile(suffix=".strace") as out:
+        # Subtract a run that only sets up (imports, names) to isolate the scan.
+        counts = []
+        for run in ("none", strategy):
+            subprocess.run(
+                ["strace", "-f", "-c", "-o", out.name, sys.executable, __file__,
+                 "--project", str(project_path), "--shots", str(shots), "--run-once", run],
+                check=True, capture_output=True,
+            )
+            total = [line for line in Path(out.name).read_text().splitlines() if line.strip().endswith("total")]
+            counts.append(int(total[-1].split()[2]) if total else 0)
+        return counts[1] - counts[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shots", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--strace", action="store_true", help="also count kernel syscalls with strace")
+    parser.add_argument("--project", help=argparse.SUPPRESS)
+    parser.add_argument("--run-once", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_once:
+        project_path = Path(args.project)
+        names = sorted(p.name for p in (project_path / "shots" / "wip").iterdir())
+        if args.run_once in STRATEGIES:
+            STRATEGIES[args.run_once](project_path, names)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        project_path = Path(tmp) / "project"
+        names = build_corpus(project_path, args.shots)
+        print(f"{len(names)} shots")
+        print(f"{'strategy':<10} {'fs calls':>10} {'per shot':>9} {'median ms':>10} {'min ms':>8}"
+              + (f" {'syscalls':>10}" if args.strace else ""))
+        for label, fn in STRATEGIES.items():
+            calls, timings = measure(fn, project_path, names, args.repeat)
+            row = (f"{label:<10} {calls:>10} {calls / len(names):>9.1f} "
+                   f"{statistics.median(timings) * 1000:>10.1f} {min(timings) * 1000:>8.1f}")
+            if args.strace:
+                kernel = strace_count(label, project_path, args.shots)
+                row += f" {kernel if kernel is not None else 'n/a':>10}"
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
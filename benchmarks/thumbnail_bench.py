@@ -0,0 +1,171 @@
+"""Compare thumbnail decoding strategies on a corpus of large stills.
+
+Usage::
+
+    python benchmarks/thumbnail_bench.py                 # synthetic 4K/8K corpus
+    python benchmarks/thumbnail_bench.py --corpus DIR    # your own images
+
+Each strategy runs in a fresh process so the reported peak RSS is not skewed
+by allocations from a previous run.
+
+``full-decode``
+    Loads the complete frame before resizing (what a naive pipeline does).
+``legacy``
+    The previous ``Image.open(...).thumbnail(THUMBNAIL_SIZE, LANCZOS)`` code.
+``pipeline``
+    ``app.services.thumbnail_cache.render_thumbnail``.
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from app.config.constants import THUMBNAIL_SIZE  # noqa: E402
+
+EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def _flatten_and_save(img, dest):
+    if img.mode in ("RGBA", "LA", "P"):
+        background = Image.new("RGB", img.size, (64, 64, 64))
+        if img.mode == "P":
+            img = img.convert("RGBA")
+        background.paste(img, mask=img.split()[-1] if "A" in img.mode else None)
+        img = background
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+    img.save(dest, "JPEG", quality=85)
+
+
+def full_decode(source, dest):
+    with Image.open(source) as img:
+        img.load()
+        img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        _flatten_and_save(img, dest)
+
+
+def legacy(source, dest):
+    with Image.open(source) as img:
+        img.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+        _flatten_and_save(img, dest)
+
+
+def pipeline(source, dest):
+    from app.services.thumbnail_cache import render_thumbnail
+
+    render_thumbnail(source, dest)
+
+
+STRATEGIES = {"full-decode": full_decode, "legacy": legacy, "pipeline": pipeline}
+
+
+def _reset_peak():
+    """Reset the peak RSS counter where the kernel allows it (Linux)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_kib():
+    # VmHWM honours _reset_peak(); ru_maxrss is the portable fallback.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _current_kib():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return _peak_kib()
+
+
+def _run(name, files, repeat, out_dir, queue):
+    func = STRATEGIES[name]
+    # Warm up imports so they do not count towards the peak.
+    if name == "pipeline":
+        from app.services import thumbnail_cache  # noqa: F401
+    _reset_peak()
+    baseline = _current_kib()
+    timings = []
+    for _ in range(repeat):
+        for i, source in enumerate(files):
+            start = time.perf_counter()
+            func(source, os.path.join(out_dir, f"{name}_{i}.jpg"))
+            timings.append(time.perf_counter() - start)
+    queue.put((timings, _peak_kib() - baseline))
+
+
+def build_corpus(directory):
+    """Write a small synthetic corpus of 4K and 8K stills to ``directory``."""
+    specs = [
+        ("4k.jpg", (3840, 2160), "RGB", "JPEG"),
+        ("8k.jpg", (7680, 4320), "RGB", "JPEG"),
+        ("4k.png", (3840, 2160), "RGBA", "PNG"),
+        ("8k.webp", (7680, 4320), "RGB", "WEBP"),
+    ]
+    files = []
+    for name, size, mode, fmt in specs:
+        img = Image.new(mode, size, (30, 60, 90))
+        draw = ImageDraw.Draw(img)
+        for x in range(0, size[0], 64):
+            draw.line([(x, 0), (size[0] - x, size[1])], fill=(x % 255, 128, 200), width=9)
+        path = os.path.join(directory, name)
+        img.save(path, fmt, quality=92)
+        files.append(path)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of images (default: synthetic corpus)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            files = sorted(str(p) for p in Path(args.corpus).iterdir() if p.suffix.lower() in EXTENSIONS)
+        else:
+            files = build_corpus(tmp)
+        if not files:
+            parser.error("no images found")
+
+        print(f"{len(files)} images x {args.repeat} runs, target {THUMBNAIL_SIZE[0]}x{THUMBNAIL_SIZE[1]}")
+        print(f"{'image':<16} {'strategy':<12} {'median ms':>10} {'peak RSS MiB':>13}")
+        for source in files:
+            for name in STRATEGIES:
+                queue = ctx.Queue()
+                proc = ctx.Process(target=_run, args=(name, [source], args.repeat, tmp, queue))
+                proc.start()
+                timings, rss = queue.get()
+                proc.join()
+                print(f"{Path(source).name:<16} {name:<12} "
+                      f"{statistics.median(timings) * 1000:>10.1f} {rss / 1024:>13.1f}")
+
+if __name__ == "__main__":
+    main()
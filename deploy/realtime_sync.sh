@@ -35,10 +35,31 @@ sync_to_gdrive() {
 echo "Performing initial sync..."
 sync_to_gdrive
 
-# Monitor for changes using inotifywait
 echo "Starting real-time monitoring..."
 echo "Press Ctrl+C to stop"
 
+# When the Shotbuddy server runs its own watcher (SHOTBUDDY_WATCH=1) it
+# appends every changed path to SHOTBUDDY_CHANGES_FEED; follow that instead
+# of running a second set of inotify watches.
+if [ -n "$SHOTBUDDY_CHANGES_FEED" ] && [ -f "$SHOTBUDDY_CHANGES_FEED" ]; then
+    echo "Following change feed $SHOTBUDDY_CHANGES_FEED"
+    tail -n0 -F "$SHOTBUDDY_CHANGES_FEED" 2>/dev/null | while read -r path; do
+        declare -A PENDING=()
+        PENDING["${path%%/shots/*}/shots"]=1
+        # Debounce: collect further paths until 2 seconds pass without one
+        while read -r -t 2 path; do
+            PENDING["${path%%/shots/*}/shots"]=1
+        done
+        for DIR in "${!PENDING[@]}"; do
+            [ -d "$DIR" ] && sync_dir "$DIR"
+        done
+        unset PENDING
+    done
+    exit 0
+fi
+
+# Otherwise monitor for changes using inotifywait
+
 # Install inotify-tools if not present
 if ! command -v inotifywait &> /dev/null; then
     echo "Installing inotify-tools..."
@@ -19,7 +19,10 @@ def load_server_config():
     return host, port
 
 
-app = create_app()
+# The thumbnail pool's worker processes import this module again, as
+# ``__mp_main__``; they must not set up a server of their own.
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
     cfg_host, cfg_port = load_server_config()
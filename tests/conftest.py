@@ -0,0 +1,25 @@
+import os
+import tempfile
+
+import pytest
+
+# Keep the shared state database, locks and staging of the test run out of
+# the source tree; app.config.constants reads these at import time.
+_ROOT = tempfile.mkdtemp(prefix="shotbuddy-tests-")
+os.environ.setdefault("SHOTBUDDY_BASE_DIR", os.path.join(_ROOT, "projects"))
+os.environ.setdefault("SHOTBUDDY_STATE_DIR", os.path.join(_ROOT, "state"))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client of a fresh app whose current project is ``tmp_path/P1``."""
+    # projects.json is kept in the working directory.
+    monkeypatch.chdir(tmp_path)
+    from app import create_app
+
+    app = create_app()
+    app.config["TESTING"] = True
+    client = app.test_client()
+    response = client.post("/api/project/create", json={"path": str(tmp_path), "name": "P1"})
+    assert response.get_json()["success"]
+    return client
@@ -0,0 +1,60 @@
+import pytest
+
+from app.services.events import MAX_REPLAY, EventBus
+from app.services.shared_state import SharedState
+
+
+@pytest.fixture
+def bus(tmp_path):
+    bus = EventBus(state=SharedState(tmp_path / "state.db"), poll_interval=60)
+    yield bus
+    bus._subscribers.clear()
+
+
+def _drain(sub):
+    events = []
+    while not sub.queue.empty():
+        events.append(sub.get())
+    return events
+
+
+def _publish(bus, count):
+    return [bus.publish("notes", "/project", f"SH{i:03d}") for i in range(count)]
+
+
+def test_reconnect_replays_missed_events(bus):
+    bus.subscribe()
+    ids = _publish(bus, 3)
+    bus._cursor = ids[-1]
+
+    events = _drain(bus.subscribe(ids[0]))
+
+    assert [e["id"] for e in events] == ids[1:]
+
+
+def test_reconnect_after_too_many_events_gets_reset(bus):
+    bus.subscribe()
+    ids = _publish(bus, MAX_REPLAY + 2)
+    bus._cursor = ids[-1]
+
+    sub = bus.subscribe(ids[0])
+
+    assert [e["type"] for e in _drain(sub)] == ["reset"]
+    assert sub.last_id == ids[-1]
+
+
+def test_reconnect_after_pruned_events_gets_reset(bus):
+    bus.subscribe()
+    ids = _publish(bus, 10)
+    bus._cursor = ids[-1]
+    bus.state.connection().execute("DELETE FROM events WHERE id <= ?", (ids[5],))
+
+    assert [e["type"] for e in _drain(bus.subscribe(ids[2]))] == ["reset"]
+
+
+def test_unknown_last_id_gets_reset(bus):
+    bus.subscribe()
+    ids = _publish(bus, 2)
+    bus._cursor = ids[-1]
+
+    assert [e["type"] for e in _drain(bus.subscribe(ids[-1] + 100))] == ["reset"]
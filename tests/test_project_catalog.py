@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+from app.services.project_catalog import ProjectCatalog
+from app.services.shared_state import SharedState
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return ProjectCatalog(SharedState(tmp_path / "state.db"))
+
+
+def _project(folder, name):
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / "project.json").write_text(json.dumps({"name": name, "path": "elsewhere"}))
+    return folder
+
+
+def test_reindex_finds_projects_without_walking_their_shots(tmp_path, catalog):
+    root = tmp_path / "projects"
+    _project(root / "Film", "Film")
+    _project(root / "client" / "Spot", "Spot")
+    # Not projects: inside a project's shots, and a hidden folder.
+    _project(root / "Film" / "shots" / "wip" / "SH010", "Copied")
+    _project(root / ".shotbuddy" / "Old", "Old")
+
+    assert catalog.reindex(root) == 2
+
+    projects, total = catalog.list()
+    assert total == 2
+    assert [(p["name"], p["path"]) for p in projects] == [
+        ("Film", str((root / "Film").resolve())),
+        ("Spot", str((root / "client" / "Spot").resolve())),
+    ]
+
+
+def test_reindex_drops_vanished_projects_but_keeps_outside_ones(tmp_path, catalog):
+    root = tmp_path / "projects"
+    gone = _project(root / "Gone", "Gone")
+    outside = _project(tmp_path / "elsewhere" / "Outside", "Outside")
+    catalog.reindex(root)
+    catalog.upsert({"name": "Outside", "path": str(outside.resolve())})
+
+    (gone / "project.json").unlink()
+    catalog.reindex(root)
+
+    assert [p["name"] for p in catalog.list()[0]] == ["Outside"]
+
+
+def test_list_pages_by_name(tmp_path, catalog):
+    root = tmp_path / "projects"
+    for name in ("delta", "Alpha", "charlie", "Bravo", "echo"):
+        _project(root / name, name)
+    catalog.reindex(root)
+
+    first, total = catalog.list(0, 2)
+    rest, _ = catalog.list(2, 10)
+
+    assert total == 5
+    assert [p["name"] for p in first] == ["Alpha", "Bravo"]
+    assert [p["name"] for p in rest] == ["charlie", "delta", "echo"]
+    assert catalog.list(5, 2) == ([], 5)
+
+
+def test_project_page_arguments_must_be_integers(client):
+    response = client.get("/api/project/all?offset=x")
+
+    assert response.status_code == 400
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from app.services.renumber import (
+    RenumberJournal,
+    TEMP_PREFIX,
+    check_ops,
+    expand_steps,
+    plan_renames,
+    run_ops,
+)
+from app.services.shot_manager import ShotManager
+
+
+def _apply(names, steps):
+    """Run ``steps`` on the set ``names``, failing on an occupied target."""
+    names = set(names)
+    for old, new in steps:
+        assert old in names and new not in names, (old, new)
+        names.remove(old)
+        names.add(new)
+    return names
+
+
+def test_plan_orders_chains_so_targets_are_free():
+    mapping = {"SH010": "SH020", "SH020": "SH030"}
+
+    steps = plan_renames(mapping)
+
+    assert steps == [("SH020", "SH030"), ("SH010", "SH020")]
+
+
+@pytest.mark.parametrize("mapping", [
+    {"SH010": "SH020", "SH020": "SH010"},
+    {"SH010": "SH020", "SH020": "SH030", "SH030": "SH010"},
+    {"SH010": "SH020", "SH020": "SH010", "SH030": "SH040", "SH040": "SH030", "SH050": "SH050"},
+])
+def test_plan_breaks_cycles_through_a_temporary_name(mapping):
+    steps = plan_renames(mapping)
+
+    assert _apply(mapping, steps) == set(mapping.values())
+    assert any(new.startswith(TEMP_PREFIX) for _, new in steps)
+    assert all(old != new for old, new in steps)
+
+
+def test_check_ops_rejects_an_occupied_target(tmp_path):
+    (tmp_path / "a").touch()
+    (tmp_path / "b").touch()
+
+    with pytest.raises(ValueError):
+        check_ops([[str(tmp_path / "a"), str(tmp_path / "b")]])
+
+
+def test_check_ops_accepts_a_target_freed_by_an_earlier_op(tmp_path):
+    (tmp_path / "a").touch()
+    (tmp_path / "b").touch()
+    ops = [
+        [str(tmp_path / "b"), str(tmp_path / "c")],
+        [str(tmp_path / "a"), str(tmp_path / "b")],
+    ]
+
+    check_ops(ops)
+
+
+def _make_shot(manager, name, content):
+    manager.create_shot_structure(name)
+    (manager.wip_dir / name / "images" / f"{name}_v001.png").write_bytes(content)
+    (manager.latest_images_dir / f"{name}.png").write_bytes(content)
+
+
+def test_renames_interrupted_by_a_crash_are_finished_on_next_open(tmp_path):
+    project = tmp_path / "P1"
+    manager = ShotManager(project)
+    _make_shot(manager, "SH010", b"ten")
+    _make_shot(manager, "SH020", b"twenty")
+    mapping = {"SH010": "SH020", "SH020": "SH010"}
+
+    # What _rename_shots does, up to a crash after a few renames: the last
+    # one ran but was never marked done in the journal.
+    ops, rekeys = expand_steps(plan_renames(mapping), manager.wip_dir, manager._latest_dirs())
+    journal = RenumberJournal(project)
+    journal.begin(mapping, ops, rekeys)
+    run_ops(journal, ops[:3])
+    src, dst = ops[3]
+    os.rename(src, dst)
+    journal.close()
+
+    recovered = ShotManager(project)
+
+    assert not journal.exists()
+    wip = recovered.wip_dir
+    assert (wip / "SH020" / "images" / "SH020_v001.png").read_bytes() == b"ten"
+    assert (wip / "SH010" / "images" / "SH010_v001.png").read_bytes() == b"twenty"
+    assert (recovered.latest_images_dir / "SH020.png").read_bytes() == b"ten"
+    assert (recovered.latest_images_dir / "SH010.png").read_bytes() == b"twenty"
+    assert sorted(p.name for p in wip.iterdir()) == ["SH010", "SH020"]
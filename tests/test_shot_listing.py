@@ -0,0 +1,23 @@
+from app.services.shot_manager import ShotManager
+
+
+def test_listing_scanned_during_a_bump_is_not_reused(tmp_path):
+    project = tmp_path / "P1"
+    # Two workers with their own ShotManager on the same project.
+    scanning = ShotManager(project)
+    other = ShotManager(project)
+    other.create_shot_structure("SH010")
+
+    scan = scanning._scan_shots
+
+    def scan_while_other_worker_creates_a_shot():
+        shots = scan()
+        other.create_shot_structure("SH020")
+        return shots
+
+    scanning._scan_shots = scan_while_other_worker_creates_a_shot
+    assert [s["name"] for s in scanning.get_shots()] == ["SH010"]
+    scanning._scan_shots = scan
+
+    assert [s["name"] for s in scanning.get_shots()] == ["SH010", "SH020"]
+    assert [s["name"] for s in other.get_shots()] == ["SH010", "SH020"]
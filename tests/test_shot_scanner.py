@@ -0,0 +1,25 @@
+from app.services.shot_scanner import scan_shot
+
+
+def test_scan_skips_reserved_versions(tmp_path):
+    shot = tmp_path / "SH010"
+    for sub in ("images", "videos", "lipsync"):
+        (shot / sub).mkdir(parents=True)
+    (shot / "images" / "SH010_v001.png").write_bytes(b"frame")
+    (shot / "images" / "SH010_v002.png").touch()
+    (shot / "images" / ".SH010_v002.png.reserving").touch()
+    (shot / "lipsync" / "SH010_driver_v001.mp4").touch()
+    (shot / "lipsync" / ".SH010_driver_v001.mp4.reserving").touch()
+
+    entry = scan_shot(shot, "SH010")
+
+    assert entry["image_version"] == 1
+    assert entry["lipsync"]["driver"]["version"] == 0
+
+
+def test_scan_counts_empty_files_that_are_not_reserved(tmp_path):
+    shot = tmp_path / "SH010"
+    (shot / "videos").mkdir(parents=True)
+    (shot / "videos" / "SH010_v001.mp4").touch()
+
+    assert scan_shot(shot, "SH010")["video_version"] == 1
@@ -0,0 +1,61 @@
+def _create_shot(client):
+    response = client.post("/api/shots/")
+    assert response.get_json()["success"]
+
+
+def _listing(client, **params):
+    response = client.get("/api/shots", query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_listing_is_revalidated_with_its_etag(client):
+    _create_shot(client)
+    response = client.get("/api/shots")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    unchanged = client.get("/api/shots", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b""
+
+    _create_shot(client)
+    changed = client.get("/api/shots", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.get_json()["data"]) == 2
+
+
+def test_since_returns_only_the_changes(client):
+    _create_shot(client)
+    before = _listing(client)
+    assert [s["name"] for s in before["data"]] == ["SH010"]
+
+    nothing = _listing(client, since=before["revision"])
+    assert nothing["delta"] and nothing["changed"] == [] and nothing["removed"] == []
+    assert nothing["revision"] == before["revision"]
+
+    _create_shot(client)
+    created = _listing(client, since=before["revision"])
+    assert created["delta"]
+    assert [s["name"] for s in created["changed"]] == ["SH020"]
+    assert created["removed"] == []
+
+    client.post("/api/shots/rename", json={"old_name": "SH020", "new_name": "SH030"})
+    renamed = _listing(client, since=created["revision"])
+    assert [s["name"] for s in renamed["changed"]] == ["SH030"]
+    assert renamed["removed"] == ["SH020"]
+
+
+def test_since_an_unknown_revision_returns_the_full_listing(client):
+    _create_shot(client)
+    listing = _listing(client)
+
+    full = _listing(client, since=listing["revision"] + 100)
+
+    assert "delta" not in full
+    assert [s["name"] for s in full["data"]] == ["SH010"]
+
+
+def test_since_must_be_an_integer(client):
+    assert client.get("/api/shots?since=abc").status_code == 400
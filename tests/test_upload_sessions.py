@@ -0,0 +1,76 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture
+def session(client):
+    response = client.post("/api/shots/uploads", json={
+        "shot_name": "SH010", "file_type": "driver", "filename": "take.mp4", "size": 10,
+    })
+    body = response.get_json()
+    assert body["success"], body
+    return body["data"]
+
+
+def _put(client, upload_id, offset, data, **headers):
+    return client.put(
+        f"/api/shots/uploads/{upload_id}",
+        data=data,
+        headers={"Content-Range": f"bytes {offset}-{offset + len(data) - 1}/10", **headers},
+    )
+
+
+def test_upload_resumes_from_the_acknowledged_offset(client, session):
+    upload_id = session["id"]
+    assert _put(client, upload_id, 0, b"01234").get_json()["data"]["offset"] == 5
+
+    # A retried or out-of-order chunk is refused with the offset to resume from.
+    stale = _put(client, upload_id, 0, b"01234")
+    assert stale.status_code == 409
+    assert stale.get_json()["data"]["offset"] == 5
+
+    bad = _put(client, upload_id, 5, b"56789", **{"X-Chunk-SHA256": hashlib.sha256(b"other").hexdigest()})
+    assert bad.status_code == 400
+    assert client.get(f"/api/shots/uploads/{upload_id}").get_json()["data"] == {"offset": 5, "size": 10}
+
+    done = _put(client, upload_id, 5, b"56789", **{"X-Chunk-SHA256": hashlib.sha256(b"56789").hexdigest()})
+    assert done.get_json()["data"]["offset"] == 10
+
+
+def test_finalize_publishes_the_assembled_file(client, session):
+    upload_id = session["id"]
+    _put(client, upload_id, 0, b"01234")
+
+    incomplete = client.post(f"/api/shots/uploads/{upload_id}/finalize")
+    assert incomplete.status_code == 400
+
+    _put(client, upload_id, 5, b"56789")
+    result = client.post(f"/api/shots/uploads/{upload_id}/finalize").get_json()
+    assert result["success"], result
+    assert result["data"]["version"] == 1
+    assert Path(result["data"]["wip_path"]).read_bytes() == b"0123456789"
+    assert Path(result["data"]["final_path"]).read_bytes() == b"0123456789"
+
+    # The session is gone; a second finalize cannot publish it again.
+    assert client.post(f"/api/shots/uploads/{upload_id}/finalize").status_code == 400
+    assert client.get(f"/api/shots/uploads/{upload_id}").status_code == 404
+
+
+def test_discarded_session_is_unknown(client, session):
+    upload_id = session["id"]
+    assert client.delete(f"/api/shots/uploads/{upload_id}").get_json()["success"]
+
+    response = _put(client, upload_id, 0, b"01234")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Unknown upload id"
+
+
+def test_chunk_without_content_length_is_refused(client, session):
+    response = client.put(
+        f"/api/shots/uploads/{session['id']}?offset=0",
+        data=b"01234",
+        headers={"Transfer-Encoding": "chunked"},
+    )
+    assert response.status_code == 411
@@ -0,0 +1,96 @@
+import io
+import os
+import stat
+import tempfile
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from app.services import upload_staging
+from app.services.upload_staging import FILE_MODE, link_duplicate, promote, store_upload
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_file_mode_follows_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    assert FILE_MODE == 0o666 & ~umask
+
+
+def test_staged_upload_is_stored_with_file_mode(tmp_path, monkeypatch):
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    monkeypatch.setattr(upload_staging, "UPLOAD_STAGING_DIR", staging)
+    stream = tempfile.NamedTemporaryFile(mode="w+b", dir=str(staging), delete=False)
+    stream.write(b"frame")
+    assert _mode(stream.name) == 0o600
+
+    dest = tmp_path / "SH010_v001.png"
+    store_upload(FileStorage(stream=stream, filename="x.png"), dest)
+    stream.close()
+
+    assert dest.read_bytes() == b"frame"
+    assert _mode(dest) == FILE_MODE
+
+
+def test_copied_upload_replaces_reservation_mode(tmp_path):
+    dest = tmp_path / "SH010_v001.png"
+    os.close(os.open(dest, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600))
+
+    store_upload(FileStorage(stream=io.BytesIO(b"frame"), filename="x.png"), dest)
+
+    assert _mode(dest) == FILE_MODE
+
+
+def test_linked_and_promoted_files_get_file_mode(tmp_path):
+    src = tmp_path / "SH010_v001.png"
+    src.write_bytes(b"frame")
+    os.chmod(src, 0o600)
+
+    duplicate = tmp_path / "SH020_v001.png"
+    assert link_duplicate(src, duplicate)
+    assert _mode(duplicate) == FILE_MODE
+
+    os.chmod(src, 0o600)
+    final = promote(src, tmp_path / "SH010.png")
+    assert _mode(final) == FILE_MODE
+
+
+def test_failed_copy_leaves_reservation_empty(tmp_path):
+    class BrokenStream(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell():
+                raise OSError("connection reset")
+            return super().read(5)
+
+    dest = tmp_path / "SH010_v001.png"
+    dest.touch()
+
+    with pytest.raises(OSError):
+        store_upload(FileStorage(stream=BrokenStream(b"frame" * 10), filename="x.png"), dest)
+
+    assert dest.read_bytes() == b""
+    assert os.listdir(tmp_path) == [dest.name]
+
+
+def test_promoted_copy_is_independent_of_the_version(tmp_path):
+    src = tmp_path / "SH010_v001.png"
+    src.write_bytes(b"frame")
+
+    final = promote(src, tmp_path / "SH010.png")
+    final.write_bytes(b"edited")
+
+    assert src.read_bytes() == b"frame"
+
+
+def test_link_mode_hard_links_the_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_staging, "PROMOTE_MODE", "link")
+    src = tmp_path / "SH010_v001.png"
+    src.write_bytes(b"frame")
+
+    final = promote(src, tmp_path / "SH010.png")
+
+    assert os.path.samefile(src, final)
@@ -0,0 +1,37 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+def _upload(client, content, shot="SH010", file_type="driver", filename="take.mp4"):
+    response = client.post(
+        "/api/shots/upload",
+        data={"file": (io.BytesIO(content), filename), "shot_name": shot, "file_type": file_type},
+        content_type="multipart/form-data",
+    )
+    body = response.get_json()
+    assert body["success"], body
+    return body["data"]
+
+
+def test_concurrent_uploads_get_distinct_versions(client):
+    contents = [f"take {i}".encode() for i in range(8)]
+
+    with ThreadPoolExecutor(max_workers=len(contents)) as pool:
+        results = list(pool.map(lambda content: _upload(client, content), contents))
+
+    assert sorted(r["version"] for r in results) == list(range(1, len(contents) + 1))
+    for content, result in zip(contents, results):
+        assert Path(result["wip_path"]).read_bytes() == content
+    lipsync = Path(results[0]["wip_path"]).parent
+    newest = max(results, key=lambda r: r["version"])
+    assert (lipsync / "SH010_driver.mp4").read_bytes() == Path(newest["wip_path"]).read_bytes()
+    assert not [p.name for p in lipsync.iterdir() if p.name.endswith(".reserving")]
+
+
+def test_empty_upload_is_a_version(client):
+    result = _upload(client, b"")
+
+    assert result["version"] == 1
+    shots = client.get("/api/shots").get_json()["data"]
+    assert shots[0]["lipsync"]["driver"]["version"] == 1